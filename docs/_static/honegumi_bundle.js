@@ -0,0 +1,124 @@
+// Static Honegumi frontend: looks prerendered scripts up in a bundle built by
+// `python scripts/generate_scripts.py --bundle` (see
+// honegumi.core.utils.bundle for the layout), so that no Python needs to run in
+// the browser. Falls back to the PyScript frontend if the bundle can't be loaded.
+
+(function () {
+    "use strict";
+
+    const currentScript = document.currentScript;
+    const bundleUrl = currentScript.dataset.bundle;
+
+    async function loadBundle(url) {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`Failed to fetch ${url}: ${response.status}`);
+        }
+        let data = new Uint8Array(await response.arrayBuffer());
+        // some servers already decode .gz files (Content-Encoding: gzip)
+        if (data[0] === 0x1f && data[1] === 0x8b) {
+            const stream = new Blob([data]).stream().pipeThrough(new DecompressionStream("gzip"));
+            data = new Uint8Array(await new Response(stream).arrayBuffer());
+        }
+        return JSON.parse(new TextDecoder().decode(data));
+    }
+
+    function makeIndex(bundle) {
+        // mixed-radix strides, last row varying fastest (as in CompatibilityIndex)
+        const radices = bundle.options.map((options) => options.length);
+        const strides = new Array(radices.length).fill(1);
+        for (let i = radices.length - 2; i >= 0; i--) {
+            strides[i] = strides[i + 1] * radices[i + 1];
+        }
+        const encode = (config) =>
+            bundle.names.reduce(
+                (code, name, i) => code + bundle.options[i].indexOf(config[name]) * strides[i],
+                0
+            );
+        const isValid = (code) => bundle.lookup[code] >= 0;
+        return { radices, strides, encode, isValid };
+    }
+
+    function getScript(bundle, code) {
+        const scriptNumber = bundle.lookup[code];
+        if (scriptNumber < 0) {
+            return bundle.invalid_message;
+        }
+        return bundle.scripts[scriptNumber].map((i) => bundle.lines[i]).join("\n");
+    }
+
+    function getDeviatingOptions(bundle, index, config) {
+        // same semantics as Honegumi.get_deviating_options
+        const code = index.encode(config);
+        const deviating = [];
+        bundle.names.forEach((name, i) => {
+            const digit = bundle.options[i].indexOf(config[name]);
+            bundle.options[i].forEach((option, other) => {
+                if (other !== digit && !index.isValid(code + (other - digit) * index.strides[i])) {
+                    deviating.push([name, option]);
+                }
+            });
+        });
+        if (!index.isValid(code)) {
+            bundle.names.forEach((name) => deviating.push([name, config[name]]));
+        }
+        return deviating;
+    }
+
+    function updateText(bundle, index) {
+        const labels = document.querySelectorAll("label");
+        labels.forEach((label) => {
+            label.innerHTML = label.textContent;
+        });
+
+        const config = {};
+        document.querySelectorAll('input[type="radio"]:checked').forEach((row) => {
+            config[row.name] = row.value;
+        });
+
+        document.getElementById("preamble").innerHTML = "";
+        document.getElementById("text").textContent = `\n${getScript(bundle, index.encode(config))}`;
+
+        getDeviatingOptions(bundle, index, config).forEach(([name, option]) => {
+            const label = document.querySelector(`label[for="${name}-${option}"]`);
+            if (label) {
+                label.innerHTML = `<s>${label.innerHTML}</s>`;
+            }
+        });
+
+        if (window.Prism) {
+            window.Prism.highlightAll();
+        }
+    }
+
+    function loadPyScriptFallback() {
+        const css = document.createElement("link");
+        css.rel = "stylesheet";
+        css.href = currentScript.dataset.pyscriptCss;
+        document.head.appendChild(css);
+
+        const core = document.createElement("script");
+        core.type = "module";
+        core.src = currentScript.dataset.pyscriptJs;
+        document.head.appendChild(core);
+
+        const main = document.createElement("script");
+        main.type = "py";
+        main.src = "main.py";
+        main.setAttribute("config", "pyscript.toml");
+        document.body.appendChild(main);
+    }
+
+    loadBundle(bundleUrl)
+        .then((bundle) => {
+            const index = makeIndex(bundle);
+            document.querySelectorAll('input[type="radio"]').forEach((input) => {
+                input.addEventListener("click", () => updateText(bundle, index));
+            });
+            updateText(bundle, index);
+        })
+        .catch((error) => {
+            console.log(`${error}. Falling back to PyScript.`);
+            loadPyScriptFallback();
+        });
+})();
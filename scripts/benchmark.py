@@ -0,0 +1,200 @@
+"""
+Microbenchmarks of honegumi's own hot paths, with stored baselines.
+
+Times ``Honegumi.__init__``, ``create_options_model``, ``process_selections``
+(pydantic and ``Selection`` input), ``generate`` with and without black,
+``get_deviating_options`` (index and fallback path), and full enumeration of
+the option space with ``gen_combs_with_keys``, plus the cold-start import and
+construction timings of scripts/benchmark_import.py. The size of the option
+space is reported alongside, since every option row multiplies the work.
+
+Each timing is the best of several repeats of the mean time per call, divided
+by the time of a fixed pure-Python calibration workload so that a baseline
+recorded on one machine is meaningful on another. A benchmark regresses if its
+normalized time exceeds the baseline by more than ``--threshold``.
+
+Usage::
+
+    python scripts/benchmark.py                    # compare with the baseline
+    python scripts/benchmark.py --update-baseline  # record a new baseline
+    python scripts/benchmark.py --threshold 0.5 --json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+
+from benchmark_import import run as run_import_benchmark
+
+import honegumi.ax.utils.constants as cst
+from honegumi.ax._ax import option_rows
+from honegumi.core._honegumi import (
+    Honegumi,
+    create_options_model,
+    gen_combs_with_keys,
+)
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "resources", "benchmark_baseline.json"
+)
+
+DEFAULTS = {row["name"]: row["options"][0] for row in option_rows}
+CONFIG = {**DEFAULTS, "objective": "Multi", "existing_data": True}
+# deliberately invalid (objective=Single with a custom threshold)
+INVALID_CONFIG = {**DEFAULTS, "objective": "Single", "custom_threshold": True}
+
+
+def calibrate(repeat=5):
+    """Seconds taken by a fixed pure-Python workload on this machine."""
+
+    def workload():
+        data = {str(i): i for i in range(20000)}
+        return sorted(data.items(), key=lambda item: -item[1])[:10]
+
+    return min(timeit.repeat(workload, number=5, repeat=repeat)) / 5
+
+
+def best_mean(fn, number, repeat):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def make_benchmarks():
+    """Return ``{name: (fn, number)}``; each fn is timed per call."""
+    hg = Honegumi(cst, option_rows, cache_size=0, format="none")
+    hg_black = Honegumi(cst, option_rows, cache_size=0, format="black")
+    hg_slow = Honegumi(cst, option_rows, cache_size=0, use_index=False)
+
+    options_model = hg.OptionsModel(**CONFIG)
+    options_model_black = hg_black.OptionsModel(**CONFIG)
+    selection = hg.select(CONFIG)
+    # warm up lazy state, so that only the steady-state cost is timed
+    hg.index
+    hg_black.generate(options_model_black)
+    hg_slow.get_deviating_options(INVALID_CONFIG)
+
+    def init():
+        Honegumi(cst, option_rows, cache_size=0)
+
+    def enumerate_all():
+        gen_combs_with_keys(hg.visible_option_names, hg.visible_option_rows)
+
+    return {
+        "honegumi_init": (init, 200),
+        "create_options_model": (lambda: create_options_model(option_rows), 20),
+        "process_selections": (lambda: hg.process_selections(options_model), 2000),
+        "process_selections_fast": (lambda: hg.process_selections(selection), 2000),
+        "generate_no_black": (lambda: hg.generate(options_model), 200),
+        "generate_black": (lambda: hg_black.generate(options_model_black), 10),
+        "get_deviating_options": (
+            lambda: hg.get_deviating_options(INVALID_CONFIG),
+            2000,
+        ),
+        "get_deviating_options_no_index": (
+            lambda: hg_slow.get_deviating_options(INVALID_CONFIG),
+            100,
+        ),
+        "gen_combs_with_keys": (enumerate_all, 5),
+    }
+
+
+def option_space():
+    hg = Honegumi(cst, option_rows, cache_size=0)
+    return {
+        "num_visible_options": len(hg.visible_option_names),
+        "num_combinations": hg.index.size,
+        "num_valid": sum(hg.index.is_valid(code) for code in range(hg.index.size)),
+    }
+
+
+def run(repeat=5):
+    calibration_s = calibrate()
+    timings = {}
+    for name, (fn, number) in make_benchmarks().items():
+        timings[name] = best_mean(fn, number, repeat)
+
+    import_results = run_import_benchmark(repeat=repeat)
+    timings["cold_import"] = import_results["import_ms"] / 1e3
+    timings["cold_construct"] = import_results["construct_ms"] / 1e3
+
+    return {
+        "python": sys.version.split()[0],
+        "calibration_s": calibration_s,
+        "option_space": option_space(),
+        "seconds": timings,
+        "normalized": {name: t / calibration_s for name, t in timings.items()},
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return ``(name, ratio)`` for every benchmark slower than the baseline
+    by more than `threshold`, comparing normalized timings."""
+    regressions = []
+    for name, normalized in results["normalized"].items():
+        reference = baseline["normalized"].get(name)
+        if reference is None:
+            continue
+        ratio = normalized / reference
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.3,
+        help="allowed relative slowdown per benchmark (default: %(default)s)",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="write results as baseline"
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    results = run(repeat=args.repeat)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+
+    if args.json:
+        print(json.dumps({**results, "regressions": dict(regressions)}, indent=2))
+    else:
+        space = results["option_space"]
+        print(
+            f"option space: {space['num_visible_options']} visible options, "
+            f"{space['num_combinations']} combinations, {space['num_valid']} valid"
+        )
+        print(f"{'benchmark':32} {'time':>12} {'vs baseline':>12}")
+        for name, seconds in results["seconds"].items():
+            change = ""
+            if baseline and name in baseline["normalized"]:
+                ratio = results["normalized"][name] / baseline["normalized"][name]
+                change = f"{ratio - 1:+.0%}"
+            print(f"{name:32} {seconds * 1e6:10.1f}us {change:>12}")
+        print(f"(took {time.perf_counter() - t0:.1f} s)")
+
+    if regressions:
+        for name, ratio in regressions:
+            print(
+                f"REGRESSION: {name} is {ratio - 1:.0%} slower than the baseline",
+                file=sys.stderr,
+            )
+        sys.exit(1)
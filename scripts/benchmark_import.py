@@ -0,0 +1,114 @@
+"""
+Benchmark the cold-start cost of ``import honegumi`` and ``Honegumi(...)``.
+
+Each measurement runs in a fresh interpreter so that nothing is already cached
+in ``sys.modules``. Import costs come from ``python -X importtime``; the
+constructor and the first ``generate`` call are timed inside the subprocess.
+
+Usage::
+
+    python scripts/benchmark_import.py [--repeat 5] [--top 10] [--json]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULE = "honegumi.core._honegumi"
+HEAVY_MODULES = ["black", "jinja2", "pydantic"]
+
+TIMING_SNIPPET = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import {MODULE} as m
+import honegumi.ax.utils.constants as cst
+t1 = time.perf_counter()
+hg = m.Honegumi(cst, cache_size=0)
+t2 = time.perf_counter()
+loaded = [k for k in {HEAVY_MODULES!r} if k in sys.modules]
+hg.generate(hg.OptionsModel())
+t3 = time.perf_counter()
+print(json.dumps({{
+    "import_s": t1 - t0,
+    "construct_s": t2 - t1,
+    "first_generate_s": t3 - t2,
+    "heavy_modules_after_construct": loaded,
+}}))
+"""
+
+
+def importtime(module=MODULE):
+    """
+    Return ``(total_us, rows)`` from ``python -X importtime -c "import module"``,
+    where rows are ``(self_us, cumulative_us, name)`` tuples.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    total_us = sum(row[0] for row in rows)
+    return total_us, rows
+
+
+def time_cold_start():
+    proc = subprocess.run(
+        [sys.executable, "-c", TIMING_SNIPPET],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(repeat=5, top=10):
+    totals = []
+    for _ in range(repeat):
+        total_us, rows = importtime()
+        totals.append(total_us)
+
+    timings = [time_cold_start() for _ in range(repeat)]
+
+    return {
+        "importtime_total_ms": statistics.median(totals) / 1e3,
+        "import_ms": statistics.median(t["import_s"] for t in timings) * 1e3,
+        "construct_ms": statistics.median(t["construct_s"] for t in timings) * 1e3,
+        "first_generate_ms": statistics.median(t["first_generate_s"] for t in timings)
+        * 1e3,
+        "heavy_modules_after_construct": timings[-1]["heavy_modules_after_construct"],
+        "top_cumulative_imports": [
+            {"module": name.strip(), "cumulative_ms": cumulative_us / 1e3}
+            for _, cumulative_us, name in sorted(rows, key=lambda r: -r[1])[:top]
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    results = run(repeat=args.repeat, top=args.top)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"-X importtime total:   {results['importtime_total_ms']:8.1f} ms")
+        print(f"import {MODULE}: {results['import_ms']:8.1f} ms")
+        print(f"Honegumi(...):         {results['construct_ms']:8.1f} ms")
+        print(f"first generate():      {results['first_generate_ms']:8.1f} ms")
+        print(f"heavy modules loaded:  {results['heavy_modules_after_construct']}")
+        print("slowest imports (cumulative):")
+        for row in results["top_cumulative_imports"]:
+            print(f"  {row['cumulative_ms']:8.1f} ms  {row['module']}")
@@ -0,0 +1,34 @@
+"""
+Precompile Honegumi's Jinja templates into Python modules.
+
+Pass the output directories to ``Honegumi`` via ``script_compiled_template_dir``
+and ``core_compiled_template_dir`` so that templates are loaded as ready Python
+code instead of being compiled at startup.
+
+This is opt-in for deployments that control their own layout (e.g., a server or
+a container image built from this repository). The package build doesn't run
+it, so installed packages and the PyScript build compile the templates at
+runtime, where a ``bytecode_cache_dir`` is the persistent alternative.
+"""
+
+import argparse
+import os
+
+from honegumi.core.utils.templates import compile_templates
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--output-dir",
+        default=os.path.join("build", "compiled_templates"),
+        help="compiled templates are written to <output-dir>/{ax,core}",
+    )
+    args = parser.parse_args()
+
+    for subpackage in ["ax", "core"]:
+        template_dir = os.path.join("src", "honegumi", subpackage)
+        compiled_template_dir = os.path.join(args.output_dir, subpackage)
+        manifest = compile_templates(template_dir, compiled_template_dir)
+        for name in manifest:
+            source_path = os.path.join(template_dir, name)
+            print(f"Compiled {source_path} -> {compiled_template_dir}")
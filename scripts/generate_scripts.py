@@ -1,6 +1,10 @@
 # import subprocess
+import argparse
+import json
 import os
 
+from tqdm import tqdm
+
 import honegumi.ax.utils.constants as cst
 from honegumi.ax._ax import (
     add_model_specific_keys,
@@ -9,38 +13,140 @@ from honegumi.ax._ax import (
     option_rows,
 )
 from honegumi.core._honegumi import Honegumi
-
-hg = Honegumi(
-    cst,
-    option_rows=option_rows,
-    is_incompatible_fn=is_incompatible,
-    add_model_specific_keys_fn=add_model_specific_keys,
-    model_kwargs_test_override_fn=model_kwargs_test_override,
-    script_template_dir=os.path.join("src", "honegumi", "ax"),
-    script_template_name="main.py.jinja",
-    core_template_dir=os.path.join("src", "honegumi", "core"),
-    core_template_name="honegumi.html.jinja",
-    output_dir="docs",
-    output_name="honegumi.html",
-)
-
-# convert boolean values within option_rows to strings
-for row in hg.jinja_option_rows:
-    row["options"] = [str(opt) for opt in row["options"]]
-
-# Render the template with your variables
-html = hg.core_template.render(jinja_option_rows=hg.jinja_option_rows)
-
-# Write the rendered HTML to a file
-with open(os.path.join(hg.output_dir, hg.output_name), "w") as f:
-    f.write(html)
-
-# TODO: run make html command from here
-
-# Run the make html command
-# subprocess.run(["make", "html"], check=True, cwd="../docs", timeout=90)
-
-1 + 1
+from honegumi.core.utils.bulk import render_configs
+from honegumi.core.utils.bundle import build_bundle, write_bundle
+
+BUNDLE_NAME = "honegumi_bundle.json.gz"
+
+
+def make_honegumi():
+    # module-level so that it can be pickled and called in worker processes
+    return Honegumi(
+        cst,
+        option_rows=option_rows,
+        is_incompatible_fn=is_incompatible,
+        add_model_specific_keys_fn=add_model_specific_keys,
+        model_kwargs_test_override_fn=model_kwargs_test_override,
+        script_template_dir=os.path.join("src", "honegumi", "ax"),
+        script_template_name="main.py.jinja",
+        core_template_dir=os.path.join("src", "honegumi", "core"),
+        core_template_name="honegumi.html.jinja",
+        output_dir="docs",
+        output_name="honegumi.html",
+        cache_size=0,  # every config is rendered exactly once
+        # workers load the compiled template instead of each compiling it
+        bytecode_cache_dir=os.path.join("build", "jinja_bytecode_cache"),
+        # neighbouring configs share most fragments, render each of them once
+        fragment_cache=True,
+    )
+
+
+def render_html(hg, bundle_url=None):
+    # convert boolean values within option_rows to strings (on copies, so that
+    # the option rows used for rendering scripts keep their boolean values)
+    jinja_option_rows = [
+        {**row, "options": [str(opt) for opt in row["options"]]}
+        for row in hg.jinja_option_rows
+    ]
+
+    # Render the template with your variables (if `bundle_url` is given, the page
+    # looks scripts up in the static bundle instead of running PyScript)
+    html = hg.core_template.render(
+        jinja_option_rows=jinja_option_rows, bundle_url=bundle_url
+    )
+
+    # Write the rendered HTML to a file
+    with open(os.path.join(hg.output_dir, hg.output_name), "w") as f:
+        f.write(html)
+
+    # TODO: run make html command from here
+
+    # Run the make html command
+    # subprocess.run(["make", "html"], check=True, cwd="../docs", timeout=90)
+
+
+def render_scripts(
+    hg, output_path, max_workers=None, chunksize=16, shard_index=0, num_shards=1
+):
+    """
+    Render every valid configuration (or one shard of them) in parallel and
+    write one JSON line per config (processed selections plus the rendered
+    script) to `output_path`.
+    """
+    configs = hg.iter_valid_configs(shard_index=shard_index, num_shards=num_shards)
+    results = render_configs(
+        make_honegumi, configs, max_workers=max_workers, chunksize=chunksize
+    )
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        for selections in tqdm(results, unit="config"):
+            f.write(json.dumps(selections) + "\n")
+
+
+def render_bundle(hg, max_workers=None, chunksize=16):
+    """
+    Write every valid config's script to a static bundle in docs/_static and
+    return the bundle's URL relative to the rendered HTML.
+    """
+    bundle = build_bundle(make_honegumi, max_workers=max_workers, chunksize=chunksize)
+    write_bundle(bundle, os.path.join(hg.output_dir, "_static", BUNDLE_NAME))
+    return f"_static/{BUNDLE_NAME}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render the Honegumi frontend")
+    parser.add_argument(
+        "--scripts",
+        action="store_true",
+        help="also render every configuration's script",
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="build the static script bundle and point the HTML frontend to it",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument(
+        "--shard",
+        default="0/1",
+        help="render only shard i of n, given as 'i/n' (default: 0/1)",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join("data", "processed", "generated_scripts.jsonl"),
+        help="JSON lines file for the rendered scripts",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    hg = make_honegumi()
+
+    bundle_url = None
+    if args.bundle:
+        bundle_url = render_bundle(
+            hg, max_workers=args.workers, chunksize=args.chunksize
+        )
+    render_html(hg, bundle_url=bundle_url)
+
+    if args.scripts:
+        shard_index, num_shards = map(int, args.shard.split("/"))
+        render_scripts(
+            hg,
+            args.output,
+            max_workers=args.workers,
+            chunksize=args.chunksize,
+            shard_index=shard_index,
+            num_shards=num_shards,
+        )
 
 # %% Code Graveyard
 
@@ -0,0 +1,162 @@
+"""
+Load test for ``honegumi serve``, reporting p50/p90/p99 request latencies.
+
+Starts a local service (or targets ``--url``) and sends ``/generate`` requests
+for random configurations from several client threads, each using a persistent
+HTTP/1.1 connection. A fraction of the requests revalidates a previously seen
+ETag with ``If-None-Match`` (answered with 304 by the service).
+
+Usage::
+
+    python scripts/loadtest.py [--requests 500] [--concurrency 8]
+        [--revalidate 0.5] [--workers N] [--url http://127.0.0.1:8000] [--json]
+"""
+
+import argparse
+import http.client
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+from honegumi.ax._ax import option_rows
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(port, workers=None, startup_timeout=60):
+    cmd = [sys.executable, "-m", "honegumi.core._honegumi", "serve"]
+    cmd += ["--port", str(port)]
+    if workers is not None:
+        cmd += ["--workers", str(workers)]
+    # a file rather than a pipe, which nobody reads while the test runs and
+    # would stall a chatty server once full
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr)
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return proc
+            except OSError:
+                if proc.poll() is not None:
+                    stderr.seek(0)
+                    raise RuntimeError(stderr.read().decode())
+                time.sleep(0.1)
+        proc.kill()
+        raise TimeoutError("honegumi serve did not start")
+
+
+def random_query(rng):
+    rows = [row for row in option_rows if not row["hidden"] and not row["disable"]]
+    return urlencode({row["name"]: str(rng.choice(row["options"])) for row in rows})
+
+
+def client(host, port, num_requests, revalidate, seed, etags, results):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    for _ in range(num_requests):
+        headers = {}
+        if etags and rng.random() < revalidate:
+            path, etag = rng.choice(list(etags.items()))
+            headers["If-None-Match"] = etag
+        else:
+            path = "/generate?" + random_query(rng)
+        t0 = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        results.append((time.perf_counter() - t0, response.status))
+        if response.status == 200:
+            etags[path] = response.headers["ETag"]
+    conn.close()
+
+
+def run(url, num_requests=500, concurrency=8, revalidate=0.5):
+    parts = urlsplit(url)
+    etags = {}
+    results = []
+    per_client = max(1, num_requests // concurrency)
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(
+                parts.hostname,
+                parts.port,
+                per_client,
+                revalidate,
+                i,
+                etags,
+                results,
+            ),
+        )
+        for i in range(concurrency)
+    ]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies = sorted(latency for latency, _ in results)
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "statuses": dict(Counter(status for _, status in results)),
+        "throughput_rps": len(results) / elapsed,
+        "p50_ms": percentiles[49] * 1e3,
+        "p90_ms": percentiles[89] * 1e3,
+        "p99_ms": percentiles[98] * 1e3,
+        "max_ms": latencies[-1] * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--revalidate",
+        type=float,
+        default=0.5,
+        help="fraction of requests sent with If-None-Match",
+    )
+    parser.add_argument("--workers", type=int, help="workers of the local service")
+    parser.add_argument("--url", help="target an already running service")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        proc = start_service(port, workers=args.workers)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        results = run(url, args.requests, args.concurrency, args.revalidate)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['requests']} requests, concurrency {results['concurrency']}")
+        print(f"statuses:   {results['statuses']}")
+        print(f"throughput: {results['throughput_rps']:8.1f} req/s")
+        for key in ["p50_ms", "p90_ms", "p99_ms", "max_ms"]:
+            print(f"{key[:-3] + ':':11} {results[key]:8.1f} ms")
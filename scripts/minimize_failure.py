@@ -0,0 +1,56 @@
+"""
+Find the minimal option combination that makes a generated script fail.
+
+Given a failing configuration (e.g., from the output of run_script_tests.py),
+delta-debugs its non-default option values down to a minimal set that still
+reproduces the failure (the same exception type, unless ``--any-error``) and
+prints it with the number of scripts run. Scripts are the test variants of the
+configurations and run in a warm interpreter, or against the stand-in for Ax
+with ``--mock-ax``.
+
+Usage::
+
+    python scripts/minimize_failure.py '{"objective": "Multi", "model": ...}'
+        [--mock-ax] [--any-error] [--timeout 600]
+"""
+
+import argparse
+import json
+import sys
+
+import honegumi.ax.utils.constants as cst
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils.mock_ax import run_script
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.minimize import minimize_failure
+from honegumi.core.utils.testing import ScriptPool
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("config", help="failing configuration as a JSON object")
+    parser.add_argument(
+        "--mock-ax", action="store_true", help="run against the stand-in for Ax"
+    )
+    parser.add_argument(
+        "--any-error", action="store_true", help="accept any failure, not only the same"
+    )
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    hg = Honegumi(cst, option_rows, cache_size=0)
+    config = json.loads(args.config)
+    same_error = not args.any_error
+
+    try:
+        if args.mock_ax:
+            result = minimize_failure(hg, config, run_script, same_error=same_error)
+        else:
+            with ScriptPool(max_workers=1, timeout=args.timeout) as pool:
+                result = minimize_failure(hg, config, pool.run, same_error=same_error)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    print(f"minimal failing option values ({result['num_runs']} scripts run):")
+    print(json.dumps(result["minimal"], indent=2))
+    print(result["error"])
@@ -0,0 +1,248 @@
+"""
+Run the test variants of the generated scripts in a pool of warm interpreters.
+
+By default, selects a covering array of the valid configurations, i.e., a
+small set in which every pair (or t-tuple with ``--strength t``) of option
+values that occurs in a valid configuration occurs at least once; ``--all``
+selects every valid configuration instead (e.g., for scheduled runs), and
+``--branches`` a small set of configurations that together take every reachable
+``{% if %}``/``{% elif %}``/``{% else %}`` branch of the template. Renders
+the test variant (dummy run, see ``render_test_script``) of the selected
+configurations, or of one shard of them, and executes the scripts with
+``ScriptPool``: the workers import ax, botorch, torch and pandas once, rather
+than once per script. Failures are printed with their tracebacks, and one JSON
+line per script is written to ``--output``.
+
+With ``--mock-ax``, the scripts run in this process against the local stand-in
+for Ax (``honegumi.ax.utils.mock_ax``), which checks the wiring of the whole
+option space (``--all``) in seconds; ``--sample N`` runs a random sample of N
+of the selected configurations.
+
+Passing results are cached in ``--cache-dir``, keyed by the rendered source of
+the script plus the installed ax/botorch/torch/... versions (or the source of
+the stand-in with ``--mock-ax``), so that only scripts whose source or
+environment changed are run again. ``--clear-cache`` invalidates the cache.
+
+Before anything runs, all of the selected scripts are compiled and checked
+for undefined names and unused imports in parallel (``precheck_scripts``); any
+problems are printed by configuration and nothing is executed.
+``--precheck-only`` stops after this check, e.g., to check every valid
+configuration with ``--all --precheck-only`` in seconds.
+
+The duration, outcome and peak memory of every run are recorded in the SQLite
+database ``--durations-db``. Its history is used to run the scripts longest
+first, so that no worker is still busy with a long (e.g., fully Bayesian)
+script while the others idle, and to split them into ``--shard``s of balanced
+total duration (all shards must see the same database to agree on the split).
+Runs against the stand-in are recorded under names prefixed with ``mock-ax/``,
+so they neither skew nor use the history of runs against Ax.
+
+Usage::
+
+    python scripts/run_script_tests.py [--strength 2 | --all | --branches] [--workers N]
+        [--shard 0/4] [--limit 20] [--sample 50] [--seed 0] [--mock-ax] [--timeout 600]
+        [--max-runs-per-worker 50] [--cache-dir DIR | --no-cache] [--durations-db DB]
+        [--precheck-only]
+    python scripts/run_script_tests.py --clear-cache
+"""
+
+import argparse
+import inspect
+import json
+import os
+import random
+import sys
+import time
+
+import honegumi.ax.utils.constants as cst
+import honegumi.ax.utils.mock_ax as mock_ax
+from honegumi.ax._ax import option_rows
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.branches import BranchCoverage
+from honegumi.core.utils.cache import hash_text
+from honegumi.core.utils.covering import covering_configs
+from honegumi.core.utils.durations import DurationStore, lpt_order, lpt_shards
+from honegumi.core.utils.precheck import precheck_scripts
+from honegumi.core.utils.testing import (
+    ScriptPool,
+    ScriptResultCache,
+    dummy_selections,
+    environment_fingerprint,
+    render_test_script,
+)
+
+
+def config_name(config):
+    return "-".join(f"{name}={value}" for name, value in config.items())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--strength",
+        type=int,
+        default=2,
+        help="cover all t-tuples of option values (default: %(default)s)",
+    )
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--all", action="store_true", help="select every valid configuration"
+    )
+    selection.add_argument(
+        "--branches",
+        action="store_true",
+        help="select configurations covering every reachable template branch",
+    )
+    parser.add_argument(
+        "--shard",
+        default="0/1",
+        help="run only shard i of n, given as 'i/n' (default: 0/1)",
+    )
+    parser.add_argument("--limit", type=int, help="run at most this many scripts")
+    parser.add_argument("--sample", type=int, help="run a random sample of configs")
+    parser.add_argument("--seed", type=int, default=0, help="seed for --sample")
+    parser.add_argument(
+        "--mock-ax", action="store_true", help="run against the stand-in for Ax"
+    )
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--max-runs-per-worker", type=int, default=50)
+    parser.add_argument(
+        "--cache-dir", default=os.path.join("build", "script_test_cache")
+    )
+    parser.add_argument("--no-cache", action="store_true", help="run all scripts")
+    parser.add_argument(
+        "--clear-cache", action="store_true", help="invalidate the cache and exit"
+    )
+    parser.add_argument(
+        "--precheck-only",
+        action="store_true",
+        help="only compile and check the names of the scripts",
+    )
+    parser.add_argument(
+        "--durations-db", default=os.path.join("build", "script_durations.sqlite")
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join("data", "processed", "script_test_results.jsonl"),
+    )
+    return parser.parse_args()
+
+
+def iter_results(args, scripts, names):
+    if args.mock_ax:
+        for source, name in zip(scripts, names):
+            result = mock_ax.run_script(source, name)
+            del result["calls"]  # holds Ax stand-in objects
+            yield result
+        return
+    with ScriptPool(
+        max_workers=args.workers,
+        timeout=args.timeout,
+        max_runs_per_worker=args.max_runs_per_worker,
+    ) as pool:
+        yield from pool.map(scripts, names)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.mock_ax:
+        environment = {
+            "python": "%d.%d" % sys.version_info[:2],
+            "mock_ax": hash_text(inspect.getsource(mock_ax)),
+        }
+    else:
+        environment = environment_fingerprint()
+    cache = ScriptResultCache(args.cache_dir, environment=environment)
+    if args.clear_cache:
+        print(f"removed {cache.clear()} cached results from {args.cache_dir}")
+        sys.exit(0)
+
+    hg = Honegumi(cst, option_rows, cache_size=0)
+
+    shard_index, num_shards = map(int, args.shard.split("/"))
+    if args.all:
+        configs = list(hg.iter_valid_configs())
+    elif args.branches:
+        template_path = os.path.join(hg.script_template_dir, hg.script_template_name)
+        with open(template_path) as f:
+            coverage = BranchCoverage(hg.env, f.read())
+        configs, unreachable = coverage.covering_configs(
+            hg.iter_valid_configs(), lambda config: dummy_selections(hg, config)
+        )
+        if unreachable:
+            print(f"unreachable template branches: {unreachable}", file=sys.stderr)
+    else:
+        configs = covering_configs(
+            hg.iter_valid_configs(), hg.visible_option_names, args.strength
+        )
+    if args.sample is not None:
+        configs = random.Random(args.seed).sample(
+            configs, min(args.sample, len(configs))
+        )
+
+    durations = DurationStore(args.durations_db)
+    # the stand-in runs in a fraction of the time, keep its history apart
+    history_prefix = "mock-ax/" if args.mock_ax else ""
+    configs_by_name = {config_name(config): config for config in configs}
+    known = durations.estimates([history_prefix + name for name in configs_by_name])
+    estimates = {name: known[history_prefix + name] for name in configs_by_name}
+    names = lpt_shards(configs_by_name, estimates, num_shards)[shard_index]
+    names = names[: args.limit]
+    configs = [configs_by_name[name] for name in names]
+    scripts = [render_test_script(hg, config) for config in configs]
+
+    t0 = time.perf_counter()
+    problems = precheck_scripts(scripts, names, max_workers=args.workers)
+    for name, script_problems in problems.items():
+        print(f"PRECHECK FAILED {name}", file=sys.stderr)
+        for problem in script_problems:
+            print(f"    {problem}", file=sys.stderr)
+    print(
+        f"precheck: {len(scripts) - len(problems)} passed, {len(problems)} failed "
+        f"in {time.perf_counter() - t0:.1f} s"
+    )
+    if problems or args.precheck_only:
+        durations.close()
+        sys.exit(1 if problems else 0)
+
+    t0 = time.perf_counter()
+    keys = [cache.make_key(script) for script in scripts]
+    results = [None if args.no_cache else cache.get(key) for key in keys]
+    for i, result in enumerate(results):
+        if result is not None:
+            results[i] = {**result, "name": names[i], "cached": True}
+    # longest first, so that the pool finishes with short scripts
+    todo = [i for i, result in enumerate(results) if result is None]
+    todo = lpt_order(todo, {i: estimates[names[i]] for i in todo})
+
+    num_failed = 0
+    new_results = iter_results(
+        args, [scripts[i] for i in todo], [names[i] for i in todo]
+    )
+    for i, result in zip(todo, new_results):
+        cache.set(keys[i], result)
+        durations.record(
+            history_prefix + names[i],
+            "passed" if result["ok"] else "failed",
+            result["duration_s"],
+            result.get("max_rss_kb"),
+        )
+        results[i] = {**result, "cached": False}
+        if not result["ok"]:
+            num_failed += 1
+            print(f"FAILED {result['name']}\n{result['error']}", file=sys.stderr)
+    durations.close()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        for config, result in zip(configs, results):
+            f.write(json.dumps({"config": config, **result}) + "\n")
+
+    print(
+        f"{len(scripts) - num_failed} passed, {num_failed} failed "
+        f"in {time.perf_counter() - t0:.1f} s "
+        f"(cache: {len(scripts) - len(todo)} hits, {len(todo)} misses)"
+    )
+    sys.exit(1 if num_failed else 0)
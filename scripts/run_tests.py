@@ -1,10 +1,31 @@
+"""
+Run the test suite, recording per-test durations for scheduling.
+
+``ResultsCollector`` records the outcome, duration and peak memory of each test
+in the SQLite database ``--durations-db`` (see ``DurationStore``). With
+``--shard i/n``, the collected tests are split into n shards of balanced total
+duration according to that history and only shard i runs, longest test first.
+
+Usage::
+
+    python scripts/run_tests.py [tests/test_ax.py ...] [--shard 0/4]
+        [--durations-db DB] [PYTEST_OPTIONS]
+"""
+
+import argparse
+import os
+import sys
 import time
 
 import pytest
 
+from honegumi.core.utils.durations import DurationStore, lpt_shards, peak_rss_kb
+
 
 class ResultsCollector:
-    def __init__(self):
+    def __init__(self, store=None, shard=(0, 1)):
+        self.store = store
+        self.shard_index, self.num_shards = shard
         self.reports = []
         self.collected = 0
         self.exitcode = 0
@@ -13,19 +34,37 @@ class ResultsCollector:
         self.xfailed = 0
         self.skipped = 0
         self.total_duration = 0
+        self.start_time = time.time()
+
+    def pytest_sessionstart(self, session):
+        self.start_time = time.time()
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_runtest_makereport(self, item, call):
         outcome = yield
         report = outcome.get_result()
-        if report.when == "call":
+        if report.when == "call" or (report.when == "setup" and report.skipped):
             self.reports.append(report)
+            if self.store is not None:
+                self.store.record(
+                    report.nodeid, report.outcome, report.duration, peak_rss_kb()
+                )
 
-    def pytest_collection_modifyitems(self, items):
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        if self.store is not None and self.num_shards > 1:
+            by_id = {item.nodeid: item for item in items}
+            estimates = self.store.estimates(list(by_id))
+            shards = lpt_shards(by_id, estimates, self.num_shards)
+            selected = [by_id[nodeid] for nodeid in shards[self.shard_index]]
+            kept = set(shards[self.shard_index])
+            config.hook.pytest_deselected(
+                items=[item for item in items if item.nodeid not in kept]
+            )
+            items[:] = selected
         self.collected = len(items)
 
     def pytest_terminal_summary(self, terminalreporter, exitstatus):
-        print(exitstatus, dir(exitstatus))
         self.exitcode = exitstatus
         self.passed = terminalreporter.stats.get("passed", [])
         self.failed = terminalreporter.stats.get("failed", [])
@@ -36,15 +75,28 @@ class ResultsCollector:
         self.num_xfailed = len(self.xfailed)
         self.num_skipped = len(self.skipped)
 
-        self.total_duration = time.time() - terminalreporter._sessionstarttime
-
+        self.total_duration = time.time() - self.start_time
 
-collector = ResultsCollector()
-retcode = pytest.main(["-v", "tests/test_capstd.py"], plugins=[collector])
 
-report = collector.reports[0]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="*", default=["tests"])
+    parser.add_argument(
+        "--shard",
+        default="0/1",
+        help="run only shard i of n, given as 'i/n' (default: 0/1)",
+    )
+    parser.add_argument(
+        "--durations-db", default=os.path.join("build", "test_durations.sqlite")
+    )
+    args, pytest_args = parser.parse_known_args()
+    shard = tuple(map(int, args.shard.split("/")))
 
-print(report.capstderr)
-print(report.capstdout)
+    with DurationStore(args.durations_db) as store:
+        collector = ResultsCollector(store, shard)
+        retcode = pytest.main(["-v", *args.paths, *pytest_args], plugins=[collector])
 
-1 + 1
+    slowest = sorted(collector.reports, key=lambda r: r.duration, reverse=True)
+    for report in slowest[:10]:
+        print(f"{report.duration:8.2f} s  {report.outcome:8s} {report.nodeid}")
+    sys.exit(retcode)
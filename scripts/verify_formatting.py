@@ -0,0 +1,32 @@
+"""
+Build-time check that black leaves every rendered script unchanged.
+
+On success, a verification record is written next to the template so that
+``Honegumi(..., format="verified")`` can skip importing and running black at
+runtime. On failure, the script exits with the offending diffs.
+"""
+
+import os
+
+import honegumi.ax.utils.constants as cst
+from honegumi.ax._ax import (
+    add_model_specific_keys,
+    is_incompatible,
+    model_kwargs_test_override,
+    option_rows,
+)
+from honegumi.core._honegumi import Honegumi
+
+hg = Honegumi(
+    cst,
+    option_rows=option_rows,
+    is_incompatible_fn=is_incompatible,
+    add_model_specific_keys_fn=add_model_specific_keys,
+    model_kwargs_test_override_fn=model_kwargs_test_override,
+    script_template_dir=os.path.join("src", "honegumi", "ax"),
+    script_template_name="main.py.jinja",
+    cache_size=0,
+)
+
+num_verified = hg.verify_formatting(write_record=True)
+print(f"Verified {num_verified} rendered scripts, wrote {hg.verified_record_path}")
@@ -24,7 +24,7 @@ import logging
 
 import honegumi.ax.utils.constants as cst
 import honegumi.core.utils.constants  # noqa: F401
-from honegumi import __version__  # noqa: F401
+from honegumi.core.utils.rules import IgnoreCase, RuleSet
 
 # from jinja2 import Environment, FileSystemLoader
 
@@ -52,6 +52,29 @@ except Exception:
 # when using this Python module as a library.
 
 
+# Declarative incompatibility rules. Each rule is a conjunction of
+# option=value predicates; a configuration matching every predicate of any rule
+# is incompatible. Rules that only involve visible options also prune whole
+# subtrees while enumerating the option space (see
+# `gen_pruned_combs_with_keys`). Add new incompatibility checks here.
+incompatible_rules = [
+    {cst.MODEL_OPT_KEY: cst.FULLYBAYESIAN_KEY, cst.CUSTOM_GEN_KEY: False},
+    {cst.OBJECTIVE_OPT_KEY: IgnoreCase("Single"), cst.CUSTOM_THRESHOLD_KEY: True},
+]
+
+# Hidden keys derived from the visible options (see `add_model_specific_keys`),
+# each True if any of its conjunctions holds
+derived_keys = {
+    cst.CUSTOM_GEN_KEY: [
+        {cst.MODEL_OPT_KEY: cst.FULLYBAYESIAN_KEY},
+        {cst.MODEL_OPT_KEY: cst.CUSTOM_KEY},
+        {cst.TASK_OPT_KEY: "Multi"},
+    ],
+}
+
+rule_set = RuleSet(incompatible_rules, derived_keys)
+
+
 def is_incompatible(opt):
     """
     Check if the given option dictionary contains incompatible options.
@@ -59,7 +82,9 @@ def is_incompatible(opt):
     An option is considered incompatible if it cannot be used together with
     another option. For example, if the model is fully Bayesian, it cannot use
     the custom generator (`use_custom_gen`). Similarly, if the objective is
-    single, it cannot use the custom threshold (`use_custom_threshold`).
+    single, it cannot use the custom threshold (`use_custom_threshold`). The
+    checks are the declarative `incompatible_rules` (see
+    :class:`~honegumi.core.utils.rules.RuleSet`).
 
     Parameters
     ----------
@@ -71,18 +96,7 @@ def is_incompatible(opt):
     bool
         True if any incompatibility is found among the options, False otherwise.
     """
-    use_custom_gen = opt[cst.CUSTOM_GEN_KEY]
-    model_is_fully_bayesian = opt[cst.MODEL_OPT_KEY] == cst.FULLYBAYESIAN_KEY
-    # use_custom_threshold = opt.get(cst.CUSTOM_THRESHOLD_KEY, False)
-    use_custom_threshold = opt[cst.CUSTOM_THRESHOLD_KEY]
-    objective_is_single = opt[cst.OBJECTIVE_OPT_KEY].lower() == "single"
-
-    checks = [
-        model_is_fully_bayesian and not use_custom_gen,
-        objective_is_single and use_custom_threshold,
-        # add new incompatibility checks here
-    ]
-    return any(checks)
+    return rule_set.matches(opt)
 
 
 def add_model_specific_keys(option_names, opt):
@@ -160,11 +174,7 @@ def add_model_specific_keys(option_names, opt):
     if opt[cst.TASK_OPT_KEY] == "Multi":
         opt[cst.MODEL_OPT_KEY] == cst.CUSTOM_KEY
 
-    opt[cst.CUSTOM_GEN_KEY] = (
-        (opt[cst.MODEL_OPT_KEY] == cst.FULLYBAYESIAN_KEY)
-        or (opt[cst.MODEL_OPT_KEY] == cst.CUSTOM_KEY)
-        or (opt[cst.TASK_OPT_KEY] == "Multi")
-    )
+    opt.update(rule_set.derive(opt))
 
     # log_fn(f"opt: {opt}")
 
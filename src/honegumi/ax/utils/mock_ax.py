@@ -0,0 +1,654 @@
+"""
+A local stand-in for the parts of Ax used by the generated scripts.
+
+Most failures in rendered scripts are wiring errors (wrong keyword arguments,
+``raw_data`` keys that don't match the objectives, parameterizations outside of
+the search space, ...) rather than modelling errors. The classes here mirror the
+signatures of ``AxClient``, ``ObjectiveProperties``, ``GenerationStrategy``,
+``GenerationStep``, ``Models`` and ``ObservationFeatures`` of ax-platform 0.4.3,
+validate their arguments and the consistency of parameters, constraints,
+objectives and trial data, record every ``AxClient`` call, and generate random
+(feasible) trials instead of fitting models. A script runs against them in
+milliseconds::
+
+    with mock_ax() as clients:
+        result = exec_script(script)
+    clients[0].calls  # [("create_experiment", {...}), ...]
+
+or simply ``run_script(script)``. The real Ax remains the reference for a
+sampled subset of configurations (see scripts/run_script_tests.py).
+"""
+
+import contextlib
+import functools
+import inspect
+import math
+import random
+import sys
+import types
+from enum import Enum
+from numbers import Real
+from typing import Any, Dict, List, Optional, Tuple
+
+from honegumi.core.utils.testing import exec_script
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+# clients created within the active `mock_ax` context
+_clients: Optional[List["AxClient"]] = None
+
+PARAMETER_KEYS = {
+    "range": {"bounds", "value_type", "log_scale", "digits", "is_fidelity"},
+    "choice": {
+        "values",
+        "value_type",
+        "is_ordered",
+        "is_task",
+        "target_value",
+        "sort_values",
+        "is_fidelity",
+        "dependents",
+    },
+    "fixed": {"value", "value_type", "is_fidelity", "target_value", "dependents"},
+}
+
+
+class Models(Enum):
+    SOBOL = "Sobol"
+    UNIFORM = "Uniform"
+    GPEI = "GPEI"
+    BOTORCH_MODULAR = "BoTorch"
+    SAASBO = "SAASBO"
+    SAAS_MTGP = "SAAS_MTGP"
+    FULLYBAYESIAN = "FullyBayesian"
+    FULLYBAYESIANMOO = "FullyBayesianMOO"
+    MOO = "MOO"
+    ST_MTGP = "ST_MTGP"
+    THOMPSON = "Thompson"
+    EMPIRICAL_BAYES_THOMPSON = "EB"
+
+
+# stands in for a list of transform classes
+Specified_Task_ST_MTGP_trans = ["Specified_Task_ST_MTGP_trans"]
+
+
+class UpperConfidenceBound:
+    """Stand-in for ``botorch.acquisition.UpperConfidenceBound``."""
+
+
+class ObservationFeatures:
+    def __init__(
+        self,
+        parameters: Dict[str, Any],
+        trial_index: Optional[int] = None,
+        start_time=None,
+        end_time=None,
+        random_split: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        if not isinstance(parameters, dict):
+            raise ValueError(f"parameters must be a dict, got {parameters!r}")
+        self.parameters = parameters
+        self.trial_index = trial_index
+
+
+class ObjectiveProperties:
+    def __init__(self, minimize: bool, threshold: Optional[float] = None):
+        if not isinstance(minimize, bool):
+            raise ValueError(f"minimize must be a bool, got {minimize!r}")
+        if threshold is not None and not isinstance(threshold, Real):
+            raise ValueError(f"threshold must be a number, got {threshold!r}")
+        self.minimize = minimize
+        self.threshold = threshold
+
+
+class GenerationStep:
+    def __init__(
+        self,
+        model,
+        num_trials: int,
+        min_trials_observed: int = 0,
+        completion_criteria=None,
+        max_parallelism: Optional[int] = None,
+        use_update: bool = False,
+        enforce_num_trials: bool = True,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        model_gen_kwargs: Optional[Dict[str, Any]] = None,
+        index: int = -1,
+        should_deduplicate: bool = False,
+    ):
+        if not isinstance(model, Models):
+            raise ValueError(f"model must be a member of Models, got {model!r}")
+        if not isinstance(num_trials, int) or (num_trials < 1 and num_trials != -1):
+            raise ValueError(f"num_trials must be positive or -1, got {num_trials!r}")
+        model_kwargs = model_kwargs or {}
+        acqf_class = model_kwargs.get("botorch_acqf_class")
+        if acqf_class is not None:
+            if not inspect.isclass(acqf_class):
+                raise ValueError(f"botorch_acqf_class must be a class: {acqf_class!r}")
+            if model in (Models.SOBOL, Models.UNIFORM):
+                raise ValueError(f"{model.name} does not take a botorch_acqf_class")
+        if not isinstance(model_kwargs.get("transforms", []), list):
+            raise ValueError("transforms must be a list of transform classes")
+        self.model = model
+        self.num_trials = num_trials
+        self.max_parallelism = max_parallelism
+        self.model_kwargs = model_kwargs
+        self.model_gen_kwargs = model_gen_kwargs or {}
+
+
+class GenerationStrategy:
+    def __init__(self, steps: List[GenerationStep], name: Optional[str] = None):
+        if not steps or not all(isinstance(step, GenerationStep) for step in steps):
+            raise ValueError("steps must be a non-empty list of GenerationStep")
+        for step in steps[:-1]:
+            if step.num_trials == -1:
+                raise ValueError("Only the last step may have num_trials=-1")
+        self.steps = steps
+        self.name = name
+
+
+def _recorded(method):
+    """Record the bound arguments of every call in ``self.calls``."""
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        arguments = dict(bound.arguments)
+        arguments.pop("self")
+        self.calls.append((method.__name__, arguments))
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def parse_constraint(constraint: str, range_names) -> Tuple[Dict[str, float], float]:
+    """
+    Parse an Ax parameter constraint string, e.g., ``"x1 + x2 <= 15.0"``,
+    ``"1.0*x1 + 0.5*x2 >= 1"`` or ``"x1 <= x2"``, into ``(weights, bound)``
+    such that the constraint is ``sum(weights[p] * p) <= bound``.
+    """
+    tokens = constraint.split()
+    if len(tokens) < 3 or tokens[-2] not in ("<=", ">="):
+        raise ValueError(
+            f"Constraint must end with '<= bound' or '>= bound': {constraint!r}"
+        )
+    if any(token.startswith("*") or token.endswith("*") for token in tokens):
+        raise ValueError(f"There must be no spaces around '*': {constraint!r}")
+    sign = 1.0 if tokens[-2] == "<=" else -1.0
+    lhs, rhs = tokens[:-2], tokens[-1]
+
+    weights: Dict[str, float] = {}
+    if len(lhs) == 1 and rhs in range_names:
+        # order constraint
+        weights = {lhs[0]: sign, rhs: -sign}
+        bound = 0.0
+    else:
+        try:
+            bound = sign * float(rhs)
+        except ValueError:
+            raise ValueError(f"Invalid bound in constraint {constraint!r}") from None
+        term_sign = 1.0
+        for i, token in enumerate(lhs):
+            if i % 2:
+                if token not in ("+", "-"):
+                    raise ValueError(f"Expected '+' or '-' in {constraint!r}")
+                term_sign = 1.0 if token == "+" else -1.0
+                continue
+            coefficient, _, name = token.rpartition("*")
+            try:
+                coefficient = float(coefficient) if coefficient else 1.0
+            except ValueError:
+                raise ValueError(
+                    f"Invalid term {token!r} in constraint {constraint!r}"
+                ) from None
+            weights[name] = weights.get(name, 0.0) + sign * term_sign * coefficient
+
+    for name in weights:
+        if name not in range_names:
+            raise ValueError(
+                f"Constraint {constraint!r} refers to {name!r}, which is not a "
+                "range parameter"
+            )
+    return weights, bound
+
+
+class AxClient:
+    def __init__(
+        self,
+        generation_strategy: Optional[GenerationStrategy] = None,
+        db_settings=None,
+        enforce_sequential_optimization: bool = True,
+        random_seed: Optional[int] = None,
+        torch_device=None,
+        verbose_logging: bool = True,
+        suppress_storage_errors: bool = False,
+        early_stopping_strategy=None,
+        global_stopping_strategy=None,
+    ):
+        """Records calls in ``calls``, a list of ``(method, arguments)``."""
+        if generation_strategy is not None and not isinstance(
+            generation_strategy, GenerationStrategy
+        ):
+            raise ValueError(
+                f"Expected a GenerationStrategy, got {generation_strategy!r}"
+            )
+        self.generation_strategy = generation_strategy
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self._rng = random.Random(random_seed)
+        self._parameters: Optional[Dict[str, Dict[str, Any]]] = None
+        self._objectives: Dict[str, ObjectiveProperties] = {}
+        self._constraints: List[Tuple[Dict[str, float], float]] = []
+        self._trials: Dict[int, Dict[str, Any]] = {}
+        if _clients is not None:
+            _clients.append(self)
+
+    # ---- experiment setup ----
+
+    @_recorded
+    def create_experiment(
+        self,
+        parameters: List[Dict[str, Any]],
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        owners: Optional[List[str]] = None,
+        objectives: Optional[Dict[str, ObjectiveProperties]] = None,
+        parameter_constraints: Optional[List[str]] = None,
+        outcome_constraints: Optional[List[str]] = None,
+        status_quo=None,
+        overwrite_existing_experiment: bool = False,
+        experiment_type: Optional[str] = None,
+        tracking_metric_names: Optional[List[str]] = None,
+        choose_generation_strategy_kwargs: Optional[Dict[str, Any]] = None,
+        support_intermediate_data: bool = False,
+        immutable_search_space_and_opt_config: bool = True,
+        is_test: bool = False,
+        metric_definitions=None,
+        default_trial_type=None,
+        default_runner=None,
+    ):
+        if self._parameters is not None and not overwrite_existing_experiment:
+            raise ValueError("Experiment already created")
+
+        self._parameters = {}
+        for parameter in parameters:
+            self._add_parameter(parameter)
+
+        if not objectives:
+            raise ValueError("At least one objective is required")
+        for metric_name, properties in objectives.items():
+            if not isinstance(properties, ObjectiveProperties):
+                raise ValueError(f"Objective {metric_name!r} needs ObjectiveProperties")
+            if metric_name in self._parameters:
+                raise ValueError(f"Objective {metric_name!r} clashes with a parameter")
+            if len(objectives) == 1 and properties.threshold is not None:
+                raise ValueError("Objective thresholds require multiple objectives")
+        self._objectives = dict(objectives)
+        self._tracking_metrics = set(tracking_metric_names or [])
+
+        range_names = {
+            name for name, p in self._parameters.items() if p["type"] == "range"
+        }
+        self._constraints = [
+            parse_constraint(constraint, range_names)
+            for constraint in parameter_constraints or []
+        ]
+
+        task_parameters = [p for p in self._parameters.values() if p.get("is_task")]
+        if task_parameters:
+            steps = self.generation_strategy.steps if self.generation_strategy else []
+            if not steps or any("transforms" not in s.model_kwargs for s in steps):
+                raise ValueError(
+                    "Task parameters require a generation strategy whose steps all "
+                    "pass multi-task transforms in model_kwargs"
+                )
+
+    def _add_parameter(self, parameter: Dict[str, Any]):
+        name, kind = parameter.get("name"), parameter.get("type")
+        if not isinstance(name, str):
+            raise ValueError(f"Parameter without a name: {parameter!r}")
+        if name in self._parameters:
+            raise ValueError(f"Duplicate parameter {name!r}")
+        if kind not in PARAMETER_KEYS:
+            raise ValueError(f"Unknown type {kind!r} of parameter {name!r}")
+        unknown = set(parameter) - {"name", "type"} - PARAMETER_KEYS[kind]
+        if unknown:
+            raise ValueError(f"Unknown keys {sorted(unknown)} of parameter {name!r}")
+
+        if kind == "range":
+            bounds = parameter.get("bounds")
+            if (
+                not isinstance(bounds, (list, tuple))
+                or len(bounds) != 2
+                or not all(isinstance(b, Real) for b in bounds)
+                or not bounds[0] < bounds[1]
+            ):
+                raise ValueError(f"Invalid bounds {bounds!r} of parameter {name!r}")
+        elif kind == "choice":
+            values = parameter.get("values")
+            if not isinstance(values, list) or len(set(values)) < 2:
+                raise ValueError(f"Choice parameter {name!r} needs 2+ distinct values")
+            if parameter.get("is_task") and parameter.get("target_value") not in values:
+                raise ValueError(f"Task parameter {name!r} needs a valid target_value")
+        elif "value" not in parameter:
+            raise ValueError(f"Fixed parameter {name!r} needs a value")
+        self._parameters[name] = dict(parameter)
+
+    def _require_experiment(self):
+        if self._parameters is None:
+            raise ValueError("Call create_experiment first")
+
+    # ---- parameterizations ----
+
+    def _check_value(self, name: str, value: Any):
+        parameter = self._parameters.get(name)
+        if parameter is None:
+            raise ValueError(f"Unknown parameter {name!r}")
+        if parameter["type"] == "range":
+            low, high = parameter["bounds"]
+            if not isinstance(value, Real) or not low <= value <= high:
+                raise ValueError(f"{name}={value!r} is outside of [{low}, {high}]")
+        elif parameter["type"] == "choice":
+            if value not in parameter["values"]:
+                raise ValueError(f"{name}={value!r} is not in {parameter['values']}")
+        elif value != parameter["value"]:
+            raise ValueError(f"{name}={value!r} differs from its fixed value")
+
+    def _is_feasible(self, parameterization: Dict[str, Any]) -> bool:
+        return all(
+            sum(w * parameterization[name] for name, w in weights.items())
+            <= bound + 1e-8
+            for weights, bound in self._constraints
+        )
+
+    def _check_parameterization(self, parameterization: Dict[str, Any]):
+        missing = set(self._parameters) - set(parameterization)
+        if missing:
+            raise ValueError(f"Parameterization lacks {sorted(missing)}")
+        for name, value in parameterization.items():
+            self._check_value(name, value)
+        if not self._is_feasible(parameterization):
+            raise ValueError(f"{parameterization} violates the parameter constraints")
+
+    def _sample(self, fixed_features: Optional[ObservationFeatures]):
+        fixed = {}
+        if fixed_features is not None:
+            if not isinstance(fixed_features, ObservationFeatures):
+                raise ValueError("fixed_features must be ObservationFeatures")
+            for name, value in fixed_features.parameters.items():
+                self._check_value(name, value)
+            fixed = fixed_features.parameters
+
+        for _ in range(1000):
+            parameterization = {}
+            for name, parameter in self._parameters.items():
+                if name in fixed:
+                    parameterization[name] = fixed[name]
+                elif parameter["type"] == "range":
+                    parameterization[name] = self._rng.uniform(*parameter["bounds"])
+                elif parameter["type"] == "choice":
+                    parameterization[name] = self._rng.choice(parameter["values"])
+                else:
+                    parameterization[name] = parameter["value"]
+            if self._is_feasible(parameterization):
+                return parameterization
+        raise ValueError("Could not generate a point satisfying the constraints")
+
+    def _new_trial(self, parameterization: Dict[str, Any]) -> int:
+        trial_index = len(self._trials)
+        self._trials[trial_index] = {"parameters": parameterization, "data": None}
+        return trial_index
+
+    @_recorded
+    def attach_trial(
+        self,
+        parameters: Dict[str, Any],
+        ttl_seconds: Optional[int] = None,
+        run_metadata: Optional[Dict[str, Any]] = None,
+        arm_name: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], int]:
+        self._require_experiment()
+        self._check_parameterization(parameters)
+        return dict(parameters), self._new_trial(dict(parameters))
+
+    @_recorded
+    def get_next_trial(
+        self,
+        ttl_seconds: Optional[int] = None,
+        force: bool = False,
+        fixed_features: Optional[ObservationFeatures] = None,
+    ) -> Tuple[Dict[str, Any], int]:
+        self._require_experiment()
+        parameterization = self._sample(fixed_features)
+        return dict(parameterization), self._new_trial(parameterization)
+
+    @_recorded
+    def get_next_trials(
+        self,
+        max_trials: int,
+        ttl_seconds: Optional[int] = None,
+        fixed_features: Optional[ObservationFeatures] = None,
+    ) -> Tuple[Dict[int, Dict[str, Any]], bool]:
+        self._require_experiment()
+        if not isinstance(max_trials, int) or max_trials < 1:
+            raise ValueError(f"max_trials must be a positive int, got {max_trials!r}")
+        trials = {}
+        for _ in range(max_trials):
+            parameterization = self._sample(fixed_features)
+            trials[self._new_trial(parameterization)] = dict(parameterization)
+        return trials, False
+
+    # ---- data ----
+
+    def _normalize_raw_data(self, raw_data) -> Dict[str, Tuple[float, float]]:
+        if not isinstance(raw_data, dict):
+            if len(self._objectives) > 1:
+                raise ValueError(
+                    "raw_data must be a dict keyed by metric name for multiple "
+                    f"objectives, got {raw_data!r}"
+                )
+            raw_data = {next(iter(self._objectives)): raw_data}
+
+        metrics = set(self._objectives) | self._tracking_metrics
+        unknown = set(raw_data) - metrics
+        missing = set(self._objectives) - set(raw_data)
+        if unknown or missing:
+            raise ValueError(
+                f"raw_data keys {sorted(raw_data)} don't match the metrics "
+                f"{sorted(metrics)}"
+            )
+
+        data = {}
+        for metric_name, value in raw_data.items():
+            mean, sem = value if isinstance(value, tuple) else (value, None)
+            if not isinstance(mean, Real) or not math.isfinite(mean):
+                raise ValueError(f"Invalid value {value!r} of metric {metric_name!r}")
+            data[metric_name] = (float(mean), sem)
+        return data
+
+    @_recorded
+    def complete_trial(
+        self,
+        trial_index: int,
+        raw_data,
+        metadata: Optional[Dict[str, Any]] = None,
+        sample_size: Optional[int] = None,
+    ):
+        self._require_experiment()
+        trial = self._trials.get(trial_index)
+        if trial is None:
+            raise ValueError(f"Unknown trial {trial_index!r}")
+        if trial["data"] is not None:
+            raise ValueError(f"Trial {trial_index} is already completed")
+        trial["data"] = self._normalize_raw_data(raw_data)
+
+    @property
+    def objective_names(self) -> List[str]:
+        return list(self._objectives)
+
+    def _completed(self) -> Dict[int, Dict[str, Any]]:
+        completed = {i: t for i, t in self._trials.items() if t["data"] is not None}
+        if not completed:
+            raise ValueError("No completed trials")
+        return completed
+
+    def _prediction(self, trial: Dict[str, Any]):
+        means = {name: mean for name, (mean, _) in trial["data"].items()}
+        covariances = {name: {name: 0.0} for name in means}
+        return dict(trial["parameters"]), (means, covariances)
+
+    @_recorded
+    def get_best_parameters(
+        self,
+        optimization_config=None,
+        trial_indices=None,
+        use_model_predictions: bool = True,
+    ):
+        if len(self._objectives) > 1:
+            raise ValueError(
+                "get_best_parameters is for single-objective experiments; use "
+                "get_pareto_optimal_parameters"
+            )
+        ((name, properties),) = self._objectives.items()
+        sign = 1 if properties.minimize else -1
+        best = min(self._completed().values(), key=lambda t: sign * t["data"][name][0])
+        return self._prediction(best)
+
+    @_recorded
+    def get_pareto_optimal_parameters(self, use_model_predictions: bool = True):
+        if len(self._objectives) < 2:
+            raise ValueError(
+                "get_pareto_optimal_parameters requires multiple objectives"
+            )
+        signs = {
+            name: 1 if properties.minimize else -1
+            for name, properties in self._objectives.items()
+        }
+        completed = self._completed()
+        points = {
+            i: [sign * t["data"][name][0] for name, sign in signs.items()]
+            for i, t in completed.items()
+        }
+
+        def dominated(p):
+            return any(
+                all(a <= b for a, b in zip(q, p)) and q != p for q in points.values()
+            )
+
+        return {
+            i: self._prediction(completed[i])
+            for i, point in points.items()
+            if not dominated(point)
+        }
+
+    @_recorded
+    def get_trials_data_frame(self):
+        import pandas as pd
+
+        rows = []
+        for trial_index, trial in self._trials.items():
+            data = trial["data"] or {}
+            rows.append(
+                {
+                    "trial_index": trial_index,
+                    "arm_name": f"{trial_index}_0",
+                    "trial_status": "COMPLETED" if trial["data"] else "RUNNING",
+                    "generation_method": "Mock",
+                    **{
+                        name: data.get(name, (math.nan,))[0]
+                        for name in self._objectives
+                    },
+                    **trial["parameters"],
+                }
+            )
+        return pd.DataFrame(rows)
+
+
+class _Anything:
+    """Accepts any attribute access and call (for plotting code)."""
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def subplots(self, *args, **kwargs):
+        return self, self
+
+
+# module -> names it provides, as imported by the generated scripts
+MODULES = {
+    "ax.service.ax_client": ["AxClient", "ObjectiveProperties"],
+    "ax.modelbridge.factory": ["Models"],
+    "ax.modelbridge.generation_strategy": ["GenerationStep", "GenerationStrategy"],
+    "ax.modelbridge.registry": ["Models", "Specified_Task_ST_MTGP_trans"],
+    "ax.core.observation": ["ObservationFeatures"],
+    "botorch.acquisition": ["UpperConfidenceBound"],
+}
+
+
+def make_modules(plots: bool = True) -> Dict[str, types.ModuleType]:
+    """
+    Return stand-in modules (including their parent packages) keyed by name. If
+    `plots` is True, ``matplotlib.pyplot`` is replaced too, by a stand-in that
+    accepts any call without drawing.
+    """
+    modules: Dict[str, types.ModuleType] = {}
+
+    def get_module(name):
+        if name not in modules:
+            modules[name] = types.ModuleType(name)
+            parent, _, child = name.rpartition(".")
+            if parent:
+                setattr(get_module(parent), child, modules[name])
+        return modules[name]
+
+    for name, attributes in MODULES.items():
+        module = get_module(name)
+        for attribute in attributes:
+            setattr(module, attribute, globals()[attribute])
+
+    if plots:
+        pyplot = get_module("matplotlib.pyplot")
+        pyplot.__getattr__ = _Anything().__getattr__
+        pyplot.subplots = _Anything().subplots
+    return modules
+
+
+@contextlib.contextmanager
+def mock_ax(plots: bool = True):
+    """
+    Context manager that installs the stand-in modules in ``sys.modules`` and
+    yields the list of ``AxClient`` instances created within it.
+    """
+    global _clients
+    modules = make_modules(plots=plots)
+    saved = {name: sys.modules.get(name) for name in modules}
+    saved_clients = _clients
+    _clients = []
+    sys.modules.update(modules)
+    try:
+        yield _clients
+    finally:
+        _clients = saved_clients
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def run_script(source: str, name: str = "<script>", plots: bool = True):
+    """
+    Execute a script against the stand-in modules (see
+    :func:`~honegumi.core.utils.testing.exec_script` for the returned dict,
+    which additionally holds the ``calls`` of each ``AxClient``).
+    """
+    with mock_ax(plots=plots) as clients:
+        result = exec_script(source, name)
+    result["calls"] = [client.calls for client in clients]
+    return result
@@ -7,26 +7,54 @@ References:
 """
 
 import argparse
+import contextlib
+import functools
+import json
 import logging
 import os
 import sys
+import threading
 import warnings
 from itertools import product
-from typing import Any, Dict, List, Tuple, Union
-
-from black import FileMode, format_file_contents
-from jinja2 import Environment, FileSystemLoader, StrictUndefined
-from pydantic import BaseModel, Field, create_model
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+import honegumi
 import honegumi.core.utils.constants as core_cst
-from honegumi import __version__
 from honegumi.ax._ax import (
     add_model_specific_keys,
+    derived_keys,
     extra_jinja_var_names,
-    is_incompatible,
-    model_kwargs_test_override,
-    option_rows,
 )
+from honegumi.ax._ax import incompatible_rules as default_incompatible_rules
+from honegumi.ax._ax import is_incompatible, model_kwargs_test_override, option_rows
+from honegumi.ax._ax import rule_set as default_rule_set
+from honegumi.core.utils.cache import RenderCache, canonical_json, hash_text
+from honegumi.core.utils.fragments import FragmentRenderer
+from honegumi.core.utils.index import CompatibilityIndex
+from honegumi.core.utils.metrics import NULL_TIMER, StageTimer
+from honegumi.core.utils.notebooks import NOTEBOOK_TEMPLATE_NAME, script_to_notebook
+from honegumi.core.utils.rules import RuleSet, predicate_test
+from honegumi.core.utils.selection import SelectionSpec
+from honegumi.core.utils.specialize import specialize_template
+from honegumi.core.utils.templates import make_env, template_source_hash
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+    from pydantic import BaseModel
+
+# NOTE: black, jinja2 and pydantic are imported where they are first needed so
+# that importing this module and constructing `Honegumi` stay cheap (CLI and
+# serverless cold starts); see scripts/benchmark_import.py
 
 __author__ = "sgbaird"
 __copyright__ = "sgbaird"
@@ -47,6 +75,18 @@ except Exception:
 
 # ---- Python API ----
 
+FORMAT_MODES = ("black", "verified", "none")
+
+
+def format_script(script: str) -> str:
+    """Apply black formatting to a rendered script (imports black on first use)."""
+    from black import FileMode, NothingChanged, format_file_contents
+
+    try:
+        return format_file_contents(script, fast=False, mode=FileMode())
+    except NothingChanged:
+        return script
+
 
 def gen_combs_with_keys(
     visible_option_names: List[str], visible_option_rows: List[dict]
@@ -88,15 +128,113 @@ def gen_combs_with_keys(
         {"color": "blue", "size": "large"},
     ]
     """
-    all_opts = [
-        dict(zip(visible_option_names, v))
-        for v in product(*[row["options"] for row in visible_option_rows])
-    ]
+    all_opts = list(iter_combs_with_keys(visible_option_names, visible_option_rows))
 
     return all_opts
 
 
+def iter_combs_with_keys(
+    visible_option_names: List[str], visible_option_rows: List[dict]
+) -> Iterator[dict]:
+    """
+    Lazily generate the combinations of options produced by
+    :func:`gen_combs_with_keys`, one dictionary at a time.
+    """
+    for v in product(*[row["options"] for row in visible_option_rows]):
+        yield dict(zip(visible_option_names, v))
+
+
+def gen_pruned_combs_with_keys(
+    visible_option_names: List[str],
+    visible_option_rows: List[dict],
+    rules: List[Dict[str, Any]] = (),
+    shard_index: int = 0,
+    num_shards: int = 1,
+) -> Iterator[dict]:
+    """
+    Lazily generate the combinations of :func:`gen_combs_with_keys`, skipping
+    whole subtrees that match an incompatibility rule as soon as every option
+    the rule refers to has been assigned.
+
+    Parameters
+    ----------
+    visible_option_names : list of str
+        Option names, used as the keys of the output dictionaries.
+    visible_option_rows : list of dict
+        Option rows, each containing an 'options' list.
+    rules : list of dict, optional
+        Incompatibility rules, each a dict of option=value predicates that are
+        incompatible when all of them hold (e.g., ``{"objective": "Single",
+        "custom_threshold": True}``, see
+        :class:`~honegumi.core.utils.rules.RuleSet`). Rules that refer to
+        options outside of `visible_option_names` (e.g., derived keys) cannot be
+        decided while enumerating and are ignored.
+    shard_index, num_shards : int, optional
+        Only yield the combinations whose position in the full (unpruned)
+        product is congruent to `shard_index` modulo `num_shards`. Shards are
+        deterministic and disjoint, so independent workers can split the space
+        without coordinating.
+
+    Yields
+    ------
+    dict
+        Combinations in the same order as :func:`gen_combs_with_keys`.
+
+    Examples
+    --------
+    >>> names = ["objective", "custom_threshold"]
+    >>> rows = [{"options": ["Single", "Multi"]}, {"options": [False, True]}]
+    >>> rules = [{"objective": "Single", "custom_threshold": True}]
+    >>> list(gen_pruned_combs_with_keys(names, rows, rules))
+    [
+        {"objective": "Single", "custom_threshold": False},
+        {"objective": "Multi", "custom_threshold": False},
+        {"objective": "Multi", "custom_threshold": True},
+    ]
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+
+    names = list(visible_option_names)
+    options = [row["options"] for row in visible_option_rows]
+    position = {name: i for i, name in enumerate(names)}
+
+    strides = [1] * len(options)
+    for i in range(len(options) - 2, -1, -1):
+        strides[i] = strides[i + 1] * len(options[i + 1])
+
+    # check each rule as soon as its last option has been assigned
+    rules_by_depth = [[] for _ in names]
+    for rule in rules:
+        if rule and all(name in position for name in rule):
+            depth = max(position[name] for name in rule)
+            rules_by_depth[depth].append(
+                [(name, predicate_test(value)) for name, value in rule.items()]
+            )
+
+    config = {}
+
+    def visit(depth, code):
+        if depth == len(names):
+            if code % num_shards == shard_index:
+                yield dict(config)
+            return
+        name = names[depth]
+        for digit, option in enumerate(options[depth]):
+            config[name] = option
+            if not any(
+                all(test(config[key]) for key, test in rule)
+                for rule in rules_by_depth[depth]
+            ):
+                yield from visit(depth + 1, code + digit * strides[depth])
+        del config[name]
+
+    yield from visit(0, 0)
+
+
 def create_options_model(option_rows: List[Dict[str, Any]]):
+    from pydantic import Field, create_model
+
     fields = {}
 
     for row in option_rows:
@@ -153,22 +291,70 @@ class Honegumi:
         is_incompatible_fn=is_incompatible,
         add_model_specific_keys_fn=add_model_specific_keys,
         model_kwargs_test_override_fn=model_kwargs_test_override,
+        incompatible_rules=default_incompatible_rules,
         dummy=None,
         skip_tests=None,
+        use_index=True,
+        cache_size=128,
+        cache_dir=None,
+        format="black",
+        script_compiled_template_dir=None,
+        core_compiled_template_dir=None,
+        bytecode_cache_dir=None,
+        fragment_cache=False,
+        metrics_callback=None,
     ):
         self.cst = cst
 
+        if format not in FORMAT_MODES:
+            raise ValueError(f"format must be one of {FORMAT_MODES}, got {format!r}")
+
         self.output_dir = output_dir
         self.output_name = output_name
 
         self.is_incompatible_fn = is_incompatible_fn
         self.add_model_specific_keys_fn = add_model_specific_keys_fn
         self.model_kwargs_test_override_fn = model_kwargs_test_override_fn
+        self.incompatible_rules = incompatible_rules
+        # declarative equivalent of `is_incompatible_fn` (after
+        # `add_model_specific_keys_fn`), used to build the compatibility index
+        # in one vectorized pass. Only for the default functions, whose checks
+        # `incompatible_rules` then describe in full (as the default rules do)
+        self.rule_set = None
+        if (
+            is_incompatible_fn is is_incompatible
+            and add_model_specific_keys_fn is add_model_specific_keys
+        ):
+            if incompatible_rules is default_incompatible_rules:
+                self.rule_set = default_rule_set
+            else:
+                self.rule_set = RuleSet(incompatible_rules, derived_keys)
+        # the check behind `is_compatible` and `process_selections`, the rule set
+        # if there is one, so that the index and rendering always agree
+        self._is_incompatible = (
+            is_incompatible_fn if self.rule_set is None else self.rule_set.matches
+        )
 
         self.option_rows = option_rows
 
-        # Generate the Pydantic options model dynamically
-        self.OptionsModel = create_options_model(option_rows)
+        # the Pydantic options model, Jinja environments and templates are
+        # created on first use (see the properties below), under a lock so that
+        # an instance can be shared between threads. Rendering itself only
+        # works on per-call dicts (e.g., `add_model_specific_keys_fn` mutates
+        # the selections of the current call only)
+        self._lock = threading.RLock()
+        self._OptionsModel = None
+        self._env = None
+        self._template = None
+        self._core_env = None
+        self._core_template = None
+        self._fragment_renderer = None
+        self._selection_spec = None
+        self.fragment_cache = fragment_cache
+
+        # opt-in instrumentation, called with one event dict per `generate` and
+        # `get_deviating_options` call (see honegumi.core.utils.metrics)
+        self.metrics_callback = metrics_callback
 
         if dummy is None:
             dummy = os.getenv("SMOKE_TEST", "False").lower() == "true"
@@ -185,21 +371,13 @@ class Honegumi:
         if skip_tests:
             print("SKIPPING TESTS")
 
-        self.env = Environment(
-            loader=FileSystemLoader(script_template_dir),
-            undefined=StrictUndefined,
-            keep_trailing_newline=True,
-        )
-
-        self.template = self.env.get_template(script_template_name)
-
-        self.core_env = Environment(
-            loader=FileSystemLoader(core_template_dir),
-            undefined=StrictUndefined,
-            keep_trailing_newline=True,
-        )
-
-        self.core_template = self.core_env.get_template(core_template_name)
+        self.script_template_dir = script_template_dir
+        self.script_template_name = script_template_name
+        self.core_template_dir = core_template_dir
+        self.core_template_name = core_template_name
+        self.script_compiled_template_dir = script_compiled_template_dir
+        self.core_compiled_template_dir = core_compiled_template_dir
+        self.bytecode_cache_dir = bytecode_cache_dir
 
         # remove the options where disable is True, and print disabled options (keep
         # track of disabled option names and default values)
@@ -239,20 +417,289 @@ class Honegumi:
 
         self.jinja_option_rows = [row for row in self.visible_option_rows]
 
-    def process_selections(self, options_model: BaseModel):
-        # You can check if selections is an instance of the expected type
-        if not isinstance(options_model, self.OptionsModel):
-            warnings.warn(f"Expected {self.OptionsModel}, got {type(options_model)}")
+        # rendered scripts are cached by selections; the salt captures everything
+        # else the output depends on so that stale entries are never served
+        self.render_cache = (
+            RenderCache(maxsize=cache_size, cache_dir=cache_dir)
+            if cache_size > 0 or cache_dir is not None
+            else None
+        )
+        self.template_hash = template_source_hash(
+            script_template_dir, script_template_name, script_compiled_template_dir
+        )
+
+        # "verified" skips black at runtime, which is only safe if
+        # `verify_formatting` has confirmed that black leaves the output of this
+        # exact template, options and rules unchanged
+        if format == "verified" and not self._has_verified_record():
+            warnings.warn(
+                f"No formatting verification record matches {script_template_name}."
+                " Falling back to black; run `verify_formatting(write_record=True)`"
+                " to enable format='verified'."
+            )
+            format = "black"
+        self.format = format
+        self._cache_salt = None
 
-        # Convert validated selections to a dict
-        selections = options_model.model_dump()
+        # built lazily on first use, see `index`
+        self.use_index = use_index
+        self._index = None
+        self._free_hidden_option_names = None
+
+    @property
+    def cache_salt(self) -> str:
+        """
+        Hash of everything besides the selections that the rendered output
+        depends on (template, option rows, honegumi version, formatting).
+        """
+        if self._cache_salt is None:
+            with self._lock:
+                if self._cache_salt is None:
+                    self._cache_salt = hash_text(
+                        canonical_json(
+                            {
+                                "template": self.template_hash,
+                                "option_rows": hash_text(
+                                    canonical_json(self.option_rows)
+                                ),
+                                "version": honegumi.__version__,
+                                "format": self.format,
+                            }
+                        )
+                    )
+        return self._cache_salt
+
+    @property
+    def OptionsModel(self):
+        """Pydantic model of the options, generated dynamically on first use."""
+        if self._OptionsModel is None:
+            with self._lock:
+                if self._OptionsModel is None:
+                    self._OptionsModel = create_options_model(self.option_rows)
+        return self._OptionsModel
+
+    @property
+    def env(self) -> "Environment":
+        if self._env is None:
+            with self._lock:
+                if self._env is None:
+                    self._env = make_env(
+                        self.script_template_dir,
+                        compiled_template_dir=self.script_compiled_template_dir,
+                        bytecode_cache_dir=self.bytecode_cache_dir,
+                    )
+        return self._env
+
+    @property
+    def template(self) -> "Template":
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    self._template = self.env.get_template(self.script_template_name)
+        return self._template
+
+    @property
+    def fragment_renderer(self) -> FragmentRenderer:
+        """
+        Fragment-level renderer of the script template (see
+        :class:`~honegumi.core.utils.fragments.FragmentRenderer`), used instead
+        of the whole template when ``fragment_cache=True``.
+        """
+        if self._fragment_renderer is None:
+            with self._lock:
+                if self._fragment_renderer is None:
+                    path = os.path.join(
+                        self.script_template_dir, self.script_template_name
+                    )
+                    with open(path) as f:
+                        source = f.read()
+                    self._fragment_renderer = FragmentRenderer(self.env, source)
+        return self._fragment_renderer
+
+    def render_template(self, selections: Dict[str, Any]) -> str:
+        """Render the script template for processed selections, unformatted."""
+        if self.fragment_cache:
+            return self.fragment_renderer.render(selections)
+        return self.template.render(selections)
+
+    @property
+    def core_env(self) -> "Environment":
+        if self._core_env is None:
+            with self._lock:
+                if self._core_env is None:
+                    self._core_env = make_env(
+                        self.core_template_dir,
+                        compiled_template_dir=self.core_compiled_template_dir,
+                        bytecode_cache_dir=self.bytecode_cache_dir,
+                    )
+        return self._core_env
+
+    @property
+    def core_template(self) -> "Template":
+        if self._core_template is None:
+            with self._lock:
+                if self._core_template is None:
+                    self._core_template = self.core_env.get_template(
+                        self.core_template_name
+                    )
+        return self._core_template
+
+    @property
+    def index(self) -> CompatibilityIndex:
+        """
+        Compatibility index over every combination of visible options, built
+        once on first access (see :class:`CompatibilityIndex`).
+        """
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = CompatibilityIndex(
+                        self.visible_option_names,
+                        self.visible_option_rows,
+                        self._is_compatible_slow,
+                        valid=self._valid_mask(),
+                    )
+        return self._index
+
+    def _valid_mask(self):
+        """
+        Compatibility of every combination of visible options from `rule_set`
+        in one vectorized pass, or None if there is no rule set (or it refers to
+        something else, or NumPy isn't installed).
+        """
+        if self.rule_set is None:
+            return None
+        # hidden and disabled options take their defaults
+        constants = {row["name"]: row["options"][0] for row in self.option_rows}
+        options = [row["options"] for row in self.visible_option_rows]
+        try:
+            mask = self.rule_set.incompatible_mask(
+                self.visible_option_names, options, constants
+            )
+        except (KeyError, ImportError):
+            return None
+        return ~mask
+
+    def _is_compatible_slow(self, config: dict) -> bool:
+        return self._selections(config)[core_cst.IS_COMPATIBLE_KEY]
+
+    @property
+    def selection_spec(self) -> SelectionSpec:
+        if self._selection_spec is None:
+            with self._lock:
+                if self._selection_spec is None:
+                    self._selection_spec = SelectionSpec(self.option_rows)
+        return self._selection_spec
+
+    def select(self, config: dict):
+        """
+        Validate an option dict against the option rows and return it as a
+        compact, hashable ``Selection`` (see
+        :class:`~honegumi.core.utils.selection.SelectionSpec`), which
+        :meth:`process_selections` and :meth:`generate` accept in place of an
+        :attr:`OptionsModel` without going through pydantic.
+
+        Raises
+        ------
+        ValueError
+            If `config` has unknown options or values outside of the options of
+            their row (use :attr:`OptionsModel` to coerce such input).
+        """
+        return self.selection_spec.select(config)
+
+    def _selections(self, config: dict, timer=NULL_TIMER) -> Dict[str, Any]:
+        # fast path for option values, pydantic for anything needing coercion
+        try:
+            selection = self.select(config)
+        except ValueError:
+            selection = self.OptionsModel(**config)
+        timer.lap("validate")
+        return self._process_selections(selection, timer)
+
+    def _new_timer(self):
+        return NULL_TIMER if self.metrics_callback is None else StageTimer()
+
+    def _emit_metrics(self, call: str, timer: StageTimer, output_size: int, **extra):
+        self.metrics_callback(
+            {
+                "call": call,
+                "stages": timer.stages,
+                "total_s": timer.total(),
+                "output_size": output_size,
+                **extra,
+            }
+        )
+
+    @property
+    def free_hidden_option_names(self) -> List[str]:
+        """
+        Hidden options that are not overridden by `add_model_specific_keys_fn`
+        (e.g., ``custom_gen`` is derived from ``model`` and so is not "free").
+        """
+        if self._free_hidden_option_names is None:
+            with self._lock:
+                if self._free_hidden_option_names is None:
+                    sentinel = object()
+                    opt = {row["name"]: row["options"][0] for row in self.option_rows}
+                    hidden_names = [
+                        row["name"] for row in self.active_option_rows if row["hidden"]
+                    ]
+                    opt.update({name: sentinel for name in hidden_names})
+                    self.add_model_specific_keys_fn(self.active_option_names, opt)
+                    self._free_hidden_option_names = [
+                        name for name in hidden_names if opt[name] is sentinel
+                    ]
+        return self._free_hidden_option_names
+
+    def _encode(self, config: dict):
+        """
+        Return the index code for `config`, or None if the index cannot answer
+        for it (index disabled, values outside of the option rows, or free
+        hidden options set to something other than their defaults).
+        """
+        if not self.use_index:
+            return None
+        defaults = {row["name"]: row["options"][0] for row in self.option_rows}
+        for name in self.free_hidden_option_names:
+            if name in config and config[name] != defaults[name]:
+                return None
+        return self.index.encode(config)
+
+    def is_compatible(self, config: dict) -> bool:
+        """
+        Check whether a configuration (keyed by option name) is compatible,
+        using the precomputed index when possible.
+        """
+        code = self._encode(config)
+        if code is None:
+            return self._is_compatible_slow(config)
+        return self.index.is_valid(code)
+
+    def process_selections(self, options_model: "BaseModel"):
+        return self._process_selections(options_model, NULL_TIMER)
+
+    def _process_selections(self, options_model: "BaseModel", timer):
+        if isinstance(options_model, self.selection_spec.Selection):
+            # already validated by `select`
+            selections = options_model._asdict()
+        else:
+            # You can check if selections is an instance of the expected type
+            if not isinstance(options_model, self.OptionsModel):
+                warnings.warn(
+                    f"Expected {self.OptionsModel}, got {type(options_model)}"
+                )
+
+            # Convert validated selections to a dict
+            selections = options_model.model_dump()
 
         # set the default values for the disabled options
         for default in self.disabled_option_defaults:
             selections.update(default)
+        timer.lap("selections")
 
         # in-place operation
         self.add_model_specific_keys_fn(self.active_option_names, selections)
+        timer.lap("add_model_specific_keys")
 
         # NOTE: Decided to always keep dummy key false for scripts (as opposed to tests)
         selections[core_cst.DUMMY_KEY] = False
@@ -261,37 +708,378 @@ class Honegumi:
             var_name: selections[var_name] for var_name in self.jinja_var_names
         }
 
-        selections[core_cst.IS_COMPATIBLE_KEY] = not self.is_incompatible_fn(selections)
+        selections[core_cst.IS_COMPATIBLE_KEY] = not self._is_incompatible(selections)
+        timer.lap("is_incompatible")
 
         return selections
 
     def generate(
-        self, options_model: BaseModel, return_selections=False
+        self, options_model: "BaseModel", return_selections=False
     ) -> Union[str, Tuple[str, Dict[str, Any]]]:
 
-        selections = self.process_selections(options_model)
-
-        if self.is_incompatible_fn(selections):
-            # override
-            script = "INVALID: The parameters you have selected are incompatible, either from not being implemented or being logically inconsistent."  # noqa E501
-
-        else:
-            script = self.template.render(selections)
-            # apply black formatting
-            script = format_file_contents(script, fast=False, mode=FileMode())
+        timer = self._new_timer()
+        selections = self._process_selections(options_model, timer)
+        script, cache_hit = self._render_selections(selections, timer)
+        if self.metrics_callback is not None:
+            self._emit_metrics(
+                "generate",
+                timer,
+                len(script),
+                cache_hit=cache_hit,
+                is_compatible=selections[core_cst.IS_COMPATIBLE_KEY],
+            )
 
         if return_selections:
             return script, selections
 
         return script
 
+    def _render_selections(
+        self, selections: Dict[str, Any], timer=NULL_TIMER
+    ) -> Tuple[str, Optional[bool]]:
+        """Return the script and whether it came from the render cache (None if
+        no cache was consulted)."""
+        if not selections[core_cst.IS_COMPATIBLE_KEY]:
+            # override
+            return core_cst.INVALID_MESSAGE, None
+
+        key = None
+        script = None
+        if self.render_cache is not None:
+            key = self.render_cache.make_key(selections, salt=self.cache_salt)
+            script = self.render_cache.get(key)
+            timer.lap("cache_lookup")
+        cache_hit = None if key is None else script is not None
+
+        if script is None:
+            script = self.render_template(selections)
+            timer.lap("render")
+            if self.format == "black":
+                script = format_script(script)
+                timer.lap("format")
+            if key is not None:
+                self.render_cache.set(key, script)
+                timer.lap("cache_store")
+
+        return script, cache_hit
+
+    def generate_many(
+        self, configs: Iterable[Union[dict, "BaseModel"]], return_selections=False
+    ) -> List[Union[str, Tuple[str, Dict[str, Any]]]]:
+        """
+        Generate scripts for many configurations at once, in input order.
+
+        Configurations are processed into selections first, and each distinct
+        set of selections (e.g., configurations that only differ in options
+        that don't affect the output, or plain duplicates) is rendered and
+        formatted only once.
+
+        Parameters
+        ----------
+        configs : iterable of dict, OptionsModel or Selection
+            Configurations, either as option dicts (missing options take their
+            defaults) or as :attr:`OptionsModel` or ``Selection`` instances.
+        return_selections : bool, optional
+            If True, return ``(script, selections)`` tuples, as
+            :meth:`generate` does.
+
+        Returns
+        -------
+        list
+            One script (or tuple) per configuration.
+        """
+        scripts: Dict[str, str] = {}
+        results = []
+        for config in configs:
+            timer = self._new_timer()
+            if isinstance(config, dict):
+                selections = self._selections(config, timer)
+            else:
+                selections = self._process_selections(config, timer)
+            key = canonical_json(selections)
+            if key in scripts:
+                # a duplicate within this batch counts as a cache hit
+                cache_hit = True
+            else:
+                scripts[key], cache_hit = self._render_selections(selections, timer)
+            script = scripts[key]
+            if self.metrics_callback is not None:
+                timer.lap("dedupe")
+                self._emit_metrics(
+                    "generate",
+                    timer,
+                    len(script),
+                    cache_hit=cache_hit,
+                    is_compatible=selections[core_cst.IS_COMPATIBLE_KEY],
+                )
+            results.append((script, selections) if return_selections else script)
+        return results
+
+    async def agenerate(
+        self, options_model: "BaseModel", return_selections=False, executor=None
+    ) -> Union[str, Tuple[str, Dict[str, Any]]]:
+        """
+        Coroutine version of :meth:`generate` that renders in `executor` (the
+        event loop's default thread pool if None), so that the event loop is not
+        blocked while the script is rendered and formatted.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(self.generate, options_model, return_selections)
+        )
+
+    def iter_valid_configs(self, shard_index=0, num_shards=1) -> Iterator[dict]:
+        """
+        Lazily generate every valid combination of visible options.
+
+        Subtrees matching `incompatible_rules` are skipped during enumeration
+        (see :func:`gen_pruned_combs_with_keys`), and the remaining candidates
+        are fully validated, so the rules only need to be a subset of what
+        `is_incompatible_fn` rejects. `shard_index` and `num_shards` select a
+        deterministic, disjoint share of the space.
+        """
+        configs = gen_pruned_combs_with_keys(
+            self.visible_option_names,
+            self.visible_option_rows,
+            self.incompatible_rules,
+            shard_index=shard_index,
+            num_shards=num_shards,
+        )
+        for config in configs:
+            # avoid building the full index just to enumerate
+            if self._index is not None:
+                valid = self.is_compatible(config)
+            else:
+                valid = self._is_compatible_slow(config)
+            if valid:
+                yield config
+
+    def specialize(self, fixed: Dict[str, Any], output_dir: str, **kwargs):
+        """
+        Create a Honegumi instance whose script template is partially evaluated
+        for pinned option values (see
+        :func:`~honegumi.core.utils.specialize.specialize_template`).
+
+        Besides the pinned options, any option (including hidden ones derived by
+        `add_model_specific_keys_fn`) that takes the same value in every valid
+        configuration matching the pins is treated as fixed too. The pinned rows
+        are disabled in the returned instance, with the pinned value as their
+        only option, so it generates the same scripts as this instance does for
+        matching configurations.
+
+        Parameters
+        ----------
+        fixed : dict
+            Pinned values of visible options, e.g.,
+            ``{"objective": "Multi", "model": "Fully Bayesian"}``.
+        output_dir : str
+            Directory the specialized template is written to (under the same
+            name as the original), e.g., to ship it as a build artifact.
+        **kwargs
+            Further keyword arguments for the new :class:`Honegumi` instance
+            (e.g., ``cache_size`` or ``format``).
+
+        Returns
+        -------
+        Honegumi
+        """
+        unknown = set(fixed) - {row["name"] for row in self.option_rows}
+        if unknown:
+            raise ValueError(f"Unknown options: {sorted(unknown)}")
+
+        rows = []
+        for row in self.option_rows:
+            if row["name"] in fixed:
+                if row["name"] not in self.visible_option_names:
+                    raise ValueError(
+                        f"Only visible options can be pinned: {row['name']}"
+                    )
+                value = fixed[row["name"]]
+                if value not in row["options"]:
+                    raise ValueError(
+                        f"{value!r} is not an option of {row['name']}: {row['options']}"
+                    )
+                row = {**row, "options": [value], "disable": True}
+            rows.append(row)
+
+        # option values that are the same across all matching valid configs
+        option_names = [row["name"] for row in self.option_rows]
+        constants = None
+        configs = gen_pruned_combs_with_keys(
+            self.visible_option_names,
+            [rows[option_names.index(name)] for name in self.visible_option_names],
+            self.incompatible_rules,
+        )
+        for config in configs:
+            selections = self.process_selections(self.select(config))
+            if not selections[core_cst.IS_COMPATIBLE_KEY]:
+                continue
+            values = {k: v for k, v in selections.items() if k in option_names}
+            if constants is None:
+                constants = values
+            else:
+                constants = {k: v for k, v in constants.items() if values[k] == v}
+        if constants is None:
+            raise ValueError(f"No valid configuration matches {fixed}")
+
+        path = os.path.join(self.script_template_dir, self.script_template_name)
+        with open(path) as f:
+            source = f.read()
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, self.script_template_name), "w") as f:
+            f.write(specialize_template(self.env, source, constants))
+
+        return Honegumi(
+            self.cst,
+            option_rows=rows,
+            script_template_dir=output_dir,
+            script_template_name=self.script_template_name,
+            core_template_dir=self.core_template_dir,
+            core_template_name=self.core_template_name,
+            output_dir=self.output_dir,
+            output_name=self.output_name,
+            is_incompatible_fn=self.is_incompatible_fn,
+            add_model_specific_keys_fn=self.add_model_specific_keys_fn,
+            model_kwargs_test_override_fn=self.model_kwargs_test_override_fn,
+            incompatible_rules=self.incompatible_rules,
+            dummy=self.dummy,
+            skip_tests=self.skip_tests,
+            **kwargs,
+        )
+
+    @property
+    def verified_record_path(self) -> str:
+        return os.path.join(
+            self.script_template_dir, self.script_template_name + ".verified"
+        )
+
+    @property
+    def verified_record_key(self) -> str:
+        """
+        Hash of everything besides the selections that decides whether black
+        would reformat the rendered output (template, option rows, rules,
+        honegumi and black versions), as kept in the verification record.
+        """
+        # the installed version rather than `black.__version__`, so that
+        # checking the record doesn't import black
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            black_version = version("black")
+        except PackageNotFoundError:
+            black_version = None
+        return hash_text(
+            canonical_json(
+                {
+                    "template": self.template_hash,
+                    "option_rows": hash_text(canonical_json(self.option_rows)),
+                    "incompatible_rules": hash_text(
+                        canonical_json(self.incompatible_rules)
+                    ),
+                    "version": honegumi.__version__,
+                    "black": black_version,
+                }
+            )
+        )
+
+    def _has_verified_record(self) -> bool:
+        try:
+            with open(self.verified_record_path) as f:
+                return f.read().strip() == self.verified_record_key
+        except OSError:
+            return False
+
+    def verify_formatting(self, write_record=False, max_diffs=3) -> int:
+        """
+        Build-time check that black leaves every valid rendered script unchanged.
+
+        Renders every valid configuration without formatting and compares the
+        result against black's output. If they all match, the runtime can use
+        ``format="verified"`` and never import black.
+
+        Parameters
+        ----------
+        write_record : bool, optional
+            If True and verification passes, write
+            :attr:`verified_record_key` next to the template so that
+            ``format="verified"`` is accepted for it (until the template, option
+            rows, rules, honegumi or black change).
+        max_diffs : int, optional
+            Maximum number of diffs included in the error message.
+
+        Returns
+        -------
+        int
+            The number of valid configurations that were verified.
+
+        Raises
+        ------
+        ValueError
+            If black changes any rendered script. The message contains unified
+            diffs for (up to `max_diffs` of) the offending configurations.
+        """
+        import difflib
+
+        num_verified = 0
+        num_failed = 0
+        diffs = []
+        for code in range(self.index.size):
+            if not self.index.is_valid(code):
+                continue
+            config = self.index.decode(code)
+            selections = self.process_selections(self.select(config))
+            rendered = self.render_template(selections)
+            formatted = format_script(rendered)
+            num_verified += 1
+            if formatted != rendered:
+                num_failed += 1
+                if len(diffs) < max_diffs:
+                    diff = difflib.unified_diff(
+                        rendered.splitlines(keepends=True),
+                        formatted.splitlines(keepends=True),
+                        fromfile=f"rendered {config}",
+                        tofile="black",
+                    )
+                    diffs.append("".join(diff))
+
+        if num_failed:
+            raise ValueError(
+                f"black reformatted {num_failed} of {num_verified} rendered "
+                f"scripts for {self.script_template_name}:\n" + "\n".join(diffs)
+            )
+
+        if write_record:
+            with open(self.verified_record_path, "w") as f:
+                f.write(self.verified_record_key + "\n")
+
+        return num_verified
+
     def get_deviating_options(self, current_config: dict):
         """
         Get the options that deviate by zero or one elements from the current
         configuration based on the invalid configurations.
         """
-
-        current_config = self.process_selections(self.OptionsModel(**current_config))
+        timer = self._new_timer()
+        code = self._encode(current_config)
+        timer.lap("encode")
+        if code is not None:
+            deviating_options = self.index.invalid_flips(code)
+            if not self.index.is_valid(code):
+                current = self.index.decode(code)
+                deviating_options.extend({k: v} for k, v in current.items())
+            if self.metrics_callback is not None:
+                timer.lap("index")
+                self._emit_metrics(
+                    "get_deviating_options",
+                    timer,
+                    len(deviating_options),
+                    cache_hit=True,
+                )
+            return deviating_options
+
+        current_config = self._selections(current_config)
         current_is_valid = current_config[core_cst.IS_COMPATIBLE_KEY]
         current_config = {key: current_config[key] for key in self.visible_option_names}
 
@@ -303,8 +1091,7 @@ class Honegumi:
                 if str(option) != str(current_config[option_name]):
                     new_config = current_config.copy()
                     new_config[option_name] = option
-                    model = self.OptionsModel(**new_config)
-                    new_config = self.process_selections(model)
+                    new_config = self._selections(new_config)
                     # log_fn(f"New config: {new_config}")
                     if not new_config[core_cst.IS_COMPATIBLE_KEY]:
                         new_config = {
@@ -348,6 +1135,15 @@ class Honegumi:
             for name, value in current_config.items():
                 deviating_options.append({name: value})
 
+        if self.metrics_callback is not None:
+            timer.lap("fallback")
+            self._emit_metrics(
+                "get_deviating_options",
+                timer,
+                len(deviating_options),
+                cache_hit=False if self.use_index else None,
+            )
+
         return deviating_options
 
 
@@ -356,23 +1152,109 @@ class Honegumi:
 # API allowing them to be called directly from the terminal as a CLI
 # executable/script.
 
-# NOTE: Still just a placeholder, might be discarded entirely
+
+# package-relative template directories, so that the CLI works from any directory
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
-def fib(n):
-    """Fibonacci example function (just to demo CLI usage)
+def make_cli_honegumi(args) -> Honegumi:
+    """Create the Honegumi instance used by the CLI (one per process)
 
     Args:
-      n (int): integer
+      args (:obj:`argparse.Namespace`): parsed ``generate`` arguments
+    """
+    import honegumi.ax.utils.constants as ax_cst
+
+    # Honegumi reports disabled options etc. with print, keep stdout for data
+    with contextlib.redirect_stdout(sys.stderr):
+        return Honegumi(
+            ax_cst,
+            script_template_dir=os.path.join(PACKAGE_DIR, "ax"),
+            core_template_dir=os.path.join(PACKAGE_DIR, "core"),
+            format=args.format,
+            cache_dir=args.cache_dir,
+        )
+
+
+def iter_input_lines(args):
+    """Yield the config given on the command line, or each line of stdin"""
+    if args.config is not None:
+        yield args.config
+        return
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def generate(args) -> int:
+    """Render configs as JSON lines on stdout, reusing one Honegumi instance
+
+    Each output line is a JSON object with the input ``config`` and either
+    ``is_compatible`` plus ``script`` (or ``notebook``), or an ``error`` message
+    if the input could not be parsed or validated (unknown options and values
+    outside of their option row are rejected, see :meth:`Honegumi.select`).
+    Lines are flushed as soon as they are rendered, so the command can be used
+    as a streaming filter.
+
+    Args:
+      args (:obj:`argparse.Namespace`): parsed ``generate`` arguments
 
     Returns:
-      int: n-th Fibonacci number
+      int: exit code, 1 if any config failed and 0 otherwise
     """
-    assert n > 0
-    a, b = 1, 1
-    for _i in range(n - 1):
-        a, b = b, a + b
-    return a
+    hg = make_cli_honegumi(args)
+    notebook_template = None
+    if args.notebook:
+        notebook_template = hg.core_env.get_template(NOTEBOOK_TEMPLATE_NAME)
+
+    num_errors = 0
+    for line in iter_input_lines(args):
+        config = line
+        try:
+            config = json.loads(line)
+            if not isinstance(config, dict):
+                raise ValueError(f"Expected a JSON object, got {line}")
+            script, selections = hg.generate(hg.select(config), return_selections=True)
+            record = {
+                "config": config,
+                "is_compatible": selections[core_cst.IS_COMPATIBLE_KEY],
+            }
+            if notebook_template is not None:
+                notebook = script_to_notebook(script, notebook_template)
+                record["notebook"] = json.loads(notebook)
+            else:
+                record["script"] = script
+        except ValueError as e:
+            num_errors += 1
+            _logger.debug("Failed to generate %s", line, exc_info=True)
+            record = {"config": config, "error": f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(record) + "\n")
+        sys.stdout.flush()
+
+    return 1 if num_errors else 0
+
+
+def serve(args) -> int:
+    """Run the HTTP render service until interrupted
+
+    Args:
+      args (:obj:`argparse.Namespace`): parsed ``serve`` arguments
+
+    Returns:
+      int: exit code
+    """
+    from honegumi.core.utils.server import serve as serve_forever
+
+    # only the Honegumi options, so that the factory can be sent to workers
+    honegumi_args = argparse.Namespace(format=args.format, cache_dir=args.cache_dir)
+    serve_forever(
+        functools.partial(make_cli_honegumi, honegumi_args),
+        host=args.host,
+        port=args.port,
+        max_workers=args.workers,
+    )
+    return 0
 
 
 def parse_args(args):
@@ -380,18 +1262,19 @@ def parse_args(args):
 
     Args:
       args (List[str]): command line parameters as list of strings
-          (for example  ``["--help"]``).
+          (for example  ``["generate", "--notebook"]``).
 
     Returns:
       :obj:`argparse.Namespace`: command line parameters namespace
     """
-    parser = argparse.ArgumentParser(description="Just a Fibonacci demonstration")
+    parser = argparse.ArgumentParser(
+        description="Generate Bayesian optimization scripts with Honegumi"
+    )
     parser.add_argument(
         "--version",
         action="version",
-        version=f"honegumi {__version__}",
+        version=f"honegumi {honegumi.__version__}",
     )
-    parser.add_argument(dest="n", help="n-th Fibonacci number", type=int, metavar="INT")
     parser.add_argument(
         "-v",
         "--verbose",
@@ -408,6 +1291,59 @@ def parse_args(args):
         action="store_const",
         const=logging.DEBUG,
     )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate",
+        help="render configs to JSON lines",
+        description=(
+            "Render a config given as a JSON object, or a JSON-lines stream of "
+            "configs read from stdin, and write one JSON line per config to "
+            "stdout. Options that are left out take their default values."
+        ),
+    )
+    generate_parser.set_defaults(func=generate)
+    generate_parser.add_argument(
+        "config",
+        nargs="?",
+        help='config as a JSON object, e.g. \'{"objective": "Multi"}\' '
+        "(default: read JSON lines from stdin)",
+    )
+    generate_parser.add_argument(
+        "--notebook",
+        action="store_true",
+        help="emit Jupyter notebooks instead of scripts",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="run a local HTTP render service",
+        description=(
+            "Serve /generate, /deviating-options and /option-rows over HTTP, "
+            "rendering on a pool of worker processes (see "
+            "honegumi.core.utils.server)."
+        ),
+    )
+    serve_parser.set_defaults(func=serve)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of rendering processes (default: number of CPUs)",
+    )
+
+    for subparser in [generate_parser, serve_parser]:
+        subparser.add_argument(
+            "--format",
+            choices=FORMAT_MODES,
+            default="black",
+            help="formatting of the rendered scripts (default: %(default)s)",
+        )
+        subparser.add_argument(
+            "--cache-dir",
+            help="directory for a persistent cache of rendered scripts",
+        )
     return parser.parse_args(args)
 
 
@@ -419,33 +1355,31 @@ def setup_logging(loglevel):
     """
     logformat = "[%(asctime)s] %(levelname)s:%(name)s:%(message)s"
     logging.basicConfig(
-        level=loglevel, stream=sys.stdout, format=logformat, datefmt="%Y-%m-%d %H:%M:%S"
+        level=loglevel, stream=sys.stderr, format=logformat, datefmt="%Y-%m-%d %H:%M:%S"
     )
 
 
 def main(args):
-    """Wrapper allowing :func:`fib` to be called with string arguments in a CLI fashion
-
-    Instead of returning the value from :func:`fib`, it prints the result to the
-    ``stdout`` in a nicely formatted message.
+    """Wrapper allowing the CLI commands to be called with string arguments
 
     Args:
       args (List[str]): command line parameters as list of strings
-          (for example  ``["--verbose", "42"]``).
+          (for example  ``["generate", '{"objective": "Multi"}']``).
+
+    Returns:
+      int: exit code of the command
     """
     args = parse_args(args)
     setup_logging(args.loglevel)
-    _logger.debug("Starting crazy calculations...")
-    print(f"The {args.n}-th Fibonacci number is {fib(args.n)}")
-    _logger.info("Script ends here")
+    return args.func(args)
 
 
 def run():
     """Calls :func:`main` passing the CLI arguments extracted from :obj:`sys.argv`
 
-    This function can be used as entry point to create console scripts with setuptools.
+    This function is the entry point of the ``honegumi`` console script.
     """
-    main(sys.argv[1:])
+    sys.exit(main(sys.argv[1:]))
 
 
 if __name__ == "__main__":
@@ -457,7 +1391,7 @@ if __name__ == "__main__":
     # After installing your project with pip, users can also run your Python
     # modules as scripts via the ``-m`` flag, as defined in PEP 338::
     #
-    #     python -m honegumi.core.skeleton 42
+    #     python -m honegumi.core._honegumi generate < configs.jsonl
     #
     run()
 
@@ -0,0 +1,151 @@
+"""
+Branch coverage of templates.
+
+:func:`instrument_template` inserts a marker into every ``{% if %}``,
+``{% elif %}`` and ``{% else %}`` body of a template's source, plus an explicit
+``{% else %}`` marker for every ``if`` without one (the branch that skips the
+body), without changing the rendered output. :class:`BranchCoverage` renders
+selections with the instrumented template and reports the branches taken, and
+:meth:`BranchCoverage.covering_configs` selects a small set of configurations
+that together take every branch reachable by any of the candidates, e.g., as a
+cheap pre-merge test tier that still exercises all of the template logic.
+
+Branches are identified as ``"<line>:<column>:<keyword>"`` of their tag (the
+``endif`` tag for implicit ``else`` branches), e.g., ``"107:1:elif"``.
+"""
+
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple
+
+from honegumi.core.utils.covering import greedy_cover
+from honegumi.core.utils.templates import depth_change, tag_keyword, tokenize
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+RECORDER_NAME = "_honegumi_branch"
+
+
+def instrument_template(
+    source: str, recorder_name: str = RECORDER_NAME
+) -> Tuple[str, List[str]]:
+    """
+    Return the instrumented template source and the ids of all of its branches.
+
+    The instrumented template calls ``recorder_name(branch_id)`` (which must
+    return an empty string) whenever a branch body is rendered. Markers carry
+    over the whitespace control of the tags they follow, so the output is
+    unchanged.
+
+    Examples
+    --------
+    >>> source, branches = instrument_template("{% if a -%}\\n A{% endif %}")
+    >>> source
+    '{% if a -%}{{ _honegumi_branch("1:1:if") -}}\\n A{% else %}{{ _honegumi_branch("2:3:endif") }}{% endif %}'
+    >>> branches
+    ['1:1:if', '2:3:endif']
+    """  # noqa: E501
+    out = []
+    branches = []
+    # per open body: [keyword, whether an `if` has an explicit `else`]
+    stack: List[list] = []
+
+    def marker(token, keyword, rstrip=False):
+        line = source.count("\n", 0, token.start) + 1
+        column = token.start - source.rfind("\n", 0, token.start)
+        branch = f"{line}:{column}:{keyword}"
+        branches.append(branch)
+        return '{{ %s("%s") %s}}' % (recorder_name, branch, "-" if rstrip else "")
+
+    for token in tokenize(source):
+        text = source[token.start : token.end]
+        if token.kind != "block":
+            out.append(text)
+            continue
+
+        keyword = tag_keyword(token)
+        in_if = bool(stack) and stack[-1][0] == "if"
+        if keyword == "if":
+            stack.append(["if", False])
+            out.append(text + marker(token, keyword, token.rstrip))
+        elif keyword in ("elif", "else") and in_if:
+            stack[-1][1] = stack[-1][1] or keyword == "else"
+            out.append(text + marker(token, keyword, token.rstrip))
+        elif keyword == "endif":
+            _, has_else = stack.pop()
+            if not has_else:
+                # the implicit else takes over the endif's left whitespace control
+                out.append("{%- else %}" if token.lstrip else "{% else %}")
+                out.append(marker(token, keyword))
+            out.append(text)
+        else:
+            change = depth_change(token)
+            if change > 0:
+                stack.append([keyword, False])
+            elif change < 0:
+                stack.pop()
+            out.append(text)
+
+    if stack:
+        raise ValueError(f"Unclosed tags: {[keyword for keyword, _ in stack]}")
+    return "".join(out), branches
+
+
+class BranchCoverage:
+    def __init__(self, env, source: str):
+        """
+        Branch coverage of a template.
+
+        Parameters
+        ----------
+        env : jinja2.Environment
+            Environment used to compile the instrumented template.
+        source : str
+            The template source.
+        """
+        instrumented, self.branches = instrument_template(source)
+        self.template = env.from_string(instrumented)
+
+    def render(self, selections: Dict[str, Any]) -> Tuple[str, FrozenSet[str]]:
+        """Render `selections` and return the output and the branches taken."""
+        taken = set()
+
+        def record(branch):
+            taken.add(branch)
+            return ""
+
+        output = self.template.render(**selections, **{RECORDER_NAME: record})
+        return output, frozenset(taken)
+
+    def taken(self, selections: Dict[str, Any]) -> FrozenSet[str]:
+        return self.render(selections)[1]
+
+    def covering_configs(
+        self,
+        configs: Iterable[Dict[str, Any]],
+        selections_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Select a small set of configurations that together take every branch
+        taken by any of `configs`.
+
+        Parameters
+        ----------
+        configs : iterable of dict
+            Candidate (e.g., all valid) configurations.
+        selections_fn : callable
+            Maps a configuration to the selections it is rendered with, e.g.,
+            ``lambda config: dummy_selections(hg, config)``.
+
+        Returns
+        -------
+        selected : list of dict
+            The selected configurations.
+        unreachable : list of str
+            Branches that none of `configs` takes.
+        """
+        configs = list(configs)
+        covers = [self.taken(selections_fn(config)) for config in configs]
+        reachable = set().union(*covers)
+        unreachable = [branch for branch in self.branches if branch not in reachable]
+        return [configs[i] for i in greedy_cover(covers)], unreachable
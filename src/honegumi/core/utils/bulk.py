@@ -0,0 +1,122 @@
+"""
+Parallel bulk rendering of many configurations.
+
+Configurations are streamed from an iterable, rendered in batches on a
+``ProcessPoolExecutor`` (each worker builds its own :class:`Honegumi` once via a
+picklable factory), and yielded back in input order. At most ``max_pending``
+batches are in flight at a time, so memory stays flat regardless of how many
+configurations are rendered.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import honegumi.core.utils.constants as core_cst
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+# per-process Honegumi instance, set by `init_worker`
+_worker_hg = None
+
+
+def render_config(hg, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render a single configuration and return its processed selections with the
+    rendered script stored under ``core_cst.RENDERED_KEY``.
+    """
+    script, selections = hg.generate(hg.select(config), return_selections=True)
+    selections[core_cst.RENDERED_KEY] = script
+    return selections
+
+
+def init_worker(make_honegumi: Callable[[], Any]):
+    """
+    ``ProcessPoolExecutor`` initializer building the :class:`Honegumi` instance
+    of a worker process, used by :func:`render_batch`.
+    """
+    global _worker_hg
+    _worker_hg = make_honegumi()
+
+
+def render_batch(
+    configs: List[Dict[str, Any]], render_fn: Callable = render_config
+) -> List[Any]:
+    """
+    Apply ``render_fn(hg, config)`` to each configuration in a worker process
+    set up by :func:`init_worker`.
+    """
+    return [render_fn(_worker_hg, config) for config in configs]
+
+
+def _batched(iterable: Iterable, n: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, n))
+        if not batch:
+            return
+        yield batch
+
+
+def render_configs(
+    make_honegumi: Callable[[], Any],
+    configs: Iterable[Dict[str, Any]],
+    max_workers: Optional[int] = None,
+    chunksize: int = 16,
+    max_pending: Optional[int] = None,
+    render_fn: Callable = render_config,
+) -> Iterator[Any]:
+    """
+    Render configurations in parallel, yielding results in input order.
+
+    Parameters
+    ----------
+    make_honegumi : callable
+        Picklable, zero-argument factory (e.g., a module-level function) that
+        returns a :class:`Honegumi` instance. Called once per worker process.
+    configs : iterable of dict
+        Configurations keyed by option name. Consumed lazily.
+    max_workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs. If 1, the
+        configurations are rendered in the current process.
+    chunksize : int, optional
+        Number of configurations sent to a worker per task.
+    max_pending : int, optional
+        Maximum number of batches in flight. Defaults to ``4 * max_workers``.
+    render_fn : callable, optional
+        Picklable ``render_fn(hg, config)`` applied to each configuration.
+        Defaults to :func:`render_config`.
+
+    Yields
+    ------
+    Any
+        The result of `render_fn` for each configuration, in input order.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 4 * max_workers
+
+    if max_workers == 1:
+        hg = make_honegumi()
+        for config in configs:
+            yield render_fn(hg, config)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_worker,
+        initargs=(make_honegumi,),
+    ) as executor:
+        pending = deque()
+        for batch in _batched(configs, chunksize):
+            pending.append(executor.submit(render_batch, batch, render_fn))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
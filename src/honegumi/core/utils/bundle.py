@@ -0,0 +1,161 @@
+"""
+Static bundle of prerendered scripts for the browser frontend.
+
+Every valid configuration's rendered script is stored in a single gzip-compressed
+JSON file, keyed by the mixed-radix configuration code of
+:class:`~honegumi.core.utils.index.CompatibilityIndex`. Scripts are deduplicated
+at the line level (each unique line is stored once and each unique script is a
+list of line numbers), which shrinks the bundle considerably since scripts share
+most of their lines. The frontend (docs/_static/honegumi_bundle.js) only needs
+to compute the code of the selected options and look the script up, with no
+Python, Jinja, pydantic or black in the browser.
+
+Bundle layout (version 1)::
+
+    {
+        "version": 1,
+        "names": [option names, in row order],
+        "options": [[str(option), ...], ...],
+        "invalid_message": str,
+        "lines": [unique lines],
+        "scripts": [[line number, ...], ...],
+        "lookup": [script number for each code, or -1 if invalid],
+    }
+"""
+
+import gzip
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+import honegumi.core.utils.constants as core_cst
+from honegumi.core.utils.bulk import render_configs
+from honegumi.core.utils.index import CompatibilityIndex
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+BUNDLE_VERSION = 1
+
+
+def _render_script(hg, config: Dict[str, Any]):
+    script = hg.generate(hg.select(config))
+    return hg.index.encode(config), script
+
+
+def build_bundle(
+    make_honegumi: Callable[[], Any],
+    max_workers: Optional[int] = None,
+    chunksize: int = 16,
+) -> Dict[str, Any]:
+    """
+    Render every valid configuration and pack the scripts into a bundle.
+
+    Parameters
+    ----------
+    make_honegumi : callable
+        Picklable, zero-argument factory returning a :class:`Honegumi` instance
+        (see :func:`~honegumi.core.utils.bulk.render_configs`).
+    max_workers : int, optional
+        Number of worker processes used for rendering.
+    chunksize : int, optional
+        Number of configurations sent to a worker per task.
+
+    Returns
+    -------
+    dict
+        The bundle (see the module docstring for the layout).
+    """
+    hg = make_honegumi()
+    index = hg.index
+
+    line_numbers: Dict[str, int] = {}
+    script_numbers: Dict[tuple, int] = {}
+    lookup = [-1] * index.size
+
+    results = render_configs(
+        make_honegumi,
+        hg.iter_valid_configs(),
+        max_workers=max_workers,
+        chunksize=chunksize,
+        render_fn=_render_script,
+    )
+    for code, script in results:
+        lines = tuple(
+            line_numbers.setdefault(line, len(line_numbers))
+            for line in script.split("\n")
+        )
+        lookup[code] = script_numbers.setdefault(lines, len(script_numbers))
+
+    return {
+        "version": BUNDLE_VERSION,
+        "names": index.names,
+        "options": [[str(opt) for opt in opts] for opts in index.options],
+        "invalid_message": core_cst.INVALID_MESSAGE,
+        "lines": list(line_numbers),
+        "scripts": [list(lines) for lines in script_numbers],
+        "lookup": lookup,
+    }
+
+
+def write_bundle(bundle: Dict[str, Any], path: str):
+    """Write a bundle as gzip-compressed, compact JSON."""
+    data = json.dumps(bundle, separators=(",", ":")).encode("utf-8")
+    with gzip.open(path, "wb", compresslevel=9) as f:
+        f.write(data)
+
+
+class ScriptBundle:
+    def __init__(self, bundle: Dict[str, Any]):
+        """
+        Python-side reader of a script bundle, mirroring the browser frontend.
+
+        Parameters
+        ----------
+        bundle : dict
+            A bundle as returned by :func:`build_bundle`.
+        """
+        if bundle["version"] != BUNDLE_VERSION:
+            raise ValueError(
+                f"Unsupported bundle version {bundle['version']}, "
+                f"expected {BUNDLE_VERSION}"
+            )
+        self.bundle = bundle
+        self.index = CompatibilityIndex(
+            bundle["names"],
+            [{"options": options} for options in bundle["options"]],
+            lambda config: bundle["lookup"][self._code(config)] >= 0,
+        )
+
+    def _code(self, config: Dict[str, Any]) -> int:
+        # same as CompatibilityIndex.encode, used while the index is being built
+        code = 0
+        for name, options in zip(self.bundle["names"], self.bundle["options"]):
+            code = code * len(options) + options.index(str(config[name]))
+        return code
+
+    @classmethod
+    def load(cls, path: str) -> "ScriptBundle":
+        with gzip.open(path, "rb") as f:
+            return cls(json.loads(f.read().decode("utf-8")))
+
+    def lookup(self, config: Dict[str, Any]) -> str:
+        """Return the prerendered script for a configuration."""
+        code = self.index.encode(config)
+        if code is None:
+            raise KeyError(f"Configuration not in bundle: {config}")
+        script_number = self.bundle["lookup"][code]
+        if script_number < 0:
+            return self.bundle["invalid_message"]
+        lines = self.bundle["lines"]
+        return "\n".join(lines[i] for i in self.bundle["scripts"][script_number])
+
+    def get_deviating_options(self, config: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Same as :meth:`Honegumi.get_deviating_options`, with string values."""
+        code = self.index.encode(config)
+        if code is None:
+            raise KeyError(f"Configuration not in bundle: {config}")
+        deviating_options = self.index.invalid_flips(code)
+        if not self.index.is_valid(code):
+            deviating_options.extend({k: v} for k, v in self.index.decode(code).items())
+        return deviating_options
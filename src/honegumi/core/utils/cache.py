@@ -0,0 +1,203 @@
+"""
+Content-addressed cache for rendered scripts.
+
+Entries are keyed by a hash of the canonical (sorted, JSON-serialized)
+selections plus a salt that identifies everything else the output depends on
+(template source, option rows, honegumi version). The in-memory tier is an LRU
+with a size cap; the optional on-disk tier persists entries across processes,
+also with a size cap (least recently used entries by modification time are
+evicted first). A cache can be shared between threads.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def canonical_json(obj: Any) -> str:
+    """Serialize `obj` deterministically (sorted keys, no whitespace)."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: str, text: str):
+    """
+    Write `text` to `path` through a temporary file in the same directory, so
+    that concurrent readers never see a partially written file. The temporary
+    file is removed if writing fails.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+class RenderCache:
+    def __init__(
+        self,
+        maxsize: int = 128,
+        cache_dir: Optional[str] = None,
+        disk_maxsize: Optional[int] = 10000,
+    ):
+        """
+        Two-tier (memory + optional disk) cache of rendered scripts.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of entries kept in memory. Least recently used
+            entries are evicted first. 0 disables the in-memory tier.
+        cache_dir : str, optional
+            Directory for the on-disk tier. None disables it.
+        disk_maxsize : int, optional
+            Maximum number of entries kept on disk, by default 10000. When
+            exceeded, the least recently used entries are removed until 90% of
+            it remain. None disables the limit. Other processes sharing the
+            directory are only accounted for when the directory is rescanned,
+            so the limit is approximate.
+        """
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.disk_maxsize = disk_maxsize
+        # number of entries on disk, counted on the first write
+        self._disk_count: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        # guards the in-memory tier and the counters
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if cache_dir is not None:
+            # an unwritable directory only disables the on-disk tier's writes
+            with contextlib.suppress(OSError):
+                os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(selections: Dict[str, Any], salt: str = "") -> str:
+        return hash_text(salt + canonical_json(selections))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def _disk_entries(self):
+        """``(modification time, path)`` of every entry on disk."""
+        entries = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".txt"):
+                    path = os.path.join(root, name)
+                    with contextlib.suppress(OSError):
+                        entries.append((os.stat(path).st_mtime, path))
+        return entries
+
+    def _prune_disk(self):
+        # must be called with the disk lock held
+        entries = sorted(self._disk_entries())
+        excess = len(entries) - int(self.disk_maxsize * 0.9)
+        for _, path in entries[: max(excess, 0)]:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                self.disk_evictions += 1
+        self._disk_count = len(entries) - max(excess, 0)
+
+    def _remember(self, key: str, value: str):
+        # must be called with the lock held
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), encoding="utf-8", newline="") as f:
+                    value = f.read()
+            except OSError:
+                pass
+            else:
+                # the modification time orders the on-disk entries by recency
+                with contextlib.suppress(OSError):
+                    os.utime(self._path(key))
+                with self._lock:
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._remember(key, value)
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            # best effort, like reads: a read-only or full disk only loses the
+            # on-disk copy, the in-memory entry above is kept
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                is_new = not os.path.exists(path)
+                write_atomic(path, value)
+            except OSError:
+                return
+            if self.disk_maxsize is not None and is_new:
+                with self._disk_lock:
+                    if self._disk_count is None:
+                        self._disk_count = len(self._disk_entries())
+                    else:
+                        self._disk_count += 1
+                    if self._disk_count > self.disk_maxsize:
+                        self._prune_disk()
+
+    def clear(self):
+        """Clear the in-memory tier (the on-disk tier is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -5,3 +5,5 @@ IS_COMPATIBLE_KEY = "is_compatible"
 PREAMBLE_KEY = "preamble"
 
 DUMMY_KEY = "dummy"
+
+INVALID_MESSAGE = "INVALID: The parameters you have selected are incompatible, either from not being implemented or being logically inconsistent."  # noqa E501
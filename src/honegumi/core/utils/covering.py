@@ -0,0 +1,93 @@
+"""
+Covering-array selection of configurations for testing.
+
+Running every valid configuration (the full product of the visible options,
+minus the incompatible ones) is impractical against the real Ax. Most failures
+are triggered by the interaction of only a few options, so
+:func:`covering_configs` selects a small subset of valid configurations in
+which every t-tuple of option values (pairs by default) that occurs in any
+valid configuration occurs at least once. Since it only picks from the given
+configurations, the selection respects ``is_incompatible`` by construction,
+and pairs that cannot occur together in a valid configuration are not required.
+"""
+
+import heapq
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Sequence, Set
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def covered_tuples(config: Dict[str, Any], names: Sequence[str], strength: int = 2):
+    """Return the set of ``(option indices, values)`` t-tuples of `config`."""
+    values = [config[name] for name in names]
+    return {
+        (indices, tuple(values[i] for i in indices))
+        for indices in combinations(range(len(names)), strength)
+    }
+
+
+def greedy_cover(covers: Sequence[Set]) -> List[int]:
+    """
+    Return indices of a small subset of `covers` whose union is the union of
+    all of them (a greedy approximation of the minimum set cover).
+
+    Each step picks the set covering the most elements that are not covered yet
+    (ties go to the earlier set, so the result is deterministic). Gains only
+    ever shrink, so stale gains are kept in a heap and recomputed lazily.
+    """
+    uncovered = set().union(*covers)
+    heap = [(-len(cover), i) for i, cover in enumerate(covers)]
+    heapq.heapify(heap)
+    selected = []
+    while uncovered:
+        _, i = heapq.heappop(heap)
+        gain = len(covers[i] & uncovered)
+        if gain == 0:
+            continue
+        if heap and (-gain, i) > heap[0]:
+            # stale, another set may cover more now
+            heapq.heappush(heap, (-gain, i))
+            continue
+        selected.append(i)
+        uncovered -= covers[i]
+    return selected
+
+
+def covering_configs(
+    configs: Iterable[Dict[str, Any]], names: Sequence[str], strength: int = 2
+) -> List[Dict[str, Any]]:
+    """
+    Greedily select configurations (see :func:`greedy_cover`) until every
+    t-tuple of option values that occurs in `configs` is covered.
+
+    Parameters
+    ----------
+    configs : iterable of dict
+        Candidate (e.g., all valid) configurations keyed by option name.
+    names : sequence of str
+        Names of the options whose combinations are to be covered.
+    strength : int, optional
+        Size t of the option tuples to cover, by default 2 (pairwise).
+
+    Returns
+    -------
+    list of dict
+        Selected configurations, in order of selection.
+
+    Examples
+    --------
+    >>> configs = [
+    ...     {"a": a, "b": b, "c": c}
+    ...     for a in [0, 1] for b in [0, 1] for c in [0, 1]
+    ... ]
+    >>> len(covering_configs(configs, ["a", "b", "c"]))
+    4
+    """
+    configs = list(configs)
+    if not 1 <= strength <= len(names):
+        raise ValueError(f"strength must be between 1 and {len(names)}")
+    covers = [covered_tuples(config, names, strength) for config in configs]
+    return [configs[i] for i in greedy_cover(covers)]
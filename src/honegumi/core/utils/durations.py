@@ -0,0 +1,175 @@
+"""
+History of test durations for scheduling.
+
+Run times of the generated scripts vary by orders of magnitude (fully Bayesian
+models dominate), so running them in an arbitrary order leaves most workers
+idle while the last few long scripts finish. :class:`DurationStore` records the
+duration, outcome and peak memory of every run in a local SQLite database and
+estimates the duration of each test from its recent runs, which
+:func:`lpt_order` and :func:`lpt_shards` use to schedule the longest tests
+first (Graham's longest-processing-time rule) and to split them into shards of
+balanced total duration.
+"""
+
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+# duration estimate of tests without any history, if no other test has one
+DEFAULT_DURATION_S = 1.0
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Peak resident set size of the current process in KiB (None on Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+class DurationStore:
+    def __init__(self, path: str, window: int = 5):
+        """
+        SQLite record of test runs.
+
+        Parameters
+        ----------
+        path : str
+            Database file, created if missing (":memory:" for a throwaway one).
+        window : int, optional
+            Number of most recent runs of a test whose median is its duration
+            estimate, by default 5.
+
+        Examples
+        --------
+        >>> store = DurationStore(":memory:")
+        >>> store.record("slow", "passed", 30.0, max_rss_kb=2_000_000)
+        >>> store.record("fast", "failed", 2.0)
+        >>> store.estimates(["slow", "fast", "new"])
+        {'slow': 30.0, 'fast': 2.0, 'new': 16.0}
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.window = window
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "name TEXT NOT NULL, outcome TEXT NOT NULL, duration_s REAL NOT NULL,"
+                " max_rss_kb INTEGER, recorded_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_name ON runs (name, recorded_at)"
+            )
+
+    def record(
+        self,
+        name: str,
+        outcome: str,
+        duration_s: float,
+        max_rss_kb: Optional[int] = None,
+    ):
+        """Record a run, e.g., with outcome "passed", "failed" or "skipped"."""
+        self.record_many([(name, outcome, duration_s, max_rss_kb)])
+
+    def record_many(self, runs: Iterable[Tuple[str, str, float, Optional[int]]]):
+        """Record ``(name, outcome, duration_s, max_rss_kb)`` runs at once."""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                [(*run, now) for run in runs],
+            )
+
+    def history(self, name: str) -> List[Dict]:
+        """All runs of a test, most recent first."""
+        rows = self._conn.execute(
+            "SELECT outcome, duration_s, max_rss_kb, recorded_at FROM runs"
+            " WHERE name = ? ORDER BY recorded_at DESC, rowid DESC",
+            (name,),
+        )
+        keys = ("outcome", "duration_s", "max_rss_kb", "recorded_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def estimates(
+        self, names: Sequence[str], default: Optional[float] = None
+    ) -> Dict[str, float]:
+        """
+        Estimated duration of each test: the median of its most recent runs
+        (skipped ones don't count). Tests without history get `default`, which
+        defaults to the median estimate of the others.
+        """
+        rows = self._conn.execute(
+            "SELECT name, duration_s FROM ("
+            " SELECT name, duration_s, ROW_NUMBER() OVER ("
+            "  PARTITION BY name ORDER BY recorded_at DESC, rowid DESC) AS recency"
+            " FROM runs WHERE outcome != 'skipped')"
+            " WHERE recency <= ?",
+            (self.window,),
+        )
+        wanted = set(names)
+        durations: Dict[str, List[float]] = {}
+        for name, duration_s in rows:
+            if name in wanted:
+                durations.setdefault(name, []).append(duration_s)
+        known = {name: statistics.median(d) for name, d in durations.items()}
+        if default is None:
+            default = statistics.median(known.values()) if known else DEFAULT_DURATION_S
+        return {name: known.get(name, default) for name in names}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def lpt_order(names: Iterable[str], estimates: Dict[str, float]) -> List[str]:
+    """
+    Order tests longest first (ties keep their order), so that a pool of
+    workers pulling from the front finishes with short tests instead of leaving
+    one worker running a long test while the others idle.
+    """
+    return sorted(names, key=lambda name: -estimates[name])
+
+
+def lpt_shards(
+    names: Iterable[str], estimates: Dict[str, float], num_shards: int
+) -> List[List[str]]:
+    """
+    Split tests into `num_shards` shards of balanced total estimated duration,
+    each ordered longest first, by assigning the tests longest first to the
+    shard with the least total so far.
+
+    The split is deterministic, so separate jobs agree on it as long as they
+    use the same estimates (e.g., a database restored from the same cache).
+
+    Examples
+    --------
+    >>> estimates = {"a": 8, "b": 5, "c": 4, "d": 3, "e": 1}
+    >>> lpt_shards(estimates, estimates, 2)
+    [['a', 'd'], ['b', 'c', 'e']]
+    """
+    if num_shards < 1:
+        raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    totals = [0.0] * num_shards
+    for name in lpt_order(names, estimates):
+        i = min(range(num_shards), key=lambda i: (totals[i], i))
+        shards[i].append(name)
+        totals[i] += estimates[name]
+    return shards
@@ -0,0 +1,186 @@
+"""
+Fragment-level caching of template renders.
+
+A script template is split into top-level fragments at blank lines (outside of
+any ``{% if %}``/``{% for %}``/... body, and never where it would change the
+effect of ``{%-``/``-%}`` whitespace control). Each fragment is compiled on its
+own, and static analysis of its AST gives the selection keys it reads, either
+directly or through variables assigned with ``{% set %}`` by earlier fragments
+(tracked transitively). A rendered fragment, together with the variables it
+exports, is cached under the values of just those keys, so that rendering many
+configurations renders each distinct fragment only once and the script is
+stitched together from cached pieces.
+
+Concatenating the fragments' renders is equivalent to rendering the whole
+template, since top-level ``{% set %}`` values are passed on from fragment to
+fragment in the same order as they would be assigned in a single render.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Tuple
+
+from honegumi.core.utils.cache import canonical_json
+from honegumi.core.utils.templates import depth_change, tokenize
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def split_fragments(source: str) -> List[str]:
+    """
+    Split a template's source into top-level fragments at blank lines.
+
+    A split point is a position between the two newlines of a blank line at
+    nesting depth zero. Split points are skipped if they would leave only
+    whitespace between the split and a tag with a whitespace control marker
+    facing it (e.g., ``-%}`` before or ``{%-`` after), since that marker could
+    otherwise no longer strip the whitespace on the other side of the split.
+
+    Parameters
+    ----------
+    source : str
+        The template source.
+
+    Returns
+    -------
+    list of str
+        Fragments whose concatenation is `source`.
+    """
+    tokens = tokenize(source)
+    cuts = []
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.kind != "data":
+            depth += depth_change(token)
+            continue
+        if depth != 0:
+            continue
+        prev_strips = i > 0 and tokens[i - 1].rstrip
+        next_strips = i + 1 < len(tokens) and tokens[i + 1].lstrip
+        offset = token.inner.find("\n\n")
+        while offset != -1:
+            cut = token.start + offset + 1
+            if not (prev_strips and not source[token.start : cut].strip()) and not (
+                next_strips and not source[cut : token.end].strip()
+            ):
+                cuts.append(cut)
+            offset = token.inner.find("\n\n", offset + 1)
+
+    fragments = []
+    start = 0
+    for cut in cuts:
+        # merge whitespace-only pieces (e.g., runs of blank lines) into the next
+        if source[start:cut].strip():
+            fragments.append(source[start:cut])
+            start = cut
+    fragments.append(source[start:])
+    return fragments
+
+
+class Fragment:
+    def __init__(
+        self, source: str, template: "Template", deps: FrozenSet[str], assigns: set
+    ):
+        """
+        A top-level piece of a template.
+
+        Parameters
+        ----------
+        source : str
+            The fragment's source.
+        template : jinja2.Template
+            The fragment compiled as a standalone template.
+        deps : frozenset of str
+            Selection keys the fragment's output and exports depend on,
+            including those read through variables set by earlier fragments.
+        assigns : set of str
+            Variables the fragment may assign (and export) with ``{% set %}``.
+        """
+        self.source = source
+        self.template = template
+        self.deps = deps
+        self.dep_names = tuple(sorted(deps))
+        self.assigns = assigns
+        self.cache: Dict[Tuple, Tuple[str, Dict[str, Any]]] = {}
+
+
+class FragmentRenderer:
+    def __init__(self, env: "Environment", source: str):
+        """
+        Render a template fragment by fragment, caching each fragment's output
+        under the values of the selection keys it depends on.
+
+        Parameters
+        ----------
+        env : jinja2.Environment
+            Environment used to compile the fragments.
+        source : str
+            The template source.
+        """
+        from jinja2 import nodes
+
+        self.hits = 0
+        self.misses = 0
+        self.fragments: List[Fragment] = []
+
+        # selection keys each variable assigned so far depends on
+        var_deps: Dict[str, FrozenSet[str]] = {}
+        for fragment_source in split_fragments(source):
+            names = list(env.parse(fragment_source).find_all(nodes.Name))
+            loaded = {n.name for n in names if n.ctx == "load"}
+            assigns = {n.name for n in names if n.ctx != "load"}
+
+            deps = {name for name in loaded if name not in var_deps}
+            for name in (loaded | assigns) & var_deps.keys():
+                # a conditional `set` keeps the previous value otherwise
+                deps |= var_deps[name]
+            deps = frozenset(deps)
+
+            for name in assigns:
+                var_deps[name] = deps | var_deps.get(name, frozenset())
+
+            self.fragments.append(
+                Fragment(
+                    fragment_source, env.from_string(fragment_source), deps, assigns
+                )
+            )
+
+    def render(self, selections: Dict[str, Any]) -> str:
+        """Render the template, equivalent to ``template.render(selections)``."""
+        context = dict(selections)
+        parts = []
+        for fragment in self.fragments:
+            # serialized, since values may be unhashable (e.g., model_kwargs)
+            key = canonical_json([selections.get(name) for name in fragment.dep_names])
+            cached = fragment.cache.get(key)
+            if cached is None:
+                self.misses += 1
+                ctx = fragment.template.new_context(context)
+                text = fragment.template.environment.concat(
+                    fragment.template.root_render_func(ctx)
+                )
+                cached = (text, ctx.get_exported())
+                fragment.cache[key] = cached
+            else:
+                self.hits += 1
+            text, exported = cached
+            parts.append(text)
+            context.update(exported)
+        return "".join(parts)
+
+    def clear(self):
+        for fragment in self.fragments:
+            fragment.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "fragments": len(self.fragments),
+            "cached": sum(len(fragment.cache) for fragment in self.fragments),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
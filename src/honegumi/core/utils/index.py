@@ -0,0 +1,170 @@
+"""
+Precomputed compatibility index over the full (visible) option space.
+
+Every combination of visible options is assigned a mixed-radix integer code
+whose digits are the indices of the selected options, with the last option row
+varying fastest (i.e., the same order as ``itertools.product`` and
+``gen_combs_with_keys``). Validity of each code is stored in a packed bit array
+and, for each code, a companion bitmask records which single-option flips lead
+to an invalid configuration. Both are computed once, with NumPy over all codes
+at a time if it is installed (it isn't in the browser, see docs/pyscript.toml),
+after which compatibility checks and strike-through computation are O(1)
+lookups.
+"""
+
+from itertools import product
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+from honegumi.core.utils.rules import option_digits
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+class CompatibilityIndex:
+    def __init__(
+        self,
+        visible_option_names: List[str],
+        visible_option_rows: List[Dict[str, Any]],
+        is_compatible_fn: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        valid: Optional[Sequence[bool]] = None,
+    ):
+        """
+        Build the compatibility index.
+
+        Parameters
+        ----------
+        visible_option_names : list of str
+            The names of the visible options, in row order.
+        visible_option_rows : list of dict
+            The visible option rows, each with an ``"options"`` list.
+        is_compatible_fn : callable, optional
+            Called once per combination (a dict keyed by visible option name)
+            and returns True if the combination is compatible.
+        valid : sequence of bool, optional
+            Compatibility of every combination in code order, e.g., from
+            :meth:`~honegumi.core.utils.rules.RuleSet.incompatible_mask`, instead
+            of `is_compatible_fn`.
+        """
+        self.names = list(visible_option_names)
+        self.options = [list(row["options"]) for row in visible_option_rows]
+        self.radices = [len(opts) for opts in self.options]
+
+        # last row varies fastest, matching itertools.product
+        self.strides = [1] * len(self.radices)
+        for i in range(len(self.radices) - 2, -1, -1):
+            self.strides[i] = self.strides[i + 1] * self.radices[i + 1]
+
+        self.size = 1
+        for radix in self.radices:
+            self.size *= radix
+
+        # bit offset of the first option of each row within a flip mask
+        self.offsets = []
+        offset = 0
+        for radix in self.radices:
+            self.offsets.append(offset)
+            offset += radix
+
+        # str(option) -> digit, so that the string form that HTML radio buttons
+        # send (e.g., "True") maps to the same digit as the value itself
+        self.lookups = [
+            {str(opt): digit for digit, opt in enumerate(opts)} for opts in self.options
+        ]
+
+        if valid is None:
+            if is_compatible_fn is None:
+                raise ValueError("Either is_compatible_fn or valid is required")
+            valid = [
+                is_compatible_fn(dict(zip(self.names, values)))
+                for values in product(*self.options)
+            ]
+        if len(valid) != self.size:
+            raise ValueError(f"Expected {self.size} validity values, got {len(valid)}")
+        try:
+            import numpy as np
+        except ImportError:
+            # one configuration at a time, e.g., in the browser
+            self.valid_bits = bytearray((self.size + 7) // 8)
+            for code, is_valid in enumerate(valid):
+                if is_valid:
+                    self.valid_bits[code >> 3] |= 1 << (code & 7)
+            self.flip_masks = [
+                self._compute_flip_mask(code) for code in range(self.size)
+            ]
+        else:
+            valid = np.asarray(valid, dtype=bool)
+            self.valid_bits = bytearray(np.packbits(valid, bitorder="little").tobytes())
+            self.flip_masks = self._compute_flip_masks(valid)
+
+    def _compute_flip_mask(self, code: int) -> int:
+        mask = 0
+        for i, (stride, radix) in enumerate(zip(self.strides, self.radices)):
+            digit = (code // stride) % radix
+            for other in range(radix):
+                if other != digit and not self.is_valid(
+                    code + (other - digit) * stride
+                ):
+                    mask |= 1 << (self.offsets[i] + other)
+        return mask
+
+    def _compute_flip_masks(self, valid: "np.ndarray") -> List[int]:
+        import numpy as np
+
+        codes = np.arange(self.size)
+        digits = option_digits(self.radices)
+        # Python ints if the masks don't fit into 64 bits
+        num_bits = sum(self.radices)
+        masks = np.zeros(self.size, dtype=np.int64 if num_bits < 64 else object)
+        for i, (stride, radix) in enumerate(zip(self.strides, self.radices)):
+            for other in range(radix):
+                flipped = codes + (other - digits[:, i]) * stride
+                invalid = (digits[:, i] != other) & ~valid[flipped]
+                masks[invalid] |= 1 << (self.offsets[i] + other)
+        return masks.tolist()
+
+    def encode(self, config: Dict[str, Any]) -> Optional[int]:
+        """
+        Encode a configuration as an integer, or return None if any visible
+        option is missing or takes a value outside of its option row.
+        """
+        code = 0
+        for name, lookup, stride in zip(self.names, self.lookups, self.strides):
+            if name not in config:
+                return None
+            digit = lookup.get(str(config[name]))
+            if digit is None:
+                return None
+            code += digit * stride
+        return code
+
+    def decode(self, code: int) -> Dict[str, Any]:
+        """Decode an integer code back into a configuration dictionary."""
+        return {
+            name: opts[(code // stride) % radix]
+            for name, opts, stride, radix in zip(
+                self.names, self.options, self.strides, self.radices
+            )
+        }
+
+    def is_valid(self, code: int) -> bool:
+        return bool(self.valid_bits[code >> 3] & (1 << (code & 7)))
+
+    def invalid_flips(self, code: int) -> List[Dict[str, Any]]:
+        """
+        Return the single-option changes (as ``{name: option}`` dicts, in row
+        order) that would make the configuration with the given code invalid.
+        """
+        mask = self.flip_masks[code]
+        flips = []
+        if not mask:
+            return flips
+        for name, opts, offset in zip(self.names, self.options, self.offsets):
+            for digit, opt in enumerate(opts):
+                if mask >> (offset + digit) & 1:
+                    flips.append({name: opt})
+        return flips
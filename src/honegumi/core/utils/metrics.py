@@ -0,0 +1,173 @@
+"""
+Opt-in instrumentation of :class:`Honegumi` calls.
+
+If a ``metrics_callback`` is passed to :class:`Honegumi`, it is called once per
+``generate`` (also per configuration of ``generate_many``) and
+``get_deviating_options`` call with an event such as::
+
+    {
+        "call": "generate",
+        "stages": {"selections": 2.1e-06, "add_model_specific_keys": 9.5e-07,
+                   "is_incompatible": 3.1e-07, "cache_lookup": 4.2e-06,
+                   "render": 1.3e-05, "format": 0.029},
+        "total_s": 0.029,
+        "output_size": 5321,
+        "cache_hit": False,
+        "is_compatible": True,
+    }
+
+where stage durations are in seconds and only the stages that ran are listed
+(e.g., no "render" or "format" on a cache hit). ``cache_hit`` is None when no
+render cache is used or the configuration is invalid; within ``generate_many``,
+duplicates of an earlier configuration of the batch count as hits. For
+``get_deviating_options``, the stages are "encode" and then "index" or
+"fallback", ``cache_hit`` tells whether the precomputed compatibility index
+answered, and ``output_size`` is the number of deviating options.
+
+:class:`MetricsAggregator` is a ready-made callback that keeps counts, means and
+95th percentiles and can be dumped as JSON.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+class StageTimer:
+    __slots__ = ("stages", "start", "_last")
+
+    def __init__(self):
+        """Accumulates the time between consecutive laps under stage names."""
+        self.stages: Dict[str, float] = {}
+        self.start = self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def total(self) -> float:
+        return self._last - self.start
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage: str):
+        pass
+
+
+# used when no metrics callback is set, so that timing costs next to nothing
+NULL_TIMER = _NullTimer()
+
+
+def _percentile(sorted_values, q: float) -> float:
+    # nearest-rank percentile
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class _Series:
+    __slots__ = ("count", "sum", "max", "recent")
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.sum = 0.0
+        self.max = -math.inf
+        self.recent = deque(maxlen=max_samples)
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count,
+            "p95": _percentile(sorted(self.recent), 95),
+            "max": self.max,
+        }
+
+
+class MetricsAggregator:
+    def __init__(self, max_samples: int = 10000):
+        """
+        Metrics callback that aggregates events per call and stage.
+
+        Counts, means and maxima are exact; 95th percentiles are computed over
+        the most recent `max_samples` values of each series.
+
+        Parameters
+        ----------
+        max_samples : int, optional
+            Number of recent values kept per series for percentiles.
+
+        Examples
+        --------
+        >>> metrics = MetricsAggregator()
+        >>> hg = Honegumi(cst, metrics_callback=metrics)  # doctest: +SKIP
+        >>> hg.generate(hg.OptionsModel())  # doctest: +SKIP
+        >>> print(metrics.to_json())  # doctest: +SKIP
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._series = defaultdict(lambda: defaultdict(self._new_series))
+            self._counts = defaultdict(int)
+            self._cache = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def _new_series(self):
+        return _Series(self.max_samples)
+
+    def __call__(self, event: Dict[str, Any]):
+        call = event["call"]
+        with self._lock:
+            self._counts[call] += 1
+            series = self._series[call]
+            for stage, seconds in event["stages"].items():
+                series[f"stages.{stage}"].add(seconds)
+            series["total_s"].add(event["total_s"])
+            series["output_size"].add(event["output_size"])
+            cache_hit = event.get("cache_hit")
+            if cache_hit is not None:
+                self._cache[call]["hits" if cache_hit else "misses"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return ``{call: {"count", "total_s", "output_size", "stages", "cache"}}``
+        where each series is summarized as ``{"count", "mean", "p95", "max"}``
+        and ``"stages"`` maps stage names to series summaries.
+        """
+        with self._lock:
+            summary = {}
+            for call, count in self._counts.items():
+                series = self._series[call]
+                stages = {
+                    name[len("stages.") :]: values.summary()
+                    for name, values in series.items()
+                    if name.startswith("stages.")
+                }
+                summary[call] = {
+                    "count": count,
+                    "total_s": series["total_s"].summary(),
+                    "output_size": series["output_size"].summary(),
+                    "stages": stages,
+                }
+                if call in self._cache:
+                    summary[call]["cache"] = dict(self._cache[call])
+            return summary
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.summary(), **kwargs)
@@ -0,0 +1,143 @@
+"""
+Delta debugging of failing configurations.
+
+When a script fails, the responsible option interaction usually involves only a
+few of the configuration's non-default option values. :func:`minimize_failure`
+finds a 1-minimal set of them (removing any single one of them makes the
+failure disappear) with the ddmin algorithm of Zeller and Hildebrandt,
+"Simplifying and Isolating Failure-Inducing Input" (IEEE TSE, 2002), which
+needs far fewer script executions than trying subsets exhaustively. Each test
+renders the test variant of a candidate configuration (dummy mode and
+``model_kwargs_test_override_fn``, see
+:func:`~honegumi.core.utils.testing.render_test_script`) and runs it.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from honegumi.core.utils.testing import exec_script, render_test_script
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def ddmin(items: Sequence, fails: Callable[[List], bool]) -> List:
+    """
+    Reduce `items`, for which ``fails(items)`` is True, to a 1-minimal failing
+    subset (order is preserved).
+
+    Examples
+    --------
+    >>> ddmin(list(range(8)), lambda subset: {2, 5} <= set(subset))
+    [2, 5]
+    """
+    items = list(items)
+    n = 2
+    while len(items) >= 2:
+        size = len(items)
+        chunks = [items[i * size // n : (i + 1) * size // n] for i in range(n)]
+        reduced = False
+        # with two chunks, each chunk is the other's complement
+        subsets = chunks if n > 2 else []
+        for chunk in subsets:
+            if fails(chunk):
+                items, n, reduced = chunk, 2, True
+                break
+        if not reduced:
+            for chunk in chunks:
+                complement = [item for item in items if item not in chunk]
+                if fails(complement):
+                    items, n, reduced = complement, max(n - 1, 2), True
+                    break
+        if not reduced:
+            if n >= len(items):
+                break
+            n = min(len(items), 2 * n)
+    return items
+
+
+def error_signature(error: Optional[str]) -> Optional[str]:
+    """The exception type of a formatted traceback, e.g., "ValueError"."""
+    if error is None:
+        return None
+    lines = [line for line in error.strip().splitlines() if line.strip()]
+    return lines[-1].split(":")[0].strip() if lines else ""
+
+
+def minimize_failure(
+    hg,
+    config: Dict[str, Any],
+    run_fn: Callable[[str], Dict[str, Any]] = exec_script,
+    same_error: bool = True,
+) -> Dict[str, Any]:
+    """
+    Find a minimal set of non-default option values of a failing configuration
+    that still makes its test script fail.
+
+    Parameters
+    ----------
+    hg : Honegumi
+    config : dict
+        Failing configuration, keyed by (visible) option name. Missing options
+        take their defaults.
+    run_fn : callable, optional
+        ``run_fn(source)`` runs a script and returns a result dict with "ok" and
+        "error" keys, e.g., :func:`~honegumi.core.utils.testing.exec_script`
+        (default), a bound ``ScriptPool.run`` or
+        :func:`honegumi.ax.utils.mock_ax.run_script`.
+    same_error : bool, optional
+        If True (default), a candidate only reproduces the failure if it raises
+        the same exception type as `config`; otherwise any failure counts.
+
+    Returns
+    -------
+    dict
+        ``{"minimal", "config", "error", "num_runs"}``: the minimal non-default
+        option values, the full configuration they make up, its error, and the
+        number of scripts run.
+
+    Raises
+    ------
+    ValueError
+        If `config` is incompatible or its script doesn't fail.
+    """
+    defaults = {row["name"]: row["options"][0] for row in hg.visible_option_rows}
+    deviations = [
+        (name, value)
+        for name, value in hg.select(config)._asdict().items()
+        if name in defaults and value != defaults[name]
+    ]
+    results: Dict[frozenset, Optional[Dict[str, Any]]] = {}
+
+    def run(subset) -> Optional[Dict[str, Any]]:
+        key = frozenset(subset)
+        if key not in results:
+            candidate = {**defaults, **dict(subset)}
+            # incompatible candidates can't reproduce anything
+            results[key] = (
+                run_fn(render_test_script(hg, candidate))
+                if hg.is_compatible(candidate)
+                else None
+            )
+        return results[key]
+
+    original = run(deviations)
+    if original is None:
+        raise ValueError(f"Incompatible configuration: {config}")
+    if original["ok"]:
+        raise ValueError(f"The script of {config} doesn't fail")
+    signature = error_signature(original["error"])
+
+    def fails(subset) -> bool:
+        result = run(subset)
+        if result is None or result["ok"]:
+            return False
+        return not same_error or error_signature(result["error"]) == signature
+
+    minimal = [] if fails([]) else ddmin(deviations, fails)
+    return {
+        "minimal": dict(minimal),
+        "config": {**defaults, **dict(minimal)},
+        "error": results[frozenset(minimal)]["error"],
+        "num_runs": sum(result is not None for result in results.values()),
+    }
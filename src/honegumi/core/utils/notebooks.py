@@ -0,0 +1,70 @@
+"""
+Conversion of rendered scripts into Jupyter notebooks.
+"""
+
+import json
+from typing import TYPE_CHECKING, Tuple
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+NOTEBOOK_TEMPLATE_NAME = "honegumi.ipynb.jinja"
+DEFAULT_TITLE = "Honegumi-generated Optimization Notebook"
+PIP_PREFIX = "# %pip install"
+
+
+def split_installation(script: str) -> Tuple[str, str]:
+    """
+    Split the ``# %pip install ...`` comment off a rendered script.
+
+    Returns
+    -------
+    tuple of str
+        The uncommented installation line (empty if there is none) and the
+        script without it.
+    """
+    lines = script.split("\n")
+    for i, line in enumerate(lines):
+        if line.startswith(PIP_PREFIX):
+            installation = line[len("# ") :].strip()
+            return installation, "\n".join(lines[:i] + lines[i + 1 :])
+    return "", script
+
+
+def script_to_notebook(
+    script: str, notebook_template: "Template", title: str = DEFAULT_TITLE
+) -> str:
+    """
+    Render a script into a notebook with a title, an installation cell and a
+    cell containing the script.
+
+    Parameters
+    ----------
+    script : str
+        The rendered script.
+    notebook_template : jinja2.Template
+        The notebook template (``honegumi.ipynb.jinja``), whose string fields
+        are filled in JSON-escaped.
+    title : str, optional
+        Notebook title.
+
+    Returns
+    -------
+    str
+        The notebook as JSON text.
+    """
+    installation, script = split_installation(script)
+
+    def escape(text):
+        # strip the surrounding quotes, the template provides them
+        return json.dumps(text)[1:-1]
+
+    return notebook_template.render(
+        title=escape(title),
+        installation=escape(installation),
+        script=escape(script.strip("\n")),
+    )
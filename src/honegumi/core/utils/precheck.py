@@ -0,0 +1,174 @@
+"""
+Static pre-check of rendered scripts.
+
+Most regressions of the template show up in the rendered scripts as syntax
+errors, undefined names or unused imports (e.g., ``ObservationFeatures``
+imported although the branch using it isn't taken), which are much cheaper to
+find by parsing the scripts than by running them against Ax.
+:func:`precheck_script` compiles a script and resolves the names it uses, and
+:func:`precheck_scripts` checks many scripts in parallel processes so that all
+problems are reported, grouped by script, before any expensive execution.
+
+Name resolution is module-wide rather than per scope: a name counts as defined
+if it is bound anywhere in the script (or is a builtin). This never flags a
+valid script, at the cost of missing a name that is only bound in another
+scope.
+"""
+
+import ast
+import builtins
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+# names defined in every module namespace
+MODULE_NAMES = frozenset(
+    ["__name__", "__file__", "__doc__", "__builtins__", "__spec__", "__loader__"]
+)
+
+
+def _bound_names(node: ast.AST) -> Iterable[str]:
+    """Names that `node` itself binds (not those of its children)."""
+    if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+        yield node.id
+    elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        yield node.name
+    elif isinstance(node, ast.arg):
+        yield node.arg
+    elif isinstance(node, (ast.Global, ast.Nonlocal)):
+        yield from node.names
+    elif isinstance(node, ast.ExceptHandler) and node.name:
+        yield node.name
+    elif isinstance(node, (ast.Import, ast.ImportFrom)):
+        for name, _ in _imported_names(node):
+            yield name
+    elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+        yield node.name
+    elif isinstance(node, ast.MatchMapping) and node.rest:
+        yield node.rest
+
+
+def _imported_names(node) -> List[Tuple[str, str]]:
+    """``(bound name, imported name)`` of an import statement."""
+    if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+        return []
+    return [
+        (
+            alias.asname
+            or (
+                alias.name.split(".")[0] if isinstance(node, ast.Import) else alias.name
+            ),
+            alias.name,
+        )
+        for alias in node.names
+        if alias.name != "*"
+    ]
+
+
+def find_name_problems(tree: ast.AST) -> List[Tuple[int, str]]:
+    """
+    ``(line, message)`` of undefined names and unused imports of a parsed
+    module, ordered by line.
+
+    Examples
+    --------
+    >>> find_name_problems(ast.parse("import os, sys\\nprint(sys.argv, x)"))
+    [(1, "'os' imported but unused"), (2, "undefined name 'x'")]
+    """
+    bound: Set[str] = set()
+    loaded: Dict[str, int] = {}
+    imports: List[Tuple[int, str, str]] = []
+    star_import = False
+    for node in ast.walk(tree):
+        bound.update(_bound_names(node))
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            loaded[node.id] = min(node.lineno, loaded.get(node.id, node.lineno))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            star_import |= any(alias.name == "*" for alias in node.names)
+            imports.extend(
+                (node.lineno, name, imported)
+                for name, imported in _imported_names(node)
+            )
+
+    problems = [
+        (lineno, f"'{imported}' imported but unused")
+        for lineno, name, imported in imports
+        if name not in loaded
+    ]
+    if not star_import:
+        defined = bound | MODULE_NAMES | set(dir(builtins))
+        problems.extend(
+            (lineno, f"undefined name '{name}'")
+            for name, lineno in loaded.items()
+            if name not in defined
+        )
+    return sorted(problems)
+
+
+def precheck_script(source: str, name: str = "<script>") -> List[str]:
+    """
+    Compile a script and check its names (see :func:`find_name_problems`).
+
+    Returns
+    -------
+    list of str
+        Problems as ``"<line>: <message>"``; empty if the script passes.
+    """
+    try:
+        code_tree = compile(source, name, "exec", ast.PyCF_ONLY_AST)
+        compile(code_tree, name, "exec")
+    except SyntaxError as e:
+        return [f"{e.lineno}: SyntaxError: {e.msg}"]
+    return [f"{lineno}: {message}" for lineno, message in find_name_problems(code_tree)]
+
+
+def _precheck_item(item: Tuple[str, str]) -> List[str]:
+    return precheck_script(*item)
+
+
+def precheck_scripts(
+    sources: Iterable[str],
+    names: Optional[Iterable[str]] = None,
+    max_workers: Optional[int] = None,
+    chunksize: int = 32,
+) -> Dict[str, List[str]]:
+    """
+    Check many scripts (see :func:`precheck_script`) in parallel processes.
+
+    Parameters
+    ----------
+    sources : iterable of str
+        The scripts.
+    names : iterable of str, optional
+        Their (unique) names, by default ``"<script i>"``.
+    max_workers : int, optional
+        Number of processes, by default the number of CPUs; with 1, the
+        scripts are checked in this process.
+    chunksize : int, optional
+        Number of scripts sent to a process at a time, by default 32.
+
+    Returns
+    -------
+    dict
+        Problems of each failing script, keyed by name, in input order.
+    """
+    sources = list(sources)
+    names = (
+        [f"<script {i}>" for i in range(len(sources))] if names is None else list(names)
+    )
+    items = list(zip(sources, names))
+    max_workers = min(max_workers or os.cpu_count() or 1, -(-len(items) // chunksize))
+    if max_workers <= 1:
+        results = map(_precheck_item, items)
+        return {name: problems for name, problems in zip(names, results) if problems}
+    # spawn rather than fork, since the caller may be running threads
+    with ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        results = executor.map(_precheck_item, items, chunksize=chunksize)
+        return {name: problems for name, problems in zip(names, results) if problems}
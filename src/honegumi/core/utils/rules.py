@@ -0,0 +1,315 @@
+"""
+Declarative incompatibility rules.
+
+A rule is a conjunction of option=value predicates, written as a dict (e.g.,
+``{"objective": "Single", "custom_threshold": True}``); a configuration that
+satisfies every predicate of any rule is incompatible. Predicates may also refer
+to derived boolean keys, each defined as a disjunction of such conjunctions
+(e.g., ``custom_gen`` holds for a fully Bayesian or custom model, or for
+multi-task optimization). Values are compared exactly, unless the value of a
+predicate is a callable, which is called with the option value instead (e.g.,
+``IgnoreCase("Single")``).
+
+:meth:`RuleSet.matches` checks a single configuration in plain Python, while
+:meth:`RuleSet.incompatible_mask` evaluates the rules with NumPy over the
+integer-encoded product of all options (see
+:class:`~honegumi.core.utils.index.CompatibilityIndex`) in one pass, so adding a
+rule only means adding a dict. NumPy is only imported by the latter.
+"""
+
+import operator
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+class IgnoreCase:
+    def __init__(self, value: str):
+        """
+        Predicate value matching a string regardless of case.
+
+        Examples
+        --------
+        >>> IgnoreCase("Single")("SINGLE"), IgnoreCase("Single")("Multi")
+        (True, False)
+        """
+        self.value = value
+        self._lower = value.lower()
+
+    def __call__(self, value: Any) -> bool:
+        return isinstance(value, str) and value.lower() == self._lower
+
+    def __repr__(self) -> str:
+        return f"IgnoreCase({self.value!r})"
+
+
+def predicate_test(expected: Any) -> Callable[[Any], bool]:
+    """
+    The test of a predicate value: callables as they are, anything else by
+    equality.
+    """
+    if callable(expected):
+        return expected
+    return partial(operator.eq, expected)
+
+
+def _constant(constants: Dict[str, Any], value: Any) -> str:
+    name = f"_c{len(constants)}"
+    constants[name] = value
+    return name
+
+
+def _disjunction_source(conjunctions, constants: Dict[str, Any]) -> str:
+    """
+    Python expression for whether any of `conjunctions` holds for ``config``.
+    Names and values are added to `constants` and referred to by variable,
+    never formatted into the source.
+    """
+    disjuncts = []
+    for conjunction in conjunctions:
+        terms = []
+        # equalities first, they are cheaper than calling tests
+        for name, value in sorted(conjunction.items(), key=lambda x: callable(x[1])):
+            item = f"config[{_constant(constants, name)}]"
+            if callable(value):
+                terms.append(f"{_constant(constants, value)}({item})")
+            else:
+                terms.append(f"{_constant(constants, value)} == {item}")
+        disjuncts.append("(" + (" and ".join(terms) or "True") + ")")
+    return f"True if {' or '.join(disjuncts) or 'False'} else False"
+
+
+def _make_function(name: str, expression: str, constants: Dict[str, Any]):
+    namespace = dict(constants)
+    exec(f"def {name}(config):\n    return {expression}\n", namespace)
+    return namespace[name]
+
+
+def option_digits(radices: Sequence[int]) -> "np.ndarray":
+    """
+    Digits of every mixed-radix code, with the last option varying fastest (the
+    order of ``itertools.product``), as an array of shape (codes, options).
+
+    Examples
+    --------
+    >>> option_digits([2, 3]).tolist()
+    [[0, 0], [0, 1], [0, 2], [1, 0], [1, 1], [1, 2]]
+    """
+    import numpy as np
+
+    size = int(np.prod(radices, dtype=np.int64))
+    if not len(radices):
+        return np.zeros((size, 0), dtype=np.int64)
+    return np.stack(np.unravel_index(np.arange(size), radices), axis=1)
+
+
+class RuleSet:
+    def __init__(
+        self,
+        rules: List[Dict[str, Any]],
+        derived: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    ):
+        """
+        Incompatibility rules over options and derived keys.
+
+        Parameters
+        ----------
+        rules : list of dict
+            Conjunctions of ``{name: value}`` predicates that are incompatible.
+        derived : dict, optional
+            Derived boolean keys, each mapped to a list of conjunctions of
+            which any must hold for the key to be True. Conjunctions may refer
+            to options and to other derived keys.
+
+        Examples
+        --------
+        >>> rule_set = RuleSet(
+        ...     [{"model": "Fully Bayesian", "custom_gen": False}],
+        ...     derived={"custom_gen": [{"model": "Fully Bayesian"}]},
+        ... )
+        >>> rule_set.matches({"model": "Fully Bayesian"})
+        False
+        >>> rule_set.matches({"model": "Fully Bayesian", "custom_gen": False})
+        True
+        """
+        self.rules = [dict(rule) for rule in rules]
+        self.derived = {
+            name: [dict(conjunction) for conjunction in conjunctions]
+            for name, conjunctions in (derived or {}).items()
+        }
+        # (name, test) pairs, for the general case (see `_holds`)
+        self._rules = [self._compile(rule) for rule in self.rules]
+        self._derived = {
+            name: [self._compile(conjunction) for conjunction in conjunctions]
+            for name, conjunctions in self.derived.items()
+        }
+        # fast paths of `matches` and `derive`, generated as plain functions of
+        # the config (as `collections.namedtuple` generates its methods), so
+        # that they cost no more than hand-written checks. They raise KeyError
+        # unless the config contains every name the predicates refer to, as it
+        # does once it has been through `derive`
+        constants: Dict[str, Any] = {}
+        self._fast_matches = _make_function(
+            "matches", _disjunction_source(self.rules, constants), constants
+        )
+        self._fast_derive = None
+        if not any(
+            name in self.derived
+            for conjunctions in self.derived.values()
+            for conjunction in conjunctions
+            for name in conjunction
+        ):
+            items = [
+                f"{_constant(constants, name)}: "
+                + _disjunction_source(conjunctions, constants)
+                for name, conjunctions in self.derived.items()
+            ]
+            self._fast_derive = _make_function(
+                "derive", "{" + ", ".join(items) + "}", constants
+            )
+
+    @staticmethod
+    def _compile(conjunction: Dict[str, Any]):
+        return [(name, predicate_test(value)) for name, value in conjunction.items()]
+
+    def _derive(self, name: str, config, cache, given: bool) -> bool:
+        if name not in cache:
+            cache[name] = None  # guards against cycles
+            value = False
+            for conjunction in self._derived[name]:
+                if self._holds(conjunction, config, cache, given):
+                    value = True
+                    break
+            cache[name] = value
+        elif cache[name] is None:
+            raise ValueError(f"Derived key {name!r} depends on itself")
+        return cache[name]
+
+    def _holds(self, conjunction, config, cache, given: bool) -> bool:
+        # `given`: whether derived keys in `config` are taken as they are
+        for name, test in conjunction:
+            if name in self._derived and not (given and name in config):
+                value = self._derive(name, config, cache, given)
+            elif name in config:
+                value = config[name]
+            else:
+                raise KeyError(f"{name!r} is neither in the configuration nor derived")
+            if not test(value):
+                return False
+        return True
+
+    def derive(self, config: Dict[str, Any]) -> Dict[str, bool]:
+        """Values of the derived keys for `config` (ignoring any given ones)."""
+        if self._fast_derive is not None:
+            try:
+                return self._fast_derive(config)
+            except KeyError:
+                pass
+        cache: Dict[str, Any] = {}
+        return {
+            name: self._derive(name, config, cache, False) for name in self._derived
+        }
+
+    def matches(self, config: Dict[str, Any]) -> bool:
+        """
+        Whether `config` is incompatible. Derived keys that `config` contains
+        are taken as given, the others are derived from it.
+        """
+        try:
+            return self._fast_matches(config)
+        except KeyError:
+            pass
+        cache: Dict[str, Any] = {}
+        for rule in self._rules:
+            if self._holds(rule, config, cache, True):
+                return True
+        return False
+
+    def incompatible_mask(
+        self,
+        names: Sequence[str],
+        options: Sequence[Sequence[Any]],
+        constants: Optional[Dict[str, Any]] = None,
+        digits: Optional["np.ndarray"] = None,
+    ) -> "np.ndarray":
+        """
+        Evaluate the rules over many configurations at once.
+
+        Parameters
+        ----------
+        names : sequence of str
+            The varying options.
+        options : sequence of sequence
+            The values of each varying option.
+        constants : dict, optional
+            Values of options that don't vary (e.g., hidden or disabled ones).
+            Derived keys are always derived rather than read from here.
+        digits : numpy.ndarray, optional
+            The configurations as an integer array of shape (configs, options)
+            of indices into `options`. Defaults to every combination, in the
+            order of ``itertools.product`` (see :func:`option_digits`).
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array, True for incompatible configurations.
+
+        Raises
+        ------
+        KeyError
+            If a predicate refers to a name that is neither an option, a
+            constant nor derived.
+        """
+        import numpy as np
+
+        if digits is None:
+            digits = option_digits([len(opts) for opts in options])
+        column = {name: i for i, name in enumerate(names)}
+        constants = {
+            k: v for k, v in (constants or {}).items() if k not in self._derived
+        }
+        derived_masks: Dict[str, Optional[np.ndarray]] = {}
+        size = len(digits)
+
+        def predicate(name, test) -> np.ndarray:
+            if name in column:
+                i = column[name]
+                matching = [d for d, opt in enumerate(options[i]) if test(opt)]
+                return np.isin(digits[:, i], matching)
+            if name in self._derived:
+                mask = derived(name)
+                if_true, if_false = bool(test(True)), bool(test(False))
+                if if_true == if_false:
+                    return np.full(size, if_true)
+                return mask if if_true else ~mask
+            if name in constants:
+                return np.full(size, bool(test(constants[name])))
+            raise KeyError(f"{name!r} is neither an option, a constant nor derived")
+
+        def conjunction_mask(conjunction) -> np.ndarray:
+            mask = np.ones(size, dtype=bool)
+            for name, test in conjunction:
+                mask &= predicate(name, test)
+            return mask
+
+        def derived(name) -> np.ndarray:
+            if name not in derived_masks:
+                derived_masks[name] = None  # guards against cycles
+                mask = np.zeros(size, dtype=bool)
+                for conjunction in self._derived[name]:
+                    mask |= conjunction_mask(conjunction)
+                derived_masks[name] = mask
+            elif derived_masks[name] is None:
+                raise ValueError(f"Derived key {name!r} depends on itself")
+            return derived_masks[name]
+
+        incompatible = np.zeros(size, dtype=bool)
+        for rule in self._rules:
+            incompatible |= conjunction_mask(rule)
+        return incompatible
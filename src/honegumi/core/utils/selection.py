@@ -0,0 +1,79 @@
+"""
+Compact, validated option selections without pydantic.
+
+:class:`SelectionSpec` turns option dicts into immutable, hashable ``Selection``
+tuples (a namedtuple with one field per option row, so instances have no
+per-instance ``__dict__``), checking every value against the options of its row
+with precomputed lookups. Internal hot paths (enumeration, compatibility checks,
+deviating options, bulk rendering) use these instead of building a pydantic
+``OptionsModel`` per configuration, which remains the validation layer at the
+public API boundary (e.g., for coercing user input).
+"""
+
+from collections import namedtuple
+from typing import Any, Dict, List
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+class SelectionSpec:
+    def __init__(self, option_rows: List[Dict[str, Any]]):
+        """
+        Selection type and validator for a list of option rows.
+
+        Parameters
+        ----------
+        option_rows : list of dict
+            Option rows, each with a 'name' and an 'options' list whose first
+            element is the default.
+
+        Examples
+        --------
+        >>> rows = [
+        ...     {"name": "objective", "options": ["Single", "Multi"]},
+        ...     {"name": "custom_threshold", "options": [False, True]},
+        ... ]
+        >>> spec = SelectionSpec(rows)
+        >>> spec.select({"objective": "Multi"})
+        Selection(objective='Multi', custom_threshold=False)
+        """
+        self.names = tuple(row["name"] for row in option_rows)
+        self.Selection = namedtuple("Selection", self.names)
+        self.default = self.Selection(*(row["options"][0] for row in option_rows))
+        # option -> its exact type, so that e.g. 1 isn't accepted for True
+        self._allowed = {
+            row["name"]: {option: type(option) for option in row["options"]}
+            for row in option_rows
+        }
+
+    def is_allowed(self, name: str, value: Any) -> bool:
+        allowed = self._allowed.get(name)
+        if allowed is None:
+            return False
+        try:
+            return allowed.get(value) is type(value)
+        except TypeError:  # unhashable
+            return False
+
+    def select(self, config: Dict[str, Any]):
+        """
+        Return the ``Selection`` for an option dict, with defaults for the
+        options it leaves out.
+
+        Raises
+        ------
+        ValueError
+            If `config` has unknown option names or values that are not
+            (exactly) one of the options of their row.
+        """
+        for name, value in config.items():
+            if not self.is_allowed(name, value):
+                if name not in self._allowed:
+                    raise ValueError(f"Unknown option: {name}")
+                raise ValueError(
+                    f"{value!r} is not an option of {name}: "
+                    f"{list(self._allowed[name])}"
+                )
+        return self.default._replace(**config)
@@ -0,0 +1,281 @@
+"""
+Local HTTP render service (``honegumi serve``).
+
+A small HTTP/1.1 server on top of :func:`asyncio.start_server` (no web
+framework dependency) with three JSON endpoints:
+
+- ``GET /option-rows``: the visible option rows.
+- ``GET|POST /generate``: the rendered script for a config.
+- ``GET|POST /deviating-options``: the options that would make a config
+  invalid (see :meth:`Honegumi.get_deviating_options`).
+
+A config is given either as query parameters (``?objective=Multi&model=Default``,
+values matched against the string form of the options) or as a JSON object in
+the body of a POST request. Omitted options take their default values.
+
+Rendering is CPU-bound and runs on a ``ProcessPoolExecutor`` whose workers each
+hold one :class:`Honegumi` instance, so the event loop keeps serving requests.
+Every response carries a strong ETag derived from the normalized config and
+:attr:`Honegumi.cache_salt` (template hash, option rows, version, formatting),
+and a request with a matching ``If-None-Match`` header is answered with
+``304 Not Modified`` without rendering anything.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import honegumi.core.utils.constants as core_cst
+from honegumi.core.utils.bulk import init_worker, render_batch
+from honegumi.core.utils.cache import canonical_json, hash_text
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+# largest accepted request body, configs are tiny
+MAX_BODY_SIZE = 1 << 16
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _render_generate(hg, config: Dict[str, Any]) -> Dict[str, Any]:
+    script, selections = hg.generate(hg.select(config), return_selections=True)
+    return {
+        "script": script,
+        "is_compatible": selections[core_cst.IS_COMPATIBLE_KEY],
+    }
+
+
+class HonegumiService:
+    def __init__(
+        self, make_honegumi: Callable[[], Any], max_workers: Optional[int] = None
+    ):
+        """
+        HTTP service rendering scripts with a pool of worker processes.
+
+        Parameters
+        ----------
+        make_honegumi : callable
+            Picklable, zero-argument factory returning a :class:`Honegumi`
+            instance, called once in this process and once per worker.
+        max_workers : int, optional
+            Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.make_honegumi = make_honegumi
+        self.max_workers = max_workers
+        self.hg = make_honegumi()
+        self.rows_by_name = {row["name"]: row for row in self.hg.option_rows}
+        self.executor = None
+        # path: (allowed methods, handler, whether the handler takes a config)
+        self.routes = {
+            "/generate": (("GET", "POST"), self.generate, True),
+            "/deviating-options": (("GET", "POST"), self.deviating_options, True),
+            "/option-rows": (("GET",), self.option_rows, False),
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000):
+        """Start the worker pool and the server, returning the asyncio server."""
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=init_worker,
+            initargs=(self.make_honegumi,),
+        )
+        # build the compatibility index up front rather than on the first request
+        self.hg.index
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def etag(self, endpoint: str, payload: Any) -> str:
+        key = {"endpoint": endpoint, "payload": payload, "salt": self.hg.cache_salt}
+        return f'"{hash_text(canonical_json(key))}"'
+
+    def parse_config(self, method: str, query: str, body: bytes) -> Dict[str, Any]:
+        """Return the validated config of a request, with defaults filled in."""
+        if method == "POST":
+            try:
+                config = json.loads(body or b"{}")
+            except ValueError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+            if not isinstance(config, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+        else:
+            config = {}
+            for name, value in parse_qsl(query, keep_blank_values=True):
+                if name not in self.rows_by_name:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown option: {name}")
+                options = self.rows_by_name[name]["options"]
+                matches = [option for option in options if str(option) == value]
+                if not matches:
+                    raise HTTPError(
+                        HTTPStatus.BAD_REQUEST,
+                        f"{value!r} is not an option of {name}: {options}",
+                    )
+                config[name] = matches[0]
+
+        # option values only (as for GET), so that rendering can't fail on them
+        try:
+            return self.hg.select(config)._asdict()
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+
+    async def generate(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self.executor, render_batch, [config], _render_generate
+        )
+        return results[0]
+
+    async def deviating_options(self, config: Dict[str, Any]):
+        # answered from the compatibility index, cheap enough for the event loop
+        return self.hg.get_deviating_options(config)
+
+    async def option_rows(self, config: None):
+        return self.hg.visible_option_rows
+
+    async def dispatch(
+        self, method: str, target: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[HTTPStatus, Dict[str, str], bytes]:
+        url = urlsplit(target)
+        if url.path not in self.routes:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown path: {url.path}")
+        methods, handler, takes_config = self.routes[url.path]
+        if method not in methods:
+            raise HTTPError(
+                HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {url.path}"
+            )
+
+        config = None
+        if takes_config:
+            config = self.parse_config(method, url.query, body)
+
+        etag = self.etag(url.path, config)
+        response_headers = {"ETag": etag}
+        if_none_match = headers.get("if-none-match", "")
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in tags or etag in tags or f"W/{etag}" in tags:
+            return HTTPStatus.NOT_MODIFIED, response_headers, b""
+
+        result = await handler(config)
+        response_headers["Content-Type"] = "application/json"
+        return HTTPStatus.OK, response_headers, json.dumps(result).encode("utf-8")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of one connection (with HTTP/1.1 keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = True
+                try:
+                    try:
+                        method, target, version = (
+                            request_line.decode("latin-1").strip().split()
+                        )
+                        length = int(headers.get("content-length", 0))
+                        if length < 0:
+                            raise ValueError("Negative Content-Length")
+                    except ValueError:
+                        keep_alive = False
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request")
+                    if length > MAX_BODY_SIZE:
+                        keep_alive = False
+                        raise HTTPError(
+                            HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large"
+                        )
+                    body = await reader.readexactly(length) if length else b""
+                    keep_alive = (
+                        version == "HTTP/1.1"
+                        and headers.get("connection", "").lower() != "close"
+                    )
+                    status, response_headers, payload = await self.dispatch(
+                        method, target, headers, body
+                    )
+                except HTTPError as e:
+                    status = e.status
+                    response_headers = {"Content-Type": "application/json"}
+                    payload = json.dumps({"error": e.message}).encode("utf-8")
+                except Exception:
+                    _logger.exception("Failed to handle %r", request_line)
+                    status = HTTPStatus.INTERNAL_SERVER_ERROR
+                    response_headers = {"Content-Type": "application/json"}
+                    payload = json.dumps({"error": "Internal server error"}).encode()
+
+                response_headers["Content-Length"] = str(len(payload))
+                if not keep_alive:
+                    response_headers["Connection"] = "close"
+                head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()
+                )
+                writer.write(head.encode("latin-1") + b"\r\n" + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def serve(
+    make_honegumi: Callable[[], Any],
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    max_workers: Optional[int] = None,
+):
+    """
+    Run a :class:`HonegumiService` until interrupted.
+
+    Parameters
+    ----------
+    make_honegumi : callable
+        Picklable, zero-argument factory returning a :class:`Honegumi` instance.
+    host : str, optional
+        Interface to listen on.
+    port : int, optional
+        Port to listen on.
+    max_workers : int, optional
+        Number of worker processes used for rendering.
+    """
+
+    async def main():
+        service = HonegumiService(make_honegumi, max_workers=max_workers)
+        server = await service.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving Honegumi on http://{address[0]}:{address[1]}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,215 @@
+"""
+Partial evaluation of templates for a fixed subset of selections.
+
+Given values for some of the template's variables, :func:`specialize_template`
+returns an equivalent, smaller template source in which every ``{% if %}`` /
+``{% elif %}`` condition and every ``{{ ... }}`` expression that only reads
+fixed variables has been evaluated: resolved branches are inlined, dead
+branches are removed, and constant expressions are replaced by their value.
+Whitespace control markers (``{%-``, ``-%}``) are applied to the surrounding
+text first and comments are dropped, so removing tags never changes the
+output. Rendering the specialized template with selections that agree with the
+fixed values gives the same output as rendering the original template.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from honegumi.core.utils.templates import Token, depth_change, tag_keyword, tokenize
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+# result of evaluating an expression that depends on variables that aren't fixed
+_UNKNOWN = object()
+
+_DELIMITERS = {"block": ("{%", "%}"), "variable": ("{{", "}}")}
+
+
+def _normalize(source: str, tokens: List[Token]) -> List[Tuple[str, Any]]:
+    """
+    Apply whitespace control to the data around each tag, and drop comments.
+
+    Returns a list of ``("data", text)`` and ``("tag", token)`` items; the tags
+    keep their tokens but are emitted without whitespace control markers.
+    """
+    items = []
+    strip_next = False
+    for token in tokens:
+        if token.kind == "data":
+            text = token.inner.lstrip() if strip_next else token.inner
+            items.append(("data", text))
+            strip_next = False
+            continue
+        if token.lstrip and items and items[-1][0] == "data":
+            items[-1] = ("data", items[-1][1].rstrip())
+        if token.kind != "comment":
+            items.append(("tag", token))
+        strip_next = token.rstrip
+    return items
+
+
+def _tag_text(token: Token) -> str:
+    start, end = _DELIMITERS[token.kind]
+    return f"{start}{token.inner}{end}"
+
+
+def _condition(token: Token) -> str:
+    return token.inner.split(None, 1)[1].strip()
+
+
+class _Specializer:
+    def __init__(self, env: "Environment", source: str, fixed: Dict[str, Any]):
+        from jinja2 import nodes
+
+        self.env = env
+        self.nodes = nodes
+        # variables that the template assigns (`set`, loop targets, ...) may
+        # differ from the fixed value at the point where they are read
+        assigned = {
+            n.name for n in env.parse(source).find_all(nodes.Name) if n.ctx != "load"
+        }
+        self.fixed = {k: v for k, v in fixed.items() if k not in assigned}
+        self.items = _normalize(source, tokenize(source))
+
+    def is_fixed(self, expression: str) -> bool:
+        names = self.env.parse(f"{{{{ {expression} }}}}").find_all(self.nodes.Name)
+        return all(name.name in self.fixed for name in names)
+
+    def evaluate(self, expression: str):
+        if not self.is_fixed(expression):
+            return _UNKNOWN
+        try:
+            return self.env.compile_expression(expression)(**self.fixed)
+        except Exception:
+            # e.g., a deliberate error; leave it to be raised when rendering
+            return _UNKNOWN
+
+    def render_variable(self, token: Token) -> str:
+        if not self.is_fixed(token.inner):
+            return _tag_text(token)
+        try:
+            text = self.env.from_string(_tag_text(token)).render(self.fixed)
+        except Exception:
+            return _tag_text(token)
+        if any(delimiter in text for delimiter in ("{{", "{%", "{#")):
+            return _tag_text(token)
+        return text
+
+    def parse(self, pos: int) -> Tuple[List[str], int]:
+        """
+        Specialize items from `pos` up to (not including) the tag that closes
+        or continues the enclosing block, returning the output parts and the
+        position of that tag.
+        """
+        out = []
+        while pos < len(self.items):
+            kind, value = self.items[pos]
+            if kind == "data":
+                out.append(value)
+                pos += 1
+                continue
+            token = value
+            if token.kind == "variable":
+                out.append(self.render_variable(token))
+                pos += 1
+                continue
+            keyword = tag_keyword(token)
+            change = depth_change(token)
+            if change == -1 or keyword in ("elif", "else"):
+                return out, pos
+            if keyword == "if":
+                pos = self.parse_if(pos, out)
+            elif change == 1:
+                # any other block (for, macro, block set, ...): keep its tags and
+                # specialize its body
+                out.append(_tag_text(token))
+                pos += 1
+                while True:
+                    body, pos = self.parse(pos)
+                    out.extend(body)
+                    end = self.items[pos][1]
+                    out.append(_tag_text(end))
+                    pos += 1
+                    if depth_change(end) == -1:
+                        break
+            else:
+                out.append(_tag_text(token))
+                pos += 1
+        return out, pos
+
+    def parse_if(self, pos: int, out: List[str]) -> int:
+        branches = []
+        condition = _condition(self.items[pos][1])
+        pos += 1
+        while True:
+            body, pos = self.parse(pos)
+            branches.append((condition, body))
+            keyword = tag_keyword(self.items[pos][1])
+            if keyword == "elif":
+                condition = _condition(self.items[pos][1])
+            elif keyword == "else":
+                condition = None
+            pos += 1
+            if keyword not in ("elif", "else"):
+                break
+
+        kept = []
+        for condition, body in branches:
+            value = True if condition is None else self.evaluate(condition)
+            if value is _UNKNOWN:
+                kept.append((condition, body))
+            elif value:
+                # later branches are unreachable
+                kept.append((None, body))
+                break
+
+        if not kept:
+            return pos
+        if kept[0][0] is None:
+            out.extend(kept[0][1])
+            return pos
+        for i, (condition, body) in enumerate(kept):
+            if condition is None:
+                out.append("{% else %}")
+            else:
+                out.append(f"{{% {'if' if i == 0 else 'elif'} {condition} %}}")
+            out.extend(body)
+        out.append("{% endif %}")
+        return pos
+
+
+def specialize_template(env: "Environment", source: str, fixed: Dict[str, Any]) -> str:
+    """
+    Partially evaluate a template for fixed values of some of its variables.
+
+    Parameters
+    ----------
+    env : jinja2.Environment
+        Environment used to parse and evaluate expressions.
+    source : str
+        The template source.
+    fixed : dict
+        Fixed variable values. Variables that the template itself assigns are
+        ignored.
+
+    Returns
+    -------
+    str
+        The specialized template source.
+
+    Examples
+    --------
+    >>> from jinja2 import Environment
+    >>> source = "{% if objective == 'Multi' -%}\\n  moo\\n{%- else %}soo{% endif %}"
+    >>> specialize_template(Environment(), source, {"objective": "Multi"})
+    'moo'
+    """
+    specializer = _Specializer(env, source, fixed)
+    out, pos = specializer.parse(0)
+    if pos != len(specializer.items):
+        raise ValueError(f"Unbalanced tag: {_tag_text(specializer.items[pos][1])}")
+    return "".join(out)
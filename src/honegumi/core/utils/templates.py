@@ -0,0 +1,246 @@
+"""
+Jinja environment construction and template precompilation.
+
+Templates can be compiled ahead of time into plain Python modules with
+:func:`compile_templates` (see scripts/compile_templates.py; the package build
+doesn't do this, so it is opt-in per deployment), so that worker processes load
+them as ready Python code instead of lexing, parsing and compiling the template
+source at startup. A manifest of source hashes is written next to the
+compiled modules so that stale modules are never used when the template source
+is available. Independently, a persistent Jinja bytecode cache directory can be
+used to share compiled templates between processes.
+"""
+
+import json
+import os
+import re
+import warnings
+from collections import namedtuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from honegumi.core.utils.cache import hash_text
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+MANIFEST_NAME = "manifest.json"
+
+# A lexical token of a template's source. `kind` is one of "data", "block"
+# ({% %}), "variable" ({{ }}) or "comment" ({# #}); `start` and `end` are offsets
+# into the source; `inner` is the text between the delimiters (or the text
+# itself for data); `lstrip`/`rstrip` flag whitespace control markers (`{%-` and
+# `-%}`).
+Token = namedtuple("Token", ["kind", "start", "end", "inner", "lstrip", "rstrip"])
+
+_TAG_RE = re.compile(
+    r"\{%(?P<block_l>-?)(?P<block>.*?)(?P<block_r>-?)%\}"
+    r"|\{\{(?P<variable_l>-?)(?P<variable>.*?)(?P<variable_r>-?)\}\}"
+    r"|\{#(?P<comment_l>-?)(?P<comment>.*?)(?P<comment_r>-?)#\}",
+    re.DOTALL,
+)
+_TAG_KINDS = ("block", "variable", "comment")
+
+# block tags that open/close a nested body (block `set` is handled separately)
+_OPENING_TAGS = {"if", "for", "macro", "call", "filter", "block", "with", "raw"}
+
+
+def tokenize(source: str) -> List[Token]:
+    """
+    Split a template's source into data and tag tokens, keeping source offsets
+    (unlike Jinja's own lexer, which applies whitespace control while lexing).
+    Assumes the default Jinja delimiters.
+    """
+    tokens = []
+    pos = 0
+    for match in _TAG_RE.finditer(source):
+        if match.start() > pos:
+            tokens.append(
+                Token("data", pos, match.start(), source[pos : match.start()], 0, 0)
+            )
+        kind = next(k for k in _TAG_KINDS if match.group(k) is not None)
+        tokens.append(
+            Token(
+                kind,
+                match.start(),
+                match.end(),
+                match.group(kind),
+                bool(match.group(kind + "_l")),
+                bool(match.group(kind + "_r")),
+            )
+        )
+        pos = match.end()
+    if pos < len(source):
+        tokens.append(Token("data", pos, len(source), source[pos:], 0, 0))
+    return tokens
+
+
+def tag_keyword(token: Token) -> str:
+    """Return the keyword of a block tag (e.g., "if", "endif", "set")."""
+    words = token.inner.split(None, 1)
+    return words[0] if words else ""
+
+
+def depth_change(token: Token) -> int:
+    """+1 if a block tag opens a body, -1 if it closes one, otherwise 0."""
+    if token.kind != "block":
+        return 0
+    keyword = tag_keyword(token)
+    if keyword in _OPENING_TAGS or (keyword == "set" and "=" not in token.inner):
+        return 1
+    if keyword.startswith("end"):
+        return -1
+    return 0
+
+
+def read_manifest(compiled_template_dir: str) -> Dict[str, str]:
+    """Return the {template name: source sha256} manifest of compiled templates."""
+    try:
+        with open(os.path.join(compiled_template_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def _is_stale(template_dir: str, manifest: Dict[str, str]) -> bool:
+    for name, expected_hash in manifest.items():
+        try:
+            with open(os.path.join(template_dir, name)) as f:
+                source = f.read()
+        except OSError:
+            continue  # source not shipped (e.g., browser build), trust the module
+        if hash_text(source) != expected_hash:
+            return True
+    return False
+
+
+def make_env(
+    template_dir: str,
+    compiled_template_dir: Optional[str] = None,
+    bytecode_cache_dir: Optional[str] = None,
+) -> "Environment":
+    """
+    Create the Jinja environment used for rendering Honegumi templates.
+
+    Parameters
+    ----------
+    template_dir : str
+        Directory containing the template sources.
+    compiled_template_dir : str, optional
+        Directory written by :func:`compile_templates`. If given (and not stale
+        with respect to the sources in `template_dir`), templates are loaded
+        from the precompiled modules, falling back to the sources.
+    bytecode_cache_dir : str, optional
+        Directory for a persistent Jinja bytecode cache.
+
+    Returns
+    -------
+    jinja2.Environment
+    """
+    from jinja2 import (
+        ChoiceLoader,
+        Environment,
+        FileSystemBytecodeCache,
+        FileSystemLoader,
+        ModuleLoader,
+        StrictUndefined,
+    )
+
+    loader = FileSystemLoader(template_dir)
+
+    if compiled_template_dir is not None:
+        manifest = read_manifest(compiled_template_dir)
+        if not manifest:
+            warnings.warn(
+                f"No compiled templates found in {compiled_template_dir}, "
+                "compiling from source instead."
+            )
+        elif _is_stale(template_dir, manifest):
+            warnings.warn(
+                f"Compiled templates in {compiled_template_dir} are out of date "
+                f"with respect to {template_dir}, compiling from source instead. "
+                "Rerun scripts/compile_templates.py."
+            )
+        else:
+            loader = ChoiceLoader([ModuleLoader(compiled_template_dir), loader])
+
+    bytecode_cache = None
+    if bytecode_cache_dir is not None:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+    return Environment(
+        loader=loader,
+        undefined=StrictUndefined,
+        keep_trailing_newline=True,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def template_source_hash(
+    template_dir: str, template_name: str, compiled_template_dir: Optional[str] = None
+) -> str:
+    """
+    Return the sha256 of a template's source, read from `template_dir` or, if
+    the source is not available, from the manifest of `compiled_template_dir`.
+    """
+    try:
+        with open(os.path.join(template_dir, template_name)) as f:
+            return hash_text(f.read())
+    except OSError:
+        if compiled_template_dir is not None:
+            manifest = read_manifest(compiled_template_dir)
+            if template_name in manifest:
+                return manifest[template_name]
+        raise
+
+
+def compile_templates(
+    template_dir: str,
+    compiled_template_dir: str,
+    template_names: Optional[Iterable[str]] = None,
+) -> Dict[str, str]:
+    """
+    Precompile templates into Python modules loadable by :func:`make_env`.
+
+    Parameters
+    ----------
+    template_dir : str
+        Directory containing the template sources.
+    compiled_template_dir : str
+        Output directory for the compiled modules and the manifest.
+    template_names : iterable of str, optional
+        Templates to compile. Defaults to every ``*.jinja`` file in
+        `template_dir`.
+
+    Returns
+    -------
+    dict
+        The manifest, mapping template names to the sha256 of their source.
+    """
+    env = make_env(template_dir)
+
+    if template_names is None:
+        template_names = [n for n in env.list_templates() if n.endswith(".jinja")]
+    template_names = list(template_names)
+
+    os.makedirs(compiled_template_dir, exist_ok=True)
+    env.compile_templates(
+        compiled_template_dir,
+        zip=None,
+        filter_func=lambda name: name in template_names,
+        ignore_errors=False,
+    )
+
+    manifest = {}
+    for name in template_names:
+        source = env.loader.get_source(env, name)[0]
+        manifest[name] = hash_text(source)
+
+    with open(os.path.join(compiled_template_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest
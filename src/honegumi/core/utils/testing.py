@@ -0,0 +1,387 @@
+"""
+Running generated scripts in a pool of warm interpreters.
+
+Every generated script imports ``ax``, ``botorch``, ``torch`` and ``pandas``
+before doing any work, and those imports dominate the run time of a script
+started in a fresh interpreter. :class:`ScriptPool` keeps worker processes that
+have imported these libraries once and then execute script after script, each
+in a fresh ``__main__`` module namespace (as ``runpy.run_path`` does).
+
+Each script runs under a timeout; a worker that times out or crashes (e.g., a
+segfault in a compiled extension) is killed and replaced without affecting the
+other runs, and workers are recycled after a number of runs to bound memory
+growth. Note that state outside of the script's namespace (e.g., global random
+seeds or torch settings) persists within a worker until it is recycled.
+
+:class:`ScriptResultCache` records passing results keyed by a hash of the
+rendered script and the environment it ran in (e.g., the installed ax and
+botorch versions), so that re-running the suite after a template edit only runs
+the scripts whose source actually changed.
+"""
+
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import time
+import traceback
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+import honegumi.core.utils.constants as core_cst
+from honegumi.core.utils.cache import canonical_json, hash_text, write_atomic
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+# modules that generated scripts import; missing ones are skipped
+DEFAULT_PRELOAD = ("numpy", "pandas", "torch", "botorch", "ax")
+
+# distributions whose versions determine the outcome of a generated script
+DEFAULT_ENVIRONMENT_PACKAGES = (
+    "ax-platform",
+    "botorch",
+    "gpytorch",
+    "torch",
+    "pandas",
+    "numpy",
+)
+
+
+def dummy_selections(hg, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the selections of the test variant of a configuration, i.e., with
+    the dummy flag set (fewer trials) and `model_kwargs_test_override_fn`
+    applied (e.g., fewer samples for fully Bayesian models).
+    """
+    selections = hg.process_selections(hg.select(config))
+    selections[core_cst.DUMMY_KEY] = True
+    hg.model_kwargs_test_override_fn(selections)
+    return selections
+
+
+def render_test_script(hg, config: Dict[str, Any]) -> str:
+    """
+    Render the test variant (see :func:`dummy_selections`) of a configuration's
+    script. The script is not formatted.
+    """
+    return hg.render_template(dummy_selections(hg, config))
+
+
+def exec_script(source: str, name: str = "<script>") -> Dict[str, Any]:
+    """
+    Execute `source` as ``__main__`` in a fresh module namespace of the current
+    interpreter, capturing its output. ``SystemExit`` with a zero (or no) code
+    counts as success.
+
+    Returns
+    -------
+    dict
+        ``{"name", "ok", "error", "stdout", "stderr", "duration_s"}``, where
+        ``error`` is the formatted traceback (or None).
+    """
+    module = types.ModuleType("__main__")
+    module.__dict__.update(__file__=name, __builtins__=builtins)
+    saved_main = sys.modules.get("__main__")
+    saved_argv = sys.argv
+    stdout, stderr = io.StringIO(), io.StringIO()
+    error = None
+    t0 = time.perf_counter()
+    try:
+        sys.modules["__main__"] = module
+        sys.argv = [name]
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exec(compile(source, name, "exec"), module.__dict__)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"SystemExit: {e.code}"
+    except BaseException:
+        error = traceback.format_exc()
+    finally:
+        if saved_main is not None:
+            sys.modules["__main__"] = saved_main
+        sys.argv = saved_argv
+    return {
+        "name": name,
+        "ok": error is None,
+        "error": error,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "duration_s": time.perf_counter() - t0,
+    }
+
+
+def _worker_main(conn, preload: Sequence[str]):
+    # durations isn't shipped to the browser (see docs/pyscript.toml)
+    from honegumi.core.utils.durations import peak_rss_kb
+
+    for module_name in preload:
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        result = exec_script(*task)
+        # the worker's peak so far, an upper bound for the script
+        result["max_rss_kb"] = peak_rss_kb()
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self, ctx, preload: Sequence[str]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, tuple(preload)), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+
+    def run(self, source: str, name: str, timeout: Optional[float]):
+        """Return the result dict, or None if the worker timed out or died."""
+        self.runs += 1
+        try:
+            self.conn.send((source, name))
+            # the first run of a worker also waits for its preloading
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError):
+            # died, wait for it so that its exit code is available
+            self.process.join(timeout=10)
+        return None
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            with contextlib.suppress(OSError):
+                self.conn.send(None)
+        self.process.join(timeout=None if kill else 10)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ScriptPool:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        timeout: Optional[float] = 600,
+        max_runs_per_worker: Optional[int] = 50,
+        mp_context: Optional[str] = "spawn",
+    ):
+        """
+        Pool of warm worker processes for executing scripts.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            Number of worker processes. Defaults to the number of CPUs.
+        preload : sequence of str, optional
+            Modules each worker imports once at startup (missing ones are
+            skipped).
+        timeout : float, optional
+            Seconds a single script may run before its worker is killed. None
+            for no timeout. The first script of each worker also has to wait
+            for the preloading to finish within this time.
+        max_runs_per_worker : int, optional
+            Number of scripts after which a worker is replaced by a fresh one.
+            None to never recycle workers.
+        mp_context : str, optional
+            Multiprocessing start method. Defaults to "spawn", since forking a
+            parent that runs threads (as :meth:`map` does) is not safe.
+
+        Examples
+        --------
+        >>> with ScriptPool(max_workers=2) as pool:  # doctest: +SKIP
+        ...     for result in pool.map(scripts.values(), names=scripts.keys()):
+        ...         print(result["name"], result["ok"], result["duration_s"])
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.preload = tuple(preload)
+        self.timeout = timeout
+        self.max_runs_per_worker = max_runs_per_worker
+        self._ctx = multiprocessing.get_context(mp_context)
+        # idle workers; started eagerly so that they preload in parallel
+        self._idle = queue.LifoQueue()
+        for _ in range(self.max_workers):
+            self._idle.put(_Worker(self._ctx, self.preload))
+        self.num_started = self.max_workers
+        self._closed = False
+
+    def _replace(self, worker: _Worker, kill: bool) -> _Worker:
+        worker.stop(kill=kill)
+        self.num_started += 1
+        return _Worker(self._ctx, self.preload)
+
+    def run(self, source: str, name: str = "<script>", timeout=None) -> Dict[str, Any]:
+        """
+        Execute one script in an idle worker (see :func:`exec_script` for the
+        returned dict, plus "max_rss_kb", the peak memory of the worker so far).
+        Blocks until a worker is available. A timeout or crash is reported as a
+        failed result and the worker is replaced.
+        """
+        if self._closed:
+            raise RuntimeError("ScriptPool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        try:
+            t0 = time.perf_counter()
+            result = worker.run(source, name, timeout)
+            if result is None:
+                exitcode = worker.process.exitcode
+                error = (
+                    f"Timed out after {timeout} s"
+                    if exitcode is None
+                    else f"Worker crashed (exit code {exitcode})"
+                )
+                worker = self._replace(worker, kill=True)
+                result = {
+                    "name": name,
+                    "ok": False,
+                    "error": error,
+                    "stdout": "",
+                    "stderr": "",
+                    "duration_s": time.perf_counter() - t0,
+                    "max_rss_kb": None,
+                }
+            elif (
+                self.max_runs_per_worker is not None
+                and worker.runs >= self.max_runs_per_worker
+            ):
+                worker = self._replace(worker, kill=False)
+        finally:
+            self._idle.put(worker)
+        return result
+
+    def map(
+        self, sources: Iterable[str], names: Optional[Iterable[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Execute scripts on all workers in parallel, yielding results in input
+        order.
+        """
+        sources = list(sources)
+        names = (
+            [f"<script {i}>" for i in range(len(sources))]
+            if names is None
+            else list(names)
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(self.run, sources, names)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        while not self._idle.empty():
+            self._idle.get().stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def environment_fingerprint(packages=DEFAULT_ENVIRONMENT_PACKAGES) -> Dict[str, Any]:
+    """
+    Python version and installed versions (None if missing) of `packages`, read
+    from the package metadata without importing them.
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    fingerprint: Dict[str, Any] = {"python": "%d.%d" % sys.version_info[:2]}
+    for package in packages:
+        try:
+            fingerprint[package] = version(package)
+        except PackageNotFoundError:
+            fingerprint[package] = None
+    return fingerprint
+
+
+class ScriptResultCache:
+    def __init__(self, cache_dir: str, environment: Optional[Dict[str, Any]] = None):
+        """
+        On-disk record of passing script results.
+
+        Entries are keyed by a hash of the script source plus `environment`, so
+        a script is re-run whenever its rendered source or any of the
+        environment's package versions change. Failing results are never
+        recorded.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory of the entries.
+        environment : dict, optional
+            Anything else the outcome depends on. Defaults to
+            :func:`environment_fingerprint`.
+
+        Examples
+        --------
+        >>> cache = ScriptResultCache("build/script_test_cache")  # doctest: +SKIP
+        >>> key = cache.make_key(script)  # doctest: +SKIP
+        >>> if cache.get(key) is None:  # doctest: +SKIP
+        ...     cache.set(key, exec_script(script))
+        """
+        self.cache_dir = cache_dir
+        self.environment = (
+            environment_fingerprint() if environment is None else environment
+        )
+        self._salt = canonical_json(self.environment)
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, source: str) -> str:
+        return hash_text(self._salt + source)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded (passing) result for `key`, or None."""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Record `result` if it passed."""
+        if not result["ok"]:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, json.dumps({**result, "environment": self.environment}))
+
+    def clear(self) -> int:
+        """Remove all entries and return how many there were."""
+        num_entries = sum(
+            name.endswith(".json")
+            for _, _, names in os.walk(self.cache_dir)
+            for name in names
+        )
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        return num_entries
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.branches import BranchCoverage, instrument_template
+from honegumi.core.utils.testing import dummy_selections
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+@pytest.fixture(scope="module")
+def hg():
+    return Honegumi(cst, option_rows, cache_size=0)
+
+
+@pytest.fixture(scope="module")
+def coverage(hg):
+    path = os.path.join(hg.script_template_dir, hg.script_template_name)
+    with open(path) as f:
+        return BranchCoverage(hg.env, f.read())
+
+
+def test_instrument_template():
+    source, branches = instrument_template(
+        "{% for x in xs %}{% if x %}a{% elif y -%} b {%- else %}c{% endif %}"
+        "{% else %}d{% endfor %}"
+    )
+    # the for's else isn't a branch of the if
+    assert [branch.split(":")[-1] for branch in branches] == ["if", "elif", "else"]
+    assert source.count("_honegumi_branch") == 3
+
+    with pytest.raises(ValueError):
+        instrument_template("{% if a %}")
+
+
+def test_instrumented_output_unchanged(hg, coverage):
+    for config in list(hg.iter_valid_configs())[::97]:
+        selections = dummy_selections(hg, config)
+        output, taken = coverage.render(selections)
+        assert output == hg.render_template(selections)
+        assert taken <= set(coverage.branches)
+
+
+def test_branch_covering_configs(hg, coverage):
+    configs = list(hg.iter_valid_configs())
+    selected, unreachable = coverage.covering_configs(
+        configs, lambda config: dummy_selections(hg, config)
+    )
+    taken = set().union(
+        *(coverage.taken(dummy_selections(hg, config)) for config in selected)
+    )
+    assert taken | set(unreachable) == set(coverage.branches)
+    assert all(hg.is_compatible(config) for config in selected)
+    assert len(selected) < 20
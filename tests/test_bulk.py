@@ -0,0 +1,32 @@
+from itertools import islice
+
+import honegumi.core.utils.constants as core_cst
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi, iter_combs_with_keys
+from honegumi.core.utils.bulk import render_configs
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def make_honegumi():
+    return Honegumi(cst, option_rows, cache_size=0)
+
+
+def test_render_configs_preserves_order():
+    hg = make_honegumi()
+    configs = list(
+        islice(iter_combs_with_keys(hg.visible_option_names, hg.visible_option_rows), 6)
+    )
+
+    serial = list(render_configs(make_honegumi, configs, max_workers=1))
+    parallel = list(
+        render_configs(make_honegumi, iter(configs), max_workers=2, chunksize=2)
+    )
+
+    assert serial == parallel
+    for config, result in zip(configs, parallel):
+        assert {key: result[key] for key in config} == config
+        assert result[core_cst.RENDERED_KEY] == hg.generate(hg.OptionsModel(**config))
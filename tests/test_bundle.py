@@ -0,0 +1,43 @@
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.bundle import ScriptBundle, build_bundle, write_bundle
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+option_names_shortlist = [
+    "objective",
+    "model",
+    "task",
+    "custom_gen",
+    "custom_threshold",
+    "existing_data",
+]
+
+
+def make_honegumi():
+    # disabled options are rendered with their default values
+    option_rows_short = [
+        {**option, "disable": option["name"] not in option_names_shortlist}
+        for option in option_rows
+    ]
+    return Honegumi(cst, option_rows_short, format="none")
+
+
+def test_bundle_matches_generate(tmp_path):
+    hg = make_honegumi()
+    path = str(tmp_path / "bundle.json.gz")
+    write_bundle(build_bundle(make_honegumi, max_workers=1), path)
+    bundle = ScriptBundle.load(path)
+
+    for code in range(hg.index.size):
+        config = hg.index.decode(code)
+        str_config = {key: str(value) for key, value in config.items()}
+
+        assert bundle.lookup(str_config) == hg.generate(hg.OptionsModel(**config))
+        assert bundle.get_deviating_options(str_config) == [
+            {key: str(value) for key, value in option.items()}
+            for option in hg.get_deviating_options(config)
+        ]
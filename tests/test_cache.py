@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.cache import RenderCache, write_atomic
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_render_cache_lru():
+    cache = RenderCache(maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" is now least recently used
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats() == {
+        "hits": 3,
+        "disk_hits": 0,
+        "misses": 1,
+        "evictions": 1,
+        "disk_evictions": 0,
+        "size": 2,
+        "maxsize": 2,
+    }
+
+
+def test_render_cache_disk(tmp_path):
+    cache = RenderCache(maxsize=1, cache_dir=str(tmp_path))
+    cache.set("a", "1\r\n")
+    cache.set("b", "2")
+
+    fresh = RenderCache(maxsize=1, cache_dir=str(tmp_path))
+    assert fresh.get("a") == "1\r\n"
+    assert fresh.disk_hits == 1
+
+
+def test_render_cache_disk_limit(tmp_path):
+    cache = RenderCache(maxsize=0, cache_dir=str(tmp_path), disk_maxsize=10)
+    for i in range(10):
+        cache.set(f"{i:02d}", str(i))
+        os.utime(cache._path(f"{i:02d}"), (i, i))
+    cache.set("00", "0")  # overwriting doesn't add an entry
+    os.utime(cache._path("00"), (0, 0))
+    assert cache.get("01") == "1"  # most recently used now
+    cache.set("10", "10")
+
+    # pruned down to 90% of the limit, least recently used first
+    assert cache.stats()["disk_evictions"] == 2
+    assert cache.get("00") is None and cache.get("02") is None
+    assert cache.get("01") == "1" and cache.get("10") == "10"
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 9
+
+
+def test_write_atomic_cleans_up(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        write_atomic(str(tmp_path / "entry.txt"), "text")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_generate_with_unwritable_cache_dir(tmp_path):
+    # a directory below a file can't be created, whatever the permissions
+    (tmp_path / "file").write_text("")
+    hg = Honegumi(cst, option_rows, cache_dir=str(tmp_path / "file" / "cache"))
+    script = hg.generate(hg.select({"objective": "Multi"}))
+    assert "ax_client" in script
+    # still cached in memory
+    assert hg.generate(hg.select({"objective": "Multi"})) == script
+    assert hg.render_cache.stats()["hits"] == 1
+
+
+def test_generate_uses_render_cache():
+    hg = Honegumi(cst, option_rows)
+    uncached = Honegumi(cst, option_rows, cache_size=0)
+    assert uncached.render_cache is None
+
+    options_model = hg.OptionsModel(objective="Multi", existing_data=True)
+    script = hg.generate(options_model)
+    assert hg.render_cache.stats()["misses"] == 1
+
+    assert hg.generate(hg.OptionsModel(objective="Multi", existing_data=True)) == (
+        script
+    )
+    assert hg.render_cache.stats()["hits"] == 1
+    assert (
+        uncached.generate(uncached.OptionsModel(objective="Multi", existing_data=True))
+        == script
+    )
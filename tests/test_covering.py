@@ -0,0 +1,36 @@
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.covering import covered_tuples, covering_configs
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+@pytest.mark.parametrize("strength", [1, 2])
+def test_covering_configs(strength):
+    hg = Honegumi(cst, option_rows)
+    names = hg.visible_option_names
+    configs = list(hg.iter_valid_configs())
+    selected = covering_configs(configs, names, strength)
+
+    assert all(hg.is_compatible(config) for config in selected)
+    required = set().union(*(covered_tuples(c, names, strength) for c in configs))
+    covered = set().union(*(covered_tuples(c, names, strength) for c in selected))
+    assert covered == required
+    assert len(selected) < 20
+
+    # incompatible pairs are never required
+    if strength == 2:
+        indices = (names.index("objective"), names.index("custom_threshold"))
+        assert (indices, ("Single", True)) not in required
+
+
+def test_covering_configs_full_strength():
+    configs = [{"a": a, "b": b} for a in range(3) for b in range(2)]
+    assert covering_configs(configs, ["a", "b"], strength=2) == configs
+    with pytest.raises(ValueError):
+        covering_configs(configs, ["a", "b"], strength=3)
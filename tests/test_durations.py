@@ -0,0 +1,47 @@
+import pytest
+
+from honegumi.core.utils.durations import (
+    DEFAULT_DURATION_S,
+    DurationStore,
+    lpt_order,
+    lpt_shards,
+    peak_rss_kb,
+)
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_duration_store(tmp_path):
+    path = str(tmp_path / "durations.sqlite")
+    with DurationStore(path, window=2) as store:
+        assert store.estimates(["a"]) == {"a": DEFAULT_DURATION_S}
+        store.record_many(
+            [("a", "passed", 100.0, None), ("a", "passed", 10.0, peak_rss_kb())]
+        )
+        store.record("a", "failed", 20.0)
+        store.record("b", "skipped", 0.0)
+        store.record("c", "passed", 3.0)
+
+    # persisted; only the 2 most recent runs of "a" count, skips don't
+    with DurationStore(path, window=2) as store:
+        assert store.estimates(["a", "b", "c"]) == {"a": 15.0, "b": 9.0, "c": 3.0}
+        assert store.estimates(["b"], default=2.0) == {"b": 2.0}
+        history = store.history("a")
+        assert [run["duration_s"] for run in history] == [20.0, 10.0, 100.0]
+        assert history[0]["outcome"] == "failed"
+
+
+def test_lpt():
+    estimates = {"bayes1": 60, "bayes2": 50, "a": 10, "b": 10, "c": 5, "d": 5}
+    assert lpt_order(estimates, estimates)[:2] == ["bayes1", "bayes2"]
+
+    shards = lpt_shards(estimates, estimates, 2)
+    assert sorted(sum(shards, [])) == sorted(estimates)
+    totals = [sum(estimates[name] for name in shard) for shard in shards]
+    assert totals == [70, 70]
+    # more shards than tests leaves some empty
+    assert lpt_shards(["a"], estimates, 3) == [["a"], [], []]
+    with pytest.raises(ValueError):
+        lpt_shards(estimates, estimates, 0)
@@ -0,0 +1,69 @@
+from jinja2 import Environment, StrictUndefined
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.fragments import FragmentRenderer, split_fragments
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_split_fragments():
+    source = (
+        "import os\n\n"
+        "{% set name = 'a' if flag else 'b' %}\n\n"
+        "{% if flag %}\nx = 1\n\ny = 2\n{% endif %}\n\n"
+        "print({{ name|tojson }})\n\n"
+        "{%- if other %}z = 3{% endif %}\n"
+    )
+    fragments = split_fragments(source)
+    assert "".join(fragments) == source
+    # no splits inside the if body, nor before `{%-` (it strips the blank line)
+    assert "{% if flag %}\nx = 1\n\ny = 2\n{% endif %}" in fragments[2]
+    assert len(fragments) == 4
+
+    env = Environment(undefined=StrictUndefined, keep_trailing_newline=True)
+    renderer = FragmentRenderer(env, source)
+    # `name` is set from `flag`, so the fragment printing it depends on `flag`
+    assert [f.deps for f in renderer.fragments] == [
+        frozenset(),
+        frozenset({"flag"}),
+        frozenset({"flag"}),
+        frozenset({"flag", "other"}),
+    ]
+    for flag in [True, False]:
+        for other in [True, False]:
+            selections = {"flag": flag, "other": other}
+            expected = env.from_string(source).render(selections)
+            assert renderer.render(selections) == expected
+
+
+def test_fragment_depends_on_dict():
+    env = Environment(undefined=StrictUndefined, keep_trailing_newline=True)
+    renderer = FragmentRenderer(env, "kwargs = {{ model_kwargs|tojson }}\n")
+    for _ in range(2):
+        assert renderer.render({"model_kwargs": {"num_samples": 16}}) == (
+            'kwargs = {"num_samples": 16}\n'
+        )
+    assert renderer.render({"model_kwargs": {}}) == "kwargs = {}\n"
+    assert renderer.stats()["hits"] == 1
+
+
+def test_fragment_cache_matches_full_render():
+    hg = Honegumi(cst, option_rows, cache_size=0, format="none")
+    hg_fragments = Honegumi(
+        cst, option_rows, cache_size=0, format="none", fragment_cache=True
+    )
+
+    num_configs = 0
+    for config in hg.iter_valid_configs():
+        assert hg_fragments.generate(
+            hg_fragments.OptionsModel(**config)
+        ) == hg.generate(hg.OptionsModel(**config))
+        num_configs += 1
+
+    stats = hg_fragments.fragment_renderer.stats()
+    assert stats["misses"] == stats["cached"]
+    assert stats["misses"] < num_configs * stats["fragments"] / 10
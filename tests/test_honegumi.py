@@ -1,6 +1,21 @@
-from honegumi.ax._ax import is_incompatible, option_rows
+import asyncio
+import io
+import json
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from honegumi.ax._ax import incompatible_rules, is_incompatible, option_rows
 from honegumi.ax.utils import constants as cst
-from honegumi.core._honegumi import Honegumi, main
+from honegumi.core._honegumi import (
+    Honegumi,
+    gen_combs_with_keys,
+    gen_pruned_combs_with_keys,
+    main,
+)
+from honegumi.core.utils import constants as core_cst
 
 __author__ = "sgbaird"
 __copyright__ = "sgbaird"
@@ -60,13 +75,215 @@ def test_get_deviating_options():
         )
 
 
-def test_main(capsys):
+def test_index_matches_validation():
+    hg = Honegumi(cst, option_rows)
+    hg_slow = Honegumi(cst, option_rows, use_index=False)
+
+    all_opts = gen_combs_with_keys(hg.visible_option_names, hg.visible_option_rows)
+    assert hg.index.size == len(all_opts)
+
+    for code, config in enumerate(all_opts):
+        assert hg.index.encode(config) == code
+        assert hg.index.decode(code) == config
+        assert hg.is_compatible(config) == hg_slow.is_compatible(config)
+
+    # string values, as sent by the HTML radio buttons, map to the same code
+    str_config = {key: str(value) for key, value in all_opts[-1].items()}
+    assert hg.index.encode(str_config) == len(all_opts) - 1
+
+    # free hidden options only use the index for exactly their default value
+    rows = [
+        {**row, "hidden": True} if row["name"] == "visualize" else row
+        for row in option_rows
+    ]
+    hg = Honegumi(cst, rows)
+    assert hg.free_hidden_option_names == ["visualize"]
+    config = dict(all_opts[0])
+    assert hg._encode({**config, "visualize": False}) == 0
+    assert hg._encode({**config, "visualize": "False"}) is None
+
+
+def test_index_deviating_options_match_validation():
+    option_names_shortlist = [
+        "objective",
+        "model",
+        "task",
+        "custom_gen",
+        "existing_data",
+        "custom_threshold",
+        "synchrony",
+    ]
+    option_rows_short = [
+        option for option in option_rows if option["name"] in option_names_shortlist
+    ]
+    hg = Honegumi(cst, option_rows_short)
+    hg_slow = Honegumi(cst, option_rows_short, use_index=False)
+
+    all_opts = gen_combs_with_keys(hg.visible_option_names, hg.visible_option_rows)
+    for config in all_opts:
+        assert hg.get_deviating_options(config) == hg_slow.get_deviating_options(config)
+
+
+def test_pruned_enumeration():
+    hg = Honegumi(cst, option_rows)
+    names, rows = hg.visible_option_names, hg.visible_option_rows
+
+    valid_configs = [c for c in gen_combs_with_keys(names, rows) if hg.is_compatible(c)]
+    assert list(hg.iter_valid_configs()) == valid_configs
+
+    # rules that only involve visible options prune during enumeration
+    pruned = list(gen_pruned_combs_with_keys(names, rows, incompatible_rules))
+    assert len(pruned) < hg.index.size
+    assert not any(c["objective"] == "Single" and c["custom_threshold"] for c in pruned)
+
+    shards = [list(hg.iter_valid_configs(i, 3)) for i in range(3)]
+    assert sorted(map(hg.index.encode, sum(shards, []))) == list(
+        map(hg.index.encode, valid_configs)
+    )
+
+
+def test_verify_formatting(tmp_path):
+    option_names_shortlist = [
+        "objective",
+        "model",
+        "task",
+        "custom_gen",
+        "custom_threshold",
+    ]
+    option_rows_short = [
+        option for option in option_rows if option["name"] in option_names_shortlist
+    ]
+    kwargs = dict(script_template_dir=str(tmp_path), script_template_name="t.py.jinja")
+
+    (tmp_path / "t.py.jinja").write_text("objective = {{ objective|tojson }}\n")
+    hg = Honegumi(cst, option_rows_short, **kwargs)
+    with pytest.warns(UserWarning):
+        assert Honegumi(cst, option_rows_short, format="verified", **kwargs).format == (
+            "black"
+        )
+    num_valid = sum(map(hg.index.is_valid, range(hg.index.size)))
+    assert hg.verify_formatting(write_record=True) == num_valid
+
+    hg_verified = Honegumi(cst, option_rows_short, format="verified", **kwargs)
+    assert hg_verified.format == "verified"
+    assert hg_verified.generate(hg_verified.select({"objective": "Multi"})) == (
+        hg.generate(hg.select({"objective": "Multi"}))
+    )
+
+    # the record no longer holds once the options or rules change
+    renamed_rows = [{**option_rows_short[0], "display_name": "Goal"}]
+    with pytest.warns(UserWarning):
+        assert (
+            Honegumi(
+                cst, renamed_rows + option_rows_short[1:], format="verified", **kwargs
+            ).format
+            == "black"
+        )
+    with pytest.warns(UserWarning):
+        assert (
+            Honegumi(
+                cst,
+                option_rows_short,
+                incompatible_rules=[],
+                format="verified",
+                **kwargs,
+            ).format
+            == "black"
+        )
+
+    (tmp_path / "t.py.jinja").write_text("objective = {{ objective|tojson }};\n")
+    with pytest.raises(ValueError, match="reformatted"):
+        Honegumi(cst, option_rows_short, **kwargs).verify_formatting()
+
+
+def test_import_and_construction_are_lazy():
+    code = (
+        "import sys\n"
+        "from honegumi.ax.utils import constants as cst\n"
+        "from honegumi.core._honegumi import Honegumi\n"
+        "Honegumi(cst)\n"
+        "print(sorted({'black', 'jinja2', 'numpy', 'pydantic'} & set(sys.modules)))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert proc.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_generate_many_and_agenerate():
+    hg = Honegumi(cst, option_rows, cache_size=0, format="none")
+    configs = [
+        {"objective": "Multi"},
+        {"objective": "Single"},
+        {"objective": "Multi", "model": "Default"},  # same selections as the first
+        {"objective": "Single", "custom_threshold": True},  # invalid
+    ]
+    renders = []
+    render_template = hg.render_template
+    hg.render_template = lambda selections: renders.append(1) or render_template(
+        selections
+    )
+
+    scripts = hg.generate_many(configs)
+    assert len(renders) == 2  # the duplicate and the invalid config aren't rendered
+    assert scripts == [hg.generate(hg.OptionsModel(**config)) for config in configs]
+
+    script, selections = asyncio.run(
+        hg.agenerate(hg.OptionsModel(objective="Multi"), return_selections=True)
+    )
+    assert script == scripts[0] and selections["objective"] == "Multi"
+
+
+def test_shared_across_threads():
+    reference = Honegumi(cst, option_rows, cache_size=0, format="none")
+    configs = gen_combs_with_keys(
+        reference.visible_option_names, reference.visible_option_rows
+    )[::97]
+    expected = reference.generate_many(configs)
+
+    # lazy initialization and the render cache are exercised concurrently
+    hg = Honegumi(cst, option_rows, cache_size=8, format="none")
+
+    def generate(config):
+        return hg.generate(hg.OptionsModel(**config))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(3):
+            assert list(executor.map(generate, configs)) == expected
+    stats = hg.render_cache.stats()
+    assert stats["hits"] + stats["misses"] == 3 * sum(
+        script != core_cst.INVALID_MESSAGE for script in expected
+    )
+
+
+def test_main(capsys, monkeypatch):
     """CLI Tests"""
     # capsys is a pytest fixture that allows asserts against stdout/stderr
     # https://docs.pytest.org/en/stable/capture.html
-    main(["7"])
-    captured = capsys.readouterr()
-    assert "The 7-th Fibonacci number is 13" in captured.out
+    assert main(["generate", '{"objective": "Multi"}', "--format", "none"]) == 0
+    (line,) = capsys.readouterr().out.splitlines()
+    record = json.loads(line)
+    assert record["config"] == {"objective": "Multi"}
+    assert record["is_compatible"]
+    assert "ax_client.create_experiment" in record["script"]
+
+    # JSON-lines stream on stdin, one output line per input line
+    configs = [
+        {"model": cst.FULLYBAYESIAN_KEY},
+        {"objective": "Single", "custom_threshold": True},
+        {"objective": 1},
+        {"model": "custom"},
+    ]
+    stdin = "\n".join(json.dumps(config) for config in configs) + "\n\nnot json\n"
+    monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+    assert main(["generate", "--notebook"]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["config"] for record in records[:4]] == configs
+    assert records[0]["notebook"]["nbformat"] == 4
+    assert "ax_client" in records[0]["notebook"]["cells"][2]["source"][0]
+    assert not records[1]["is_compatible"]
+    assert all("error" in record for record in records[2:])
+    assert len(records) == 5
 
 
 if __name__ == "__main__":
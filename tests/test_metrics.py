@@ -0,0 +1,55 @@
+import json
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.metrics import MetricsAggregator
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_metrics_aggregator():
+    events = []
+    metrics = MetricsAggregator()
+
+    def callback(event):
+        events.append(event)
+        metrics(event)
+
+    hg = Honegumi(cst, option_rows, metrics_callback=callback)
+    options_model = hg.OptionsModel(objective="Multi")
+    script = hg.generate(options_model)
+    assert hg.generate(options_model) == script
+    hg.generate(hg.OptionsModel(objective="Single", custom_threshold=True))
+    hg.generate_many([{"objective": "Multi"}, {"objective": "Multi"}])
+    defaults = {row["name"]: row["options"][0] for row in option_rows}
+    hg.get_deviating_options({**defaults, "custom_threshold": True})
+
+    miss, hit, invalid = events[:3]
+    assert set(miss["stages"]) == {
+        "selections",
+        "add_model_specific_keys",
+        "is_incompatible",
+        "cache_lookup",
+        "render",
+        "format",
+        "cache_store",
+    }
+    assert miss["cache_hit"] is False and miss["output_size"] == len(script)
+    assert hit["cache_hit"] is True and "render" not in hit["stages"]
+    assert invalid["cache_hit"] is None and invalid["is_compatible"] is False
+    assert "validate" in events[3]["stages"]
+    assert events[-1]["call"] == "get_deviating_options"
+
+    summary = json.loads(metrics.to_json())
+    assert summary["generate"]["count"] == 5
+    assert summary["generate"]["cache"] == {"hits": 3, "misses": 1}
+    assert summary["generate"]["stages"]["format"]["count"] == 1
+    stats = summary["generate"]["total_s"]
+    assert 0 < stats["mean"] <= stats["max"] and stats["p95"] <= stats["max"]
+    assert summary["get_deviating_options"]["cache"] == {"hits": 1, "misses": 0}
+
+    metrics.reset()
+    assert metrics.summary() == {}
@@ -0,0 +1,49 @@
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.minimize import ddmin, minimize_failure
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_ddmin():
+    calls = []
+
+    def fails(subset):
+        calls.append(subset)
+        return {"b", "f"} <= set(subset)
+
+    assert ddmin(list("abcdefgh"), fails) == ["b", "f"]
+    assert len(calls) < 2**8
+    assert ddmin(["a"], fails) == ["a"]
+
+
+def test_minimize_failure():
+    hg = Honegumi(cst, option_rows)
+
+    def run_fn(source):
+        # a made-up failure of multi-objective scripts with categorical values
+        failing = "obj2_name" in source and '"c1"' in source
+        error = "Traceback ...\nKeyError: 'c1'" if failing else None
+        return {"ok": not failing, "error": error}
+
+    config = {
+        "objective": "Multi",
+        "categorical": True,
+        "sum_constraint": True,
+        "linear_constraint": True,
+        "existing_data": True,
+        "synchrony": "Batch",
+        "visualize": True,
+    }
+    result = minimize_failure(hg, config, run_fn)
+    assert result["minimal"] == {"objective": "Multi", "categorical": True}
+    assert result["error"].endswith("KeyError: 'c1'")
+    assert result["num_runs"] < 2 ** len(config)
+
+    with pytest.raises(ValueError, match="doesn't fail"):
+        minimize_failure(hg, {"objective": "Multi"}, run_fn)
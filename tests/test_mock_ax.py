@@ -0,0 +1,59 @@
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.ax.utils.mock_ax import parse_constraint, run_script
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.testing import render_test_script
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+pytest.importorskip("pandas")
+
+
+def test_all_configs_against_mock_ax():
+    hg = Honegumi(cst, option_rows, cache_size=0)
+    failures = {}
+    for config in hg.iter_valid_configs():
+        result = run_script(render_test_script(hg, config))
+        if not result["ok"]:
+            failures[str(config)] = result["error"]
+    assert not failures, next(iter(failures.items()))
+
+
+def test_mock_ax_catches_wiring_errors():
+    hg = Honegumi(cst, option_rows, cache_size=0)
+    script = render_test_script(
+        hg,
+        {"objective": "Multi", "existing_data": True, "order_constraint": True},
+    )
+    result = run_script(script)
+    assert result["ok"], result["error"]
+    (calls,) = result["calls"]
+    assert calls[0][0] == "create_experiment"
+    assert [name for name, _ in calls].count("attach_trial") == 5
+
+    broken = {
+        # mismatched raw_data keys
+        "return {obj1_name: y, obj2_name: y2}": "return {obj1_name: y}",
+        # unknown keyword argument
+        "ax_client.create_experiment(": "ax_client.create_experiment(nam='x', ",
+        # existing data violating the order constraint
+        '"x1 <= x2"': '"x2 <= x1"',
+    }
+    for old, new in broken.items():
+        assert old in script
+        assert not run_script(script.replace(old, new))["ok"], new
+
+
+def test_parse_constraint():
+    names = {"x1", "x2"}
+    assert parse_constraint("x1 + x2 <= 15.0", names) == ({"x1": 1, "x2": 1}, 15)
+    assert parse_constraint("x1 <= x2", names) == ({"x1": 1, "x2": -1}, 0)
+    assert parse_constraint("2*x1 - x2 >= 1", names) == ({"x1": -2, "x2": 1}, -1)
+    with pytest.raises(ValueError, match="spaces"):
+        parse_constraint("1.0 * x1 <= 2", names)
+    with pytest.raises(ValueError, match="not a range parameter"):
+        parse_constraint("x1 + c1 <= 2", names)
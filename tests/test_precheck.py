@@ -0,0 +1,47 @@
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.precheck import precheck_script, precheck_scripts
+from honegumi.core.utils.testing import render_test_script
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_precheck_script():
+    assert precheck_script("def f(:\n    pass")[0].startswith("1: SyntaxError")
+    assert precheck_script("def f():\n    pass\nreturn 1")[0].startswith(
+        "3: SyntaxError"
+    )
+    source = "\n".join(
+        [
+            "from __future__ import annotations",
+            "import os.path",
+            "from ax.modelbridge.factory import Models",
+            "try:",
+            "    import json as js",
+            "except ImportError as e:",
+            "    print(e, __name__)",
+            "def f(x, *args, y=1, **kwargs):",
+            "    return [z for z in args if z > x], os.path, js, kwargs",
+            "print(f(1), missing, ObservationFeatures)",
+        ]
+    )
+    assert precheck_script(source) == [
+        "3: 'Models' imported but unused",
+        "10: undefined name 'ObservationFeatures'",
+        "10: undefined name 'missing'",
+    ]
+
+
+def test_precheck_scripts():
+    hg = Honegumi(cst, option_rows)
+    configs = list(hg.iter_valid_configs())[::97]
+    scripts = [render_test_script(hg, config) for config in configs]
+    assert precheck_scripts(scripts, max_workers=1) == {}
+
+    broken = ["x = 1", "import os", "print(y)", "if True:\n1"]
+    problems = precheck_scripts(broken, "abcd", max_workers=2, chunksize=1)
+    assert list(problems) == ["b", "c", "d"]
+    assert problems["c"] == ["1: undefined name 'y'"]
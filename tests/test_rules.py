@@ -0,0 +1,153 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from honegumi.ax._ax import (
+    add_model_specific_keys,
+    incompatible_rules,
+    is_incompatible,
+    option_rows,
+    rule_set,
+)
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils import constants as core_cst
+from honegumi.core.utils.rules import IgnoreCase, RuleSet, option_digits
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_incompatible_mask_matches_single_configs():
+    rules = RuleSet(
+        [{"a": 1, "flag": True}, {"b": "X", "c": False}, {"a": 0, "b": "y"}],
+        derived={"flag": [{"c": True}, {"b": "z", "other": True}]},
+    )
+    names = ["a", "b", "c"]
+    options = [[0, 1, 2], ["x", "y", "z"], [False, True]]
+    mask = rules.incompatible_mask(names, options, constants={"other": True})
+    expected = [
+        rules.matches({**dict(zip(names, values)), "other": True})
+        for values in product(*options)
+    ]
+    assert mask.tolist() == expected
+    assert rules.derive({"b": "z", "c": False, "other": True}) == {"flag": True}
+
+    # a subset of the configurations
+    digits = option_digits([3, 3, 2])[[0, 5, 7]]
+    assert rules.incompatible_mask(
+        names, options, {"other": True}, digits
+    ).tolist() == [expected[i] for i in [0, 5, 7]]
+
+    with pytest.raises(KeyError):
+        rules.incompatible_mask(names, options)
+
+
+def test_predicates_compare_exactly():
+    rules = RuleSet(
+        [{"a": "X", "flag": False}, {"b": IgnoreCase("y"), "flag": True}],
+        derived={"flag": [{"a": "Z"}]},
+    )
+    assert rules.matches({"a": "X", "b": "n"})
+    assert not rules.matches({"a": "x", "b": "n"})
+    assert rules.derive({"a": "Z"}) == {"flag": True}
+    assert rules.derive({"a": "z", "flag": True}) == {"flag": False}
+    assert rules.matches({"a": "Z", "b": "Y"})
+
+    names = ["a", "b"]
+    options = [["X", "x", "Z", "z"], ["y", "Y", "n"]]
+    assert rules.incompatible_mask(names, options).tolist() == [
+        rules.matches(dict(zip(names, values))) for values in product(*options)
+    ]
+
+
+def test_ax_rules_match_the_original_checks():
+    # the checks `is_incompatible` and `add_model_specific_keys` replaced
+    def old_is_incompatible(opt):
+        model_is_fully_bayesian = opt[cst.MODEL_OPT_KEY] == cst.FULLYBAYESIAN_KEY
+        objective_is_single = opt[cst.OBJECTIVE_OPT_KEY].lower() == "single"
+        return (model_is_fully_bayesian and not opt[cst.CUSTOM_GEN_KEY]) or (
+            objective_is_single and opt[cst.CUSTOM_THRESHOLD_KEY]
+        )
+
+    def old_custom_gen(opt):
+        return (
+            (opt[cst.MODEL_OPT_KEY] == cst.FULLYBAYESIAN_KEY)
+            or (opt[cst.MODEL_OPT_KEY] == cst.CUSTOM_KEY)
+            or (opt[cst.TASK_OPT_KEY] == "Multi")
+        )
+
+    # including values that only differ in case from the options
+    objectives = ["Single", "single", "SINGLE", "Multi", "multi"]
+    models = ["Default", "Custom", "custom", "Fully Bayesian", "fully bayesian"]
+    tasks = ["Single", "Multi", "multi"]
+    defaults = {row["name"]: row["options"][0] for row in option_rows}
+    for objective, model, task, custom_threshold, custom_gen in product(
+        objectives, models, tasks, [False, True], [False, True]
+    ):
+        opt = {
+            **defaults,
+            cst.OBJECTIVE_OPT_KEY: objective,
+            cst.MODEL_OPT_KEY: model,
+            cst.TASK_OPT_KEY: task,
+            cst.CUSTOM_THRESHOLD_KEY: custom_threshold,
+            cst.CUSTOM_GEN_KEY: custom_gen,
+        }
+        assert is_incompatible(opt) == old_is_incompatible(opt), opt
+        derived = dict(opt)
+        add_model_specific_keys(list(opt), derived)
+        assert derived[cst.CUSTOM_GEN_KEY] == old_custom_gen(opt), opt
+
+
+def test_derived_cycle():
+    rules = RuleSet([{"p": True}], derived={"p": [{"q": True}], "q": [{"p": True}]})
+    with pytest.raises(ValueError):
+        rules.matches({})
+    with pytest.raises(ValueError):
+        rules.incompatible_mask(["a"], [[0]])
+
+
+def test_index_from_rule_set():
+    hg = Honegumi(cst, option_rows)
+    assert hg.rule_set is rule_set
+    names = hg.visible_option_names
+    valid = ~rule_set.incompatible_mask(
+        names, [row["options"] for row in hg.visible_option_rows]
+    )
+    # same as validating every configuration one at a time
+    slow = [
+        hg._is_compatible_slow(dict(zip(names, values)))
+        for values in product(*[row["options"] for row in hg.visible_option_rows])
+    ]
+    assert valid.tolist() == slow
+    assert int(np.sum(valid)) == len(list(hg.iter_valid_configs()))
+
+    # custom rules decide compatibility everywhere, not only in the index
+    hg = Honegumi(
+        cst,
+        option_rows,
+        incompatible_rules=[*incompatible_rules, {"model": "Custom"}],
+        format="none",
+    )
+    defaults = {row["name"]: row["options"][0] for row in hg.visible_option_rows}
+    for config in [{**defaults, "model": "Custom"}, {"model": "Custom"}]:
+        assert not hg.is_compatible(config)
+        assert not hg._is_compatible_slow(config)
+        script, selections = hg.generate(hg.select(config), return_selections=True)
+        assert not selections["is_compatible"]
+        assert script == core_cst.INVALID_MESSAGE
+    assert hg.get_deviating_options(defaults) == hg.get_deviating_options(
+        {"objective": defaults["objective"]}
+    )
+    assert {"model": "Custom"} in hg.get_deviating_options(defaults)
+    assert {"model": "Custom"} not in Honegumi(cst, option_rows).get_deviating_options(
+        defaults
+    )
+
+    # custom validation functions don't use the rule set
+    assert (
+        Honegumi(cst, option_rows, is_incompatible_fn=lambda opt: False).rule_set
+        is None
+    )
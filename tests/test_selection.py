@@ -0,0 +1,35 @@
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi, gen_combs_with_keys
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_select_matches_options_model():
+    hg = Honegumi(cst, option_rows)
+    configs = gen_combs_with_keys(hg.visible_option_names, hg.visible_option_rows)
+    for config in configs:
+        selection = hg.select(config)
+        assert hash(selection) == hash(hg.select(dict(config)))
+        assert hg.process_selections(selection) == hg.process_selections(
+            hg.OptionsModel(**config)
+        )
+
+    assert hg.select({}) == hg.select(
+        {row["name"]: row["options"][0] for row in option_rows}
+    )
+    with pytest.raises(ValueError, match="Unknown option"):
+        hg.select({"objectiv": "Multi"})
+    with pytest.raises(ValueError, match="not an option"):
+        hg.select({"objective": "multi"})
+    with pytest.raises(ValueError, match="not an option"):
+        hg.select({"custom_threshold": 1})
+
+    # input that needs coercion still goes through pydantic
+    assert hg.generate_many([{"objective": "multi"}]) == [
+        hg.generate(hg.OptionsModel(objective="multi"))
+    ]
@@ -0,0 +1,89 @@
+import asyncio
+import http.client
+import json
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.server import HonegumiService
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def make_honegumi():
+    return Honegumi(cst, option_rows, cache_size=0, format="none")
+
+
+def request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, response.headers, json.loads(data) if data else None
+
+
+def check_endpoints(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    status, _, rows = request(conn, "GET", "/option-rows")
+    assert status == 200
+    assert [row["name"] for row in rows] == make_honegumi().visible_option_names
+
+    status, headers, result = request(conn, "GET", "/generate?objective=Multi")
+    assert status == 200 and result["is_compatible"]
+    assert "ax_client.create_experiment" in result["script"]
+    etag = headers["ETag"]
+
+    # revalidation is answered without a body; equivalent configs share the ETag
+    status, headers, result = request(
+        conn, "GET", "/generate?objective=Multi", headers={"If-None-Match": etag}
+    )
+    assert status == 304 and result is None and headers["ETag"] == etag
+    status, headers, _ = request(
+        conn,
+        "POST",
+        "/generate",
+        body=json.dumps({"objective": "Multi", "model": "Default"}),
+        headers={"If-None-Match": etag},
+    )
+    assert status == 304
+    status, headers, _ = request(conn, "GET", "/generate?objective=Single")
+    assert status == 200 and headers["ETag"] != etag
+
+    status, _, deviating = request(
+        conn, "GET", "/deviating-options?objective=Single&custom_threshold=True"
+    )
+    assert status == 200 and {"custom_threshold": True} in deviating
+
+    assert request(conn, "GET", "/generate?objective=Triple")[0] == 400
+    assert request(conn, "POST", "/generate", body="[1]")[0] == 400
+    # POST bodies are held to the options of each row, like query parameters
+    status, _, result = request(
+        conn, "POST", "/generate", body=json.dumps({"model": "custom"})
+    )
+    assert status == 400 and "not an option of model" in result["error"]
+    assert request(conn, "POST", "/generate", body='{"nope": 1}')[0] == 400
+    assert request(conn, "POST", "/option-rows")[0] == 405
+    assert request(conn, "GET", "/nope")[0] == 404
+    status, headers, _ = request(
+        conn, "POST", "/generate", headers={"Content-Length": "-1"}
+    )
+    assert status == 400 and headers["Connection"] == "close"
+    conn.close()
+
+
+def test_server():
+    async def scenario():
+        service = HonegumiService(make_honegumi, max_workers=1)
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, check_endpoints, port)
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+from jinja2 import Environment
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.specialize import specialize_template
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_specialize_template():
+    env = Environment(keep_trailing_newline=True)
+    source = (
+        "{# comment #}\n"
+        "{% if a -%}\n  x = 1\n{%- elif b %}y{% else %}z{% endif %}\n"
+        "{% for i in range(2) %}{% if a %}{{ i }}{% endif %}{% endfor %}\n"
+        "{{ a }} {{ b }}\n"
+        "{% set c = a %}{% if c %}c{% endif %}\n"
+    )
+    for b in [True, False]:
+        selections = {"a": False, "b": b}
+        specialized = specialize_template(env, source, {"a": False})
+        # only the `b` condition, the loop and the assigned `c` are left
+        assert "{% if a" not in specialized and "{{ a }}" not in specialized
+        assert "{% if c %}" in specialized
+        expected = env.from_string(source).render(selections)
+        assert env.from_string(specialized).render(selections) == expected
+
+
+def test_honegumi_specialize(tmp_path):
+    hg = Honegumi(cst, option_rows, cache_size=0, format="none")
+    fixed = {cst.OBJECTIVE_OPT_KEY: "Multi", cst.MODEL_OPT_KEY: cst.FULLYBAYESIAN_KEY}
+    hg_specialized = hg.specialize(fixed, str(tmp_path), cache_size=0, format="none")
+
+    with open(os.path.join(hg.script_template_dir, hg.script_template_name)) as f:
+        source = f.read()
+    specialized_source = (tmp_path / hg.script_template_name).read_text()
+    assert len(specialized_source) < len(source)
+
+    configs = list(hg_specialized.iter_valid_configs())
+    assert configs
+    for config in configs:
+        assert hg_specialized.generate(
+            hg_specialized.OptionsModel(**config)
+        ) == hg.generate(hg.OptionsModel(**config, **fixed))
+
+    with pytest.raises(ValueError, match="not an option"):
+        hg.specialize({cst.OBJECTIVE_OPT_KEY: "Triple"}, str(tmp_path))
@@ -0,0 +1,49 @@
+import pytest
+
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.templates import compile_templates
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_compiled_templates(tmp_path):
+    template_dir = tmp_path / "src"
+    template_dir.mkdir()
+    (template_dir / "t.py.jinja").write_text("objective = {{ objective|tojson }}\n")
+    compiled_dir = str(tmp_path / "compiled")
+
+    manifest = compile_templates(str(template_dir), compiled_dir)
+    assert list(manifest) == ["t.py.jinja"]
+
+    kwargs = dict(
+        script_template_dir=str(template_dir), script_template_name="t.py.jinja"
+    )
+    hg = Honegumi(cst, option_rows, **kwargs)
+    hg_compiled = Honegumi(
+        cst, option_rows, script_compiled_template_dir=compiled_dir, **kwargs
+    )
+    assert hg_compiled.template.filename.startswith(compiled_dir)
+    assert hg_compiled.template_hash == hg.template_hash
+
+    assert hg_compiled.generate(
+        hg_compiled.OptionsModel(objective="Multi")
+    ) == hg.generate(hg.OptionsModel(objective="Multi"))
+
+    # stale compiled templates are ignored in favor of the source
+    (template_dir / "t.py.jinja").write_text("objective = {{ model|tojson }}\n")
+    hg_stale = Honegumi(
+        cst, option_rows, script_compiled_template_dir=compiled_dir, **kwargs
+    )
+    with pytest.warns(UserWarning, match="out of date"):
+        assert hg_stale.template.filename == str(template_dir / "t.py.jinja")
+
+
+def test_bytecode_cache(tmp_path):
+    bytecode_cache_dir = tmp_path / "bytecode"
+    hg = Honegumi(cst, option_rows, bytecode_cache_dir=str(bytecode_cache_dir))
+    hg.template
+    assert len(list(bytecode_cache_dir.iterdir())) == 1
@@ -0,0 +1,67 @@
+from honegumi.ax._ax import option_rows
+from honegumi.ax.utils import constants as cst
+from honegumi.core._honegumi import Honegumi
+from honegumi.core.utils.testing import (
+    ScriptPool,
+    ScriptResultCache,
+    exec_script,
+    render_test_script,
+)
+
+__author__ = "sgbaird"
+__copyright__ = "sgbaird"
+__license__ = "MIT"
+
+
+def test_script_pool():
+    scripts = {
+        "define": "import sys\nx = 1\nprint('json' in sys.modules, __name__)",
+        "fresh_namespace": "print('x' in globals())",
+        "error": "raise ValueError('boom')",
+        "exit_ok": "import sys\nsys.exit(0)",
+        "crash": "import os\nos._exit(3)",
+        "timeout": "import time\ntime.sleep(60)",
+        "after": "print('ok')",
+    }
+    with ScriptPool(
+        max_workers=1, preload=["json"], timeout=5, max_runs_per_worker=3
+    ) as pool:
+        results = {r["name"]: r for r in pool.map(scripts.values(), scripts)}
+        assert pool.run("pass", timeout=0.5)["ok"]
+
+    assert results["define"]["stdout"] == "True __main__\n"
+    assert results["fresh_namespace"]["stdout"] == "False\n"
+    assert "ValueError: boom" in results["error"]["error"]
+    assert results["exit_ok"]["ok"]
+    assert results["crash"]["error"] == "Worker crashed (exit code 3)"
+    assert results["timeout"]["error"] == "Timed out after 5 s"
+    assert results["after"]["ok"]
+    # recycled after 3 runs, then replaced after the crash and the timeout
+    assert pool.num_started == 4
+
+
+def test_render_test_script():
+    hg = Honegumi(cst, option_rows)
+    config = {"objective": "Multi"}
+    script = render_test_script(hg, config)
+    assert script != hg.render_template(hg.process_selections(hg.select(config)))
+    compile(script, "<test script>", "exec")
+
+
+def test_script_result_cache(tmp_path):
+    cache = ScriptResultCache(str(tmp_path), environment={"ax-platform": "0.4.3"})
+    key = cache.make_key("print(1)")
+    assert cache.get(key) is None
+    cache.set(key, exec_script("print(1)"))
+    cache.set(cache.make_key("1/0"), exec_script("1/0"))
+    assert cache.get(key)["stdout"] == "1\n"
+    assert cache.get(cache.make_key("1/0")) is None
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+    # other versions or sources don't hit
+    other = ScriptResultCache(str(tmp_path), environment={"ax-platform": "0.4.4"})
+    assert other.get(other.make_key("print(1)")) is None
+    assert cache.get(cache.make_key("print(2)")) is None
+
+    assert cache.clear() == 1
+    assert cache.get(key) is None